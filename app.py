@@ -1,69 +1,308 @@
 #!/usr/bin/env python3
 from __future__ import annotations
-import argparse
-import os
-import sys
 import time
-from decimal import Decimal
-from typing import Optional
+_STARTED = time.perf_counter()
+import sys
 
 from dotenv import load_dotenv
 
-from galactic_solver.challenge_client import ChallengeClient
-from galactic_solver.nlu_parser import parse_statement
-from galactic_solver.evaluator import eval_expression
-from galactic_solver.data_sources import swapi, pokeapi
-from galactic_solver.utils import parse_decimal
-
+from galactic_solver import daemon
 
-def solve_statement(statement: str, client: ChallengeClient) -> Optional[Decimal]:
-    parsed = parse_statement(statement, client)
-    if not parsed:
-        print("[WARN] No se pudo parsear el enunciado (parser/LLM)")
-        return None
-
-    entities = parsed.get("entities", [])
-    vars_spec = parsed.get("vars", {})
-    expression = parsed.get("expression", "")
+if __name__ == "__main__":
+    # .env antes de importar el resto del paquete: algunos módulos leen el entorno al importarse
+    load_dotenv()
+    # Con un `serve` corriendo, el comando se ejecuta allí (conexiones, cachés, índices y
+    # expresiones compiladas ya calientes) sin importar httpx ni el resto del solver
+    _forwarded = daemon.forward(sys.argv[1:], started=_STARTED)
+    if _forwarded is not None:
+        sys.exit(_forwarded)
 
-    # Resolver entidades
-    resolved = []
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+from galactic_solver.challenge_client import AsyncChallengeClient, ChallengeClient
+from galactic_solver.nlu_parser import (LLM_TOKENS, PARSE_STATS, PROTOCOLS, aparse_statement, parse_statement,
+                                        parse_stats_summary)
+from galactic_solver.parse_cache import TEMPLATE_STATS, template_stats_summary
+from galactic_solver.evaluator import eval_expression, eval_many
+from galactic_solver.journal import JOURNAL_STATS, journal_stats_summary, lookup_answer, record_answer
+from galactic_solver.metrics import RECORDER, span, write_report
+from galactic_solver.practice import (CorpusWriter, corpus_path, answer_matches, load_corpus, make_row as make_practice_row,
+                                      practice_fields, rescore_summary, run_batch as run_practice_batch,
+                                      summarize as summarize_practice)
+from galactic_solver.profiling import PROFILE_KEEP, ProblemProfiler, profile_dir, profile_problem
+from galactic_solver.prefetch import PREFETCH_STATS, AsyncPrefetch, Prefetch, prefetch_stats_summary
+from galactic_solver.schema import AttributeIndex, attribute_allowed, canonical_attribute
+from galactic_solver.scheduler import PROBLEM_BUDGET, ProblemBudget, Scheduler, StageTimeout, arun_stage, run_stage
+from galactic_solver.singleflight import SINGLEFLIGHT_STATS, singleflight_stats_summary
+from galactic_solver.data_sources import swapi, pokeapi, poketable
+from galactic_solver.utils import normalize_name, parse_decimal
+from galactic_solver.warmup import (awarmup, describe as describe_warmup, http2_clients, rebuild_clients, use_http2,
+                                    warmup)
+from galactic_solver import catalog_query
+
+IMPORT_SECONDS = time.perf_counter() - _STARTED
+
+
+ENTITY_FETCHERS = {
+    "sw_character": swapi.get_character,
+    "sw_planet": swapi.get_planet,
+    "pokemon": pokeapi.get_pokemon,
+}
+ASYNC_ENTITY_FETCHERS = {
+    "sw_character": swapi.aget_character,
+    "sw_planet": swapi.aget_planet,
+    "pokemon": pokeapi.aget_pokemon,
+}
+
+
+def _entity_refs(entities: list) -> Optional[list[tuple[str, str]]]:
+    # Validar (tipo, nombre) de cada entidad antes de ir a la red
+    refs = []
     for e in entities:
         etype = (e.get("type") or "").lower()
         name = e.get("name")
         if not isinstance(name, str):
             print("[WARN] Entidad sin nombre válido")
             return None
-        item = None
-        if etype == "sw_character":
-            item = swapi.get_character(name)
-        elif etype == "sw_planet":
-            item = swapi.get_planet(name)
-        elif etype == "pokemon":
-            item = pokeapi.get_pokemon(name)
-        else:
+        if etype not in ENTITY_FETCHERS:
             print(f"[WARN] Tipo de entidad no soportado: {etype}")
             return None
+        refs.append((etype, name))
+    return refs
+
+
+def solve_statement(statement: str, client: ChallengeClient, budget: Optional[ProblemBudget] = None,
+                    trace: Optional[dict] = None) -> Optional[Decimal]:
+    # Entidades conocidas del enunciado se piden mientras el parser/LLM trabaja.
+    # `trace` (opcional) recibe el parse, las entidades resueltas y los tiempos por etapa
+    prefetch = Prefetch.start(statement, ENTITY_FETCHERS, budget)
+    try:
+        return _solve_with_prefetch(statement, client, prefetch, budget, trace if trace is not None else {})
+    except StageTimeout as ex:
+        print(f"[WARN] {ex} — se envía la respuesta de respaldo")
+        return None
+    finally:
+        prefetch.close()
+
+
+def _resolve_entities(refs: list[tuple[str, str]], prefetch: Prefetch) -> Optional[list]:
+    resolved = []
+    for etype, name in refs:
+        with span("fetch", type=etype) as tags:
+            found, item = prefetch.take(etype, name)
+            if found:
+                tags["prefetch"] = "hit"
+            else:
+                item = ENTITY_FETCHERS[etype](name)
         if not item:
             print(f"[WARN] No se encontró entidad: {etype} - {name}")
             return None
         resolved.append(item)
+    return resolved
 
-    # Construir variables para el evaluador
-    variables: dict[str, object] = {}
 
-    PLANET_ATTRS = {"rotation_period", "orbital_period", "diameter", "surface_water", "population", "name"}
-    CHAR_ATTRS = {"height", "mass", "homeworld", "name"}
-    POKE_ATTRS = {"base_experience", "height", "weight", "name"}
+def _solve_with_prefetch(statement: str, client: ChallengeClient, prefetch: Prefetch,
+                         budget: Optional[ProblemBudget], trace: dict) -> Optional[Decimal]:
+    timings = trace.setdefault("timings", {})
+    t0 = time.perf_counter()
+    with span("parse"):
+        parsed = run_stage(budget, "parse", parse_statement, statement, client, prefetch.add, budget)
+    timings["parse"] = time.perf_counter() - t0
+    trace["parse"] = parsed
+    if not parsed:
+        print("[WARN] No se pudo parsear el enunciado (parser/LLM)")
+        return None
 
-    def attr_allowed_for(etype: str, attr: str) -> bool:
-        if etype == "sw_planet":
-            return attr in PLANET_ATTRS
-        if etype == "sw_character":
-            return attr in CHAR_ATTRS
-        if etype == "pokemon":
-            return attr in POKE_ATTRS
-        return False
+    entities = parsed.get("entities", [])
+    refs = _entity_refs(entities)
+    if refs is None:
+        return None
+
+    # Resolver entidades
+    t0 = time.perf_counter()
+    with span("resolve", entities=len(refs)):
+        resolved = run_stage(budget, "resolve", _resolve_entities, refs, prefetch)
+    timings["resolve"] = time.perf_counter() - t0
+    trace["entities"] = resolved
+    if resolved is None:
+        return None
+    t0 = time.perf_counter()
+    answer = run_stage(budget, "evaluate", evaluate_parsed, parsed, resolved)
+    timings["evaluate"] = time.perf_counter() - t0
+    return answer
+
+
+async def _afetch(etype: str, name: str, prefetch: AsyncPrefetch):
+    with span("fetch", type=etype) as tags:
+        found, item = await prefetch.take(etype, name)
+        if found:
+            tags["prefetch"] = "hit"
+            return item
+        return await ASYNC_ENTITY_FETCHERS[etype](name)
+
+
+async def asolve_statement(statement: str, client: AsyncChallengeClient,
+                           budget: Optional[ProblemBudget] = None, trace: Optional[dict] = None) -> Optional[Decimal]:
+    prefetch = AsyncPrefetch.start(statement, ASYNC_ENTITY_FETCHERS)
+    try:
+        return await _asolve_with_prefetch(statement, client, prefetch, budget, trace if trace is not None else {})
+    except StageTimeout as ex:
+        print(f"[WARN] {ex} — se envía la respuesta de respaldo")
+        return None
+    finally:
+        prefetch.close()
+
+
+async def _asolve_with_prefetch(statement: str, client: AsyncChallengeClient, prefetch: AsyncPrefetch,
+                                budget: Optional[ProblemBudget], trace: dict) -> Optional[Decimal]:
+    with span("parse"):
+        parsed = await arun_stage(budget, "parse", aparse_statement(statement, client, on_entity=prefetch.add,
+                                                                     budget=budget))
+    trace["parse"] = parsed
+    if not parsed:
+        print("[WARN] No se pudo parsear el enunciado (parser/LLM)")
+        return None
+
+    entities = parsed.get("entities", [])
+    refs = _entity_refs(entities)
+    if refs is None:
+        return None
+
+    # Resolver todas las entidades (y sus planetas natales) en paralelo
+    with span("resolve", entities=len(refs)):
+        resolved = await arun_stage(budget, "resolve",
+                                    asyncio.gather(*(_afetch(etype, name, prefetch) for etype, name in refs)))
+    for (etype, name), item in zip(refs, resolved):
+        if not item:
+            print(f"[WARN] No se encontró entidad: {etype} - {name}")
+            return None
+    trace["entities"] = list(resolved)
+    return await arun_stage(budget, "evaluate", _aevaluate(parsed, list(resolved)))
+
+
+async def _aevaluate(parsed: dict, resolved: list) -> Optional[Decimal]:
+    return evaluate_parsed(parsed, resolved)
+
+
+BATCH_WORKERS = int(os.getenv("GALACTIC_BATCH_WORKERS") or 8)
+
+
+def solve_statements(statements: list[str], client: ChallengeClient, workers: int = BATCH_WORKERS) -> dict:
+    # Muchos enunciados de una vez: parse en paralelo (como mucho `workers` llamadas al proxy
+    # de chat a la vez), cada entidad distinta del lote se pide una sola vez y cada expresión
+    # se compila una vez para todos los problemas que la usan (eval_many).
+    timings: dict[str, float] = {}
+    t_start = time.perf_counter()
+    results = [{"statement": s, "parse": None, "answer": None, "error": None} for s in statements]
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="batch") as pool:
+        t0 = time.perf_counter()
+        with span("batch.parse", problems=len(statements)):
+            parses = list(pool.map(lambda st: _batch_parse(st, client), statements))
+        timings["parse"] = time.perf_counter() - t0
+
+        refs_per_problem: list[Optional[list[tuple[str, str]]]] = []
+        distinct: dict[tuple[str, str], tuple[str, str]] = {}
+        for row, parsed in zip(results, parses):
+            row["parse"] = parsed
+            refs = _entity_refs(parsed.get("entities", [])) if parsed else None
+            refs_per_problem.append(refs)
+            if not parsed:
+                row["error"] = "parse"
+            elif refs is None:
+                row["error"] = "entities"
+            for etype, name in refs or ():
+                distinct.setdefault((etype, normalize_name(name)), (etype, name))
+
+        t0 = time.perf_counter()
+        with span("batch.fetch", entities=len(distinct)):
+            fetched = dict(zip(distinct, pool.map(lambda ref: _batch_fetch(*ref), distinct.values())))
+        timings["fetch"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    by_expression: dict[str, list[tuple[int, dict]]] = {}
+    for i, (row, refs) in enumerate(zip(results, refs_per_problem)):
+        if row["error"]:
+            continue
+        resolved = [fetched[(etype, normalize_name(name))] for etype, name in refs]
+        if not all(resolved):
+            row["error"] = "fetch"
+            continue
+        variables = bind_variables(row["parse"], resolved)
+        if variables is None:
+            row["error"] = "variables"
+            continue
+        by_expression.setdefault(row["parse"].get("expression", ""), []).append((i, variables))
+    with span("batch.evaluate", expressions=len(by_expression)):
+        for expression, items in by_expression.items():
+            try:
+                answers = eval_many(expression, [variables for _, variables in items], skip_errors=True)
+            except Exception:  # la expresión misma no compila
+                answers = [None] * len(items)
+            for (i, _), answer in zip(items, answers):
+                results[i]["answer"] = answer
+                if answer is None:
+                    results[i]["error"] = "evaluate"
+    timings["evaluate"] = time.perf_counter() - t0
+    timings["total"] = time.perf_counter() - t_start
+    references = sum(len(refs or ()) for refs in refs_per_problem)
+    return {
+        "results": results,
+        "timings": timings,
+        "entities": {"references": references, "distinct": len(distinct)},
+        "expressions": len(by_expression),
+    }
+
+
+def _batch_parse(statement: str, client: ChallengeClient) -> Optional[dict]:
+    try:
+        return parse_statement(statement, client)
+    except Exception as ex:
+        print(f"[WARN] Falló el parse: {ex}")
+        return None
+
+
+def _batch_fetch(etype: str, name: str):
+    try:
+        with span("fetch", type=etype):
+            return ENTITY_FETCHERS[etype](name)
+    except Exception as ex:
+        print(f"[WARN] Falló la búsqueda de {etype} - {name}: {ex}")
+        return None
+
+
+def evaluate_parsed(parsed: dict, resolved: list) -> Optional[Decimal]:
+    variables = bind_variables(parsed, resolved)
+    if variables is None:
+        return None
+    try:
+        with span("evaluate"):
+            result = eval_expression(parsed.get("expression", ""), variables)
+        return result
+    except ZeroDivisionError:
+        print("[WARN] División por cero en la expresión — se salta el problema")
+        return None
+    except Exception as ex:
+        print(f"[WARN] Error evaluando la expresión: {ex}")
+        return None
+
+
+def bind_variables(parsed: dict, resolved: list) -> Optional[dict[str, object]]:
+    # Valores de cada variable del parse según las entidades resueltas
+    entities = parsed.get("entities", [])
+    vars_spec = parsed.get("vars", {})
+
+    # Construir variables para el evaluador
+    variables: dict[str, object] = {}
+    types = [(e.get("type") or "").lower() for e in entities]
+    index: Optional[AttributeIndex] = None  # atributo -> entidades; solo si hay que reasignar
 
     for var, spec in vars_spec.items():
         if not isinstance(spec, dict):
@@ -79,31 +318,16 @@ def solve_statement(statement: str, client: ChallengeClient) -> Optional[Decimal
             return None
 
         # Normalización por tipo para evitar deslices (p.ej., 'mass' vs 'weight')
-        etype = (entities[idx].get("type") or "").lower()
-        if etype == "pokemon" and attr == "mass":
-            attr = "weight"
-        if etype == "sw_character" and attr == "weight":
-            attr = "mass"
+        etype = types[idx]
+        attr = canonical_attribute(etype, attr)
 
         # Si el atributo no es válido para el tipo actual o falta el valor, intentar una reasignación segura por tipo
         value = resolved[idx].get(attr)
-        if (not attr_allowed_for(etype, attr)) or (value is None):
-            # Determinar tipos candidatos según el atributo
-            if attr in PLANET_ATTRS:
-                wanted_type = "sw_planet"
-            elif attr in CHAR_ATTRS:
-                wanted_type = "sw_character"
-            elif attr in POKE_ATTRS:
-                wanted_type = "pokemon"
-            else:
-                wanted_type = etype
-            # Buscar candidatos con ese tipo que tengan el atributo disponible
-            candidates: list[int] = []
-            for j, ent in enumerate(entities):
-                if (ent.get("type") or "").lower() == wanted_type:
-                    val_j = resolved[j].get(attr)
-                    if val_j is not None:
-                        candidates.append(j)
+        if (not attribute_allowed(etype, attr)) or (value is None):
+            if index is None:
+                index = AttributeIndex(types, resolved)
+            # Entidades del tipo dueño del atributo que lo tienen disponible
+            candidates = index.candidates(attr)
             chosen = None
             if len(candidates) == 1:
                 chosen = candidates[0]
@@ -118,17 +342,16 @@ def solve_statement(statement: str, client: ChallengeClient) -> Optional[Decimal
                 if chosen is None:
                     chosen = candidates[0]
             if chosen is not None and chosen != idx:
-                print(f"[WARN] Reasignando variable {var} del índice {idx} ({etype}) a {chosen} ({(entities[chosen].get('type') or '').lower()}) por atributo '{attr}'.")
+                print(f"[WARN] Reasignando variable {var} del índice {idx} ({etype}) a {chosen} ({types[chosen]}) por atributo '{attr}'.")
                 idx = chosen
-                etype = (entities[idx].get("type") or "").lower()
+                etype = types[idx]
                 value = resolved[idx].get(attr)
 
         if value is None:
             print(f"[WARN] Atributo faltante para {var}: {attr} en entidad {idx} ({etype}).")
             return None
-        # Normalizar números (si vienen como string) a Decimal/int
-        if isinstance(value, str):
-            # Mantener strings (para len())
+        # Los registros ya traen Decimal (o str, para len()); otros valores se convierten aquí
+        if isinstance(value, (str, Decimal)):
             variables[var] = value
         else:
             d = parse_decimal(value)
@@ -136,42 +359,47 @@ def solve_statement(statement: str, client: ChallengeClient) -> Optional[Decimal
                 print(f"[WARN] No se pudo convertir a número: {var}={value}")
                 return None
             variables[var] = d
+    return variables
+
+
+_CHALLENGE_CLIENTS: Dict[bool, ChallengeClient] = {}
 
-    try:
-        result = eval_expression(expression, variables)
-        return result
-    except ZeroDivisionError:
-        print("[WARN] División por cero en la expresión — se salta el problema")
-        return None
-    except Exception as ex:
-        print(f"[WARN] Error evaluando la expresión: {ex}")
-        return None
+
+def _challenge_client(http2: bool = False) -> ChallengeClient:
+    # One per process: under `serve` its connections stay open between commands
+    if http2 not in _CHALLENGE_CLIENTS:
+        _CHALLENGE_CLIENTS[http2] = ChallengeClient(http2=http2)
+    return _CHALLENGE_CLIENTS[http2]
 
 
 def cmd_practice(args):
-    client = ChallengeClient()
+    client = _challenge_client()
+    if args.count > 1 or args.workers > 1:
+        return _practice_batch(args, client)
     test = client.get_test()
     # Intentar detectar campos comunes
-    statement = None
-    for k in ("statement", "problem", "enunciado", "text"):
-        if k in test and isinstance(test[k], str):
-            statement = test[k]
-            break
+    statement, expected = practice_fields(test)
     if not statement:
         print("[INFO] Respuesta /challenge/test:")
         print(test)
         print("[ERROR] No se encontró el campo del enunciado en la respuesta de práctica.")
         return 1
 
-    expected = None
-    for k in ("expected", "solution", "answer", "resultado"):
-        if k in test:
-            expected = test[k]
-            break
-
     print("\n[TEST] Enunciado:")
     print(statement)
-    result = solve_statement(statement, client)
+    problem_id = test.get("problem_id") or test.get("id")
+    profiler = _profiler(args)
+    t_problem = time.perf_counter()
+    trace: dict = {}
+    with profile_problem(profiler, problem_id, statement=statement):
+        result = solve_statement(statement, client, trace=trace)
+    seconds = time.perf_counter() - t_problem
+    RECORDER.add_problem(problem_id, seconds, result is None)
+    record_answer(statement, result, trace, answer_matches(result, expected), expected, source="practice")
+    if args.corpus:
+        CorpusWriter(args.corpus).append(make_practice_row(problem_id, statement, expected, result, trace, solve=seconds))
+    _write_report(args)
+    _profile_summary(profiler)
     if result is None:
         print("[FAIL] No se pudo resolver el problema de práctica.")
         return 1
@@ -182,62 +410,493 @@ def cmd_practice(args):
     return 0
 
 
+def _practice_batch(args, client: ChallengeClient) -> int:
+    # Muchos problemas de práctica en paralelo; cada uno queda en el corpus local
+    writer = CorpusWriter(args.corpus)
+    print(f"[INFO] Práctica: {args.count} problemas con {args.workers} workers -> {writer.path}")
+
+    def solve(statement: str, trace: dict) -> Optional[Decimal]:
+        return solve_statement(statement, client, trace=trace)
+
+    # Con varios workers cada perfil muestrea solo el hilo de su problema
+    profiler = _profiler(args, all_threads=args.workers <= 1)
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):  # los [WARN] de cada problema se intercalan
+        rows = run_practice_batch(client, solve, args.count, args.workers, writer, profiler)
+    summary = summarize_practice(rows, time.perf_counter() - t0)
+    print(f"[INFO] {summary['problems']} problemas ({summary['errors']} errores) a {summary['per_minute']:.1f}/min; "
+          f"precisión {summary['correct']}/{summary['graded']} ({summary['accuracy']:.1%}); "
+          f"resolver p50={summary['solve']['p50']:.2f}s p95={summary['solve']['p95']:.2f}s")
+    print(f"[INFO] Parser: {parse_stats_summary()} | plantillas: {template_stats_summary()}")
+    _write_report(args)
+    _profile_summary(profiler)
+    return 0 if summary["problems"] else 1
+
+
+def cmd_rescore(args):
+    # Vuelve a resolver un corpus grabado (práctica o bench) en lote y lo compara con lo esperado
+    rows = load_corpus(args.corpus, args.limit)
+    if not rows:
+        print(f"[ERROR] Corpus vacío o ilegible: {args.corpus}")
+        return 1
+    if getattr(args, "protocol", None) == "both":
+        return _compare_protocols(args, rows)
+    print(f"[INFO] Re-evaluando {len(rows)} enunciados con {args.workers} workers")
+    client = _challenge_client()
+    with contextlib.redirect_stdout(io.StringIO()):  # los [WARN] por problema
+        batch = solve_statements([r["statement"] for r in rows], client, workers=args.workers)
+    summary = rescore_summary(rows, batch["results"])
+    for row, result in zip(rows, batch["results"]):
+        record_answer(row["statement"], result["answer"], result, answer_matches(result["answer"], row.get("expected")),
+                      row.get("expected"), source="rescore")
+    t = batch["timings"]
+    print(f"[INFO] {summary['solved']}/{len(rows)} resueltos; precisión {summary['correct']}/{summary['graded']} "
+          f"({summary['accuracy']:.1%}); vs. respuesta grabada: {summary['fixed']} corregidos, {summary['regressed']} empeorados")
+    print(f"[INFO] Entidades: {batch['entities']['references']} referencias, {batch['entities']['distinct']} distintas; "
+          f"{batch['expressions']} expresiones | parse={t['parse']:.2f}s fetch={t['fetch']:.2f}s "
+          f"evaluate={t['evaluate']:.2f}s total={t['total']:.2f}s")
+    print(f"[INFO] Parser: {parse_stats_summary()} | plantillas: {template_stats_summary()}")
+    if args.out:
+        writer = CorpusWriter(args.out)
+        for row, result in zip(rows, batch["results"]):
+            writer.append({**result, "expected": row.get("expected"),
+                           "correct": answer_matches(result["answer"], row.get("expected"))})
+        print(f"[INFO] Resultados -> {args.out}")
+    _write_report(args)
+    return 0
+
+
+def _compare_protocols(args, rows: list[dict]) -> int:
+    # El mismo corpus con cada protocolo de parse, uno tras otro. Sin plantillas, para que
+    # todo enunciado que no resuelve el parser local pase por el LLM en ambas corridas.
+    os.environ["GALACTIC_PARSE_TEMPLATES"] = "off"
+    print(f"[INFO] Comparando protocolos de parse sobre {len(rows)} enunciados con {args.workers} workers (sin plantillas)")
+    client = _challenge_client()
+    statements = [r["statement"] for r in rows]
+    for protocol in PROTOCOLS:
+        os.environ["GALACTIC_PARSE_PROTOCOL"] = protocol
+        PARSE_STATS.clear()
+        LLM_TOKENS.clear()
+        with contextlib.redirect_stdout(io.StringIO()):
+            batch = solve_statements(statements, client, workers=args.workers)
+        summary = rescore_summary(rows, batch["results"])
+        llm = RECORDER.stage_stats("llm", protocol=protocol)
+        print(f"[INFO] {protocol:<8} precisión {summary['correct']}/{summary['graded']} ({summary['accuracy']:.1%}) | "
+              f"parse={batch['timings']['parse']:.2f}s llm p50={llm['p50'] * 1000:.0f}ms p95={llm['p95'] * 1000:.0f}ms "
+              f"| {parse_stats_summary()}")
+    _write_report(args)
+    return 0
+
+
+def _problem_fields(data: dict) -> tuple[Optional[object], Optional[str]]:
+    problem_id = data.get("problem_id") or data.get("id")
+    statement = data.get("statement") or data.get("problem") or data.get("text")
+    return problem_id, statement if isinstance(statement, str) else None
+
+
+def _answer_payload(ans: Optional[Decimal]):
+    if ans is None:
+        # Enviar 0 para pasar al siguiente, estrategia simple
+        print("[INFO] Enviando 0 para continuar al siguiente problema.")
+        return 0
+    print(f"[INFO] Enviando respuesta: {ans:.10f}")
+    return float(ans)  # enviar como número
+
+
+LIMIT_SECONDS = 175  # margen de seguridad
+
+
+def _profiler(args, all_threads: bool = True) -> Optional[ProblemProfiler]:
+    out_dir = getattr(args, "profile", None)
+    if not out_dir:
+        return None
+    return ProblemProfiler(out_dir, args.profile_keep, all_threads=all_threads)
+
+
+def _profile_summary(profiler: Optional[ProblemProfiler]):
+    if profiler is not None:
+        print(f"[INFO] Perfiles: {profiler.summary()}")
+
+
+def _official_summary(args, profiler: Optional[ProblemProfiler]):
+    print("\n[INFO] Fin del intento oficial.")
+    print(f"[INFO] Parser: {parse_stats_summary()} | plantillas: {template_stats_summary()} "
+          f"| prefetch: {prefetch_stats_summary()} | coalescidas: {singleflight_stats_summary()} "
+          f"| diario: {journal_stats_summary()}")
+    _write_report(args)
+    _profile_summary(profiler)
+
+
+def _write_report(args):
+    path = getattr(args, "report", None)
+    if not path:
+        return
+    data = write_report(path)
+    print(f"[INFO] Reporte de tiempos -> {path} ({data['problems']} problemas, "
+          f"{data['problems_per_minute']:.1f} resueltos/min, {data['fallback_seconds']:.1f}s en fallbacks)")
+
+
+def _scheduler(args) -> Optional[Scheduler]:
+    budget = getattr(args, "budget", None)
+    return Scheduler(LIMIT_SECONDS, budget) if budget else None
+
+
 def cmd_official(args):
-    client = ChallengeClient()
+    if getattr(args, "stream", False):
+        os.environ["GALACTIC_STREAM"] = "on"
+    http2 = getattr(args, "http2", False)
+    if http2 and not use_http2():
+        print("[WARN] HTTP/2 no disponible (falta el paquete 'h2'); se usa HTTP/1.1")
+        http2 = False
+    if getattr(args, "use_async", False):
+        return asyncio.run(_official_async(args, http2))
+
+    client = _challenge_client(http2)
+    if not getattr(args, "no_warmup", False):
+        # Antes de iniciar el reloj: conexiones, cachés, índices y evaluador listos
+        print(f"[INFO] Warmup: {describe_warmup(warmup(client))}")
+        RECORDER.reset()  # el reporte cubre solo el intento cronometrado
     start_data = client.start()
-    problem_id = start_data.get("problem_id") or start_data.get("id")
-    statement = start_data.get("statement") or start_data.get("problem") or start_data.get("text")
+    problem_id, statement = _problem_fields(start_data)
 
-    if not problem_id or not isinstance(statement, str):
+    if not problem_id or statement is None:
         print("[ERROR] Respuesta inesperada de /challenge/start:")
         print(start_data)
         return 1
 
     print("[INFO] Comienza el intento oficial (3 minutos)")
     t0 = time.time()
-    LIMIT_SECONDS = 175  # margen de seguridad
+    scheduler = _scheduler(args)
+    profiler = _profiler(args)
 
-    while time.time() - t0 < LIMIT_SECONDS and problem_id and isinstance(statement, str):
+    while time.time() - t0 < LIMIT_SECONDS and problem_id and statement is not None:
         remaining = int(LIMIT_SECONDS - (time.time() - t0))
         print(f"\n[PROBLEMA] ID={problem_id} (tiempo restante ~{remaining}s)")
-        ans = solve_statement(statement, client)
-        if ans is None:
-            # Enviar 0 para pasar al siguiente, estrategia simple
-            answer_payload = 0
-            print("[INFO] Enviando 0 para continuar al siguiente problema.")
-        else:
-            answer_payload = float(ans)  # enviar como número
-            print(f"[INFO] Enviando respuesta: {ans:.10f}")
-        try:
-            resp = client.submit_solution(str(problem_id), answer_payload)
-        except Exception as ex:
-            print(f"[ERROR] Falló el envío de solución: {ex}")
+        budget = scheduler.start_problem() if scheduler else None
+        if budget is not None and budget.exhausted:
+            print("[INFO] No queda tiempo para resolver otro problema")
             break
+        t_problem = time.perf_counter()
+        with profile_problem(profiler, problem_id, statement=statement):
+            # Un enunciado que la práctica ya verificó se responde sin parse ni red
+            ans = lookup_answer(statement)
+            if ans is not None:
+                print("[INFO] Respuesta verificada en práctica (diario)")
+            else:
+                trace: dict = {}
+                ans = solve_statement(statement, client, budget, trace)
+                record_answer(statement, ans, trace, source="official")
+            answer_payload = _answer_payload(ans)
+            try:
+                with span("submit"):
+                    resp = run_stage(budget, "submit", client.submit_solution, str(problem_id), answer_payload)
+            except Exception as ex:
+                print(f"[ERROR] Falló el envío de solución: {ex}")
+                break
+            finally:
+                RECORDER.add_problem(problem_id, time.perf_counter() - t_problem, ans is None)
         # Siguiente problema
-        problem_id = resp.get("problem_id") or resp.get("id")
-        statement = resp.get("statement") or resp.get("problem") or resp.get("text")
+        problem_id, statement = _problem_fields(resp)
 
-    print("\n[INFO] Fin del intento oficial.")
+    _official_summary(args, profiler)
     return 0
 
 
-def main():
-    load_dotenv()  # cargar .env si existe
+async def _official_async(args, http2: bool = False):
+    client = AsyncChallengeClient(http2=http2)
+    try:
+        if not getattr(args, "no_warmup", False):
+            print(f"[INFO] Warmup: {describe_warmup(await awarmup(client))}")
+            RECORDER.reset()
+        start_data = await client.start()
+        problem_id, statement = _problem_fields(start_data)
+
+        if not problem_id or statement is None:
+            print("[ERROR] Respuesta inesperada de /challenge/start:")
+            print(start_data)
+            return 1
+
+        print("[INFO] Comienza el intento oficial (3 minutos, modo async)")
+        t0 = time.time()
+        scheduler = _scheduler(args)
+        profiler = _profiler(args)
+
+        while time.time() - t0 < LIMIT_SECONDS and problem_id and statement is not None:
+            remaining = int(LIMIT_SECONDS - (time.time() - t0))
+            print(f"\n[PROBLEMA] ID={problem_id} (tiempo restante ~{remaining}s)")
+            budget = scheduler.start_problem() if scheduler else None
+            if budget is not None and budget.exhausted:
+                print("[INFO] No queda tiempo para resolver otro problema")
+                break
+            t_problem = time.perf_counter()
+            with profile_problem(profiler, problem_id, statement=statement):
+                ans = lookup_answer(statement)
+                if ans is not None:
+                    print("[INFO] Respuesta verificada en práctica (diario)")
+                else:
+                    trace: dict = {}
+                    ans = await asolve_statement(statement, client, budget, trace)
+                    record_answer(statement, ans, trace, source="official")
+                answer_payload = _answer_payload(ans)
+                try:
+                    with span("submit"):
+                        resp = await arun_stage(budget, "submit", client.submit_solution(str(problem_id), answer_payload))
+                except Exception as ex:
+                    print(f"[ERROR] Falló el envío de solución: {ex}")
+                    break
+                finally:
+                    RECORDER.add_problem(problem_id, time.perf_counter() - t_problem, ans is None)
+            problem_id, statement = _problem_fields(resp)
+
+        _official_summary(args, profiler)
+        return 0
+    finally:
+        await client.aclose()
+
+
+def cmd_sync(args):
+    t0 = time.time()
+    try:
+        counts = swapi.sync()
+    except Exception as ex:
+        print(f"[ERROR] Falló la sincronización con SWAPI: {ex}")
+        return 1
+    print(f"[INFO] Índice SWAPI actualizado: {counts['people']} personajes, {counts['planets']} planetas ({time.time() - t0:.1f}s) -> {swapi.index_path()}")
+    try:
+        n = pokeapi.sync_names()
+    except Exception as ex:
+        print(f"[ERROR] Falló la descarga de nombres de PokéAPI: {ex}")
+        return 1
+    print(f"[INFO] Nombres de Pokémon: {n} -> {pokeapi.names_path()}")
+    return 0
+
+
+def cmd_import_pokedex(args):
+    t0 = time.time()
+    try:
+        out = pokeapi.import_pokedex(workers=args.workers)
+    except Exception as ex:
+        print(f"[ERROR] Falló la importación de PokéAPI: {ex}")
+        return 1
+    size = os.path.getsize(poketable.table_path())
+    print(f"[INFO] Tabla de Pokémon: {out['imported']} entradas, {size / 1024:.0f} KiB ({time.time() - t0:.1f}s) "
+          f"-> {poketable.table_path()}")
+    if out["failed"]:
+        shown = ", ".join(out["failed"][:10]) + (", ..." if len(out["failed"]) > 10 else "")
+        print(f"[WARN] {len(out['failed'])} Pokémon no se pudieron descargar (se pedirán a la API al usarlos): {shown}")
+    return 0
+
 
+def cmd_query(args):
+    # Evalúa una fórmula sobre todo el catálogo local de un tipo de entidad
+    try:
+        out = catalog_query.query(args.entity, args.expression, top=None if args.all else args.top,
+                                  descending=not args.asc, minimum=args.min, maximum=args.max,
+                                  exact=args.exact, use_numpy=False if args.no_numpy else None)
+    except catalog_query.QueryError as ex:
+        print(f"[ERROR] {ex}")
+        return 1
+    if not out["catalog"]:
+        hint = "import-pokedex" if out["type"] == "pokemon" else "sync"
+        print(f"[ERROR] Catálogo local vacío para {out['type']}; ejecuta primero `{hint}`.")
+        return 1
+    if args.json:
+        print(json.dumps({**out, "rows": [[n, str(v) if args.exact else v] for n, v in out["rows"]]}, ensure_ascii=False))
+        return 0
+    print(f"[INFO] {out['expression']} sobre {out['catalog']} {out['type']} ({out['engine']}): "
+          f"{out['matched']} resultados, {out['masked']} sin valor")
+    for rank, (name, value) in enumerate(out["rows"], 1):
+        shown = f"{value:.10f}" if args.exact else f"{value:.6g}"
+        print(f"{rank:>4}. {name:<30} {shown}")
+    return 0
+
+
+def _add_cassette_args(p: argparse.ArgumentParser):
+    group = p.add_mutually_exclusive_group()
+    group.add_argument("--record", metavar="CASSETTE",
+                       help="Graba cada petición/respuesta HTTP (desafío, SWAPI, PokéAPI) en un archivo JSONL")
+    group.add_argument("--replay", metavar="CASSETTE",
+                       help="Responde desde una grabación previa sin usar la red")
+    p.add_argument("--replay-latency", metavar="recorded|SECONDS",
+                   help="Con --replay: espera la latencia grabada ('recorded') o un fijo en segundos por respuesta")
+
+
+def _add_protocol_arg(p: argparse.ArgumentParser, compare: bool = False):
+    choices = PROTOCOLS + (("both",) if compare else ())
+    p.add_argument("--protocol", choices=choices,
+                   help="Protocolo de parse con el LLM: full (prompt completo) o compact (esquema corto, "
+                        "max_tokens, sin campos sin uso)" + ("; both compara los dos sobre el corpus" if compare else ""))
+
+
+def _add_profile_args(p: argparse.ArgumentParser):
+    p.add_argument("--profile", metavar="DIR", nargs="?", const=profile_dir(),
+                   help=f"Perfila cada problema (cProfile .pstats + pilas colapsadas para flamegraph) y guarda "
+                        f"los más lentos en DIR (por defecto {profile_dir()})")
+    p.add_argument("--profile-keep", type=int, default=PROFILE_KEEP, metavar="N",
+                   help=f"Cuántos perfiles (los problemas más lentos) conservar (por defecto {PROFILE_KEEP})")
+
+
+def _use_cassette(args) -> Optional["transport.Cassette"]:
+    # --record/--replay, else GALACTIC_CASSETTE
+    path = getattr(args, "record", None) or getattr(args, "replay", None)
+    latency = getattr(args, "replay_latency", None)
+    if latency is not None and not getattr(args, "replay", None):
+        raise SystemExit("[ERROR] --replay-latency solo se usa junto con --replay")
+    if not path and not os.getenv("GALACTIC_CASSETTE") and "galactic_solver.transport" not in sys.modules:
+        return None  # sin grabación: transport (y httpx) se importan con el primer cliente HTTP
+    from galactic_solver import transport
+    if not path:
+        latency = os.getenv("GALACTIC_REPLAY_LATENCY") if os.getenv("GALACTIC_CASSETTE") else None
+    option = "--replay-latency" if path else "GALACTIC_REPLAY_LATENCY"
+    try:
+        latency = transport.parse_latency(latency)
+    except ValueError as ex:
+        raise SystemExit(f"[ERROR] {option} inválido: {ex}")
+    previous = transport.active()
+    try:
+        if path:
+            cassette = transport.install(path, "record" if args.record else "replay", latency)
+        else:
+            path = os.getenv("GALACTIC_CASSETTE")
+            cassette = transport.configure_from_env()
+    except (OSError, ValueError) as ex:
+        raise SystemExit(f"[ERROR] No se pudo abrir la grabación {path}: {ex}")
+    if cassette is not previous:
+        rebuild_clients()
+    if cassette is not None and cassette.mode == "replay":
+        print(f"[INFO] Reproduciendo {len(cassette)} respuestas grabadas de {path}")
+    return cassette
+
+
+def cmd_serve(args):
+    if args.stop:
+        if not daemon.stop():
+            print(f"[WARN] No hay un daemon escuchando en {daemon.socket_path()}")
+            return 1
+        print("[INFO] Daemon detenido")
+        return 0
+    if daemon.running():
+        print(f"[ERROR] Ya hay un daemon escuchando en {daemon.socket_path()}")
+        return 1
+    if not args.no_warmup:
+        print(f"[INFO] Warmup: {describe_warmup(warmup(_challenge_client()))}")
+    return daemon.serve(run, reset=_reset_process_state)
+
+
+def _reset_process_state():
+    # Tras cada comando de `serve`: lo que `official --http2` cambió solo para sí no pasa al
+    # siguiente. El cliente HTTP/1.1 del desafío sigue abierto: su token y URL vienen del
+    # entorno, que el daemon solo comparte con quien tiene el mismo (daemon.solver_env)
+    client = _CHALLENGE_CLIENTS.pop(True, None)
+    if client is not None:
+        client.close()
+    if http2_clients():
+        rebuild_clients()
+
+
+def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="galacticSolver - Desafío cronometrado")
     sub = parser.add_subparsers(dest="command")
 
     p1 = sub.add_parser("practice", help="Ejecuta el endpoint de práctica y resuelve el problema retornado")
+    p1.add_argument("--workers", type=int, default=1, help="Problemas de práctica en paralelo")
+    p1.add_argument("--count", type=int, default=1, help="Cantidad de problemas de práctica a resolver")
+    p1.add_argument("--corpus", metavar="PATH",
+                    help=f"Agrega cada problema (enunciado, parse, entidades, respuesta, tiempos) a un JSONL "
+                         f"(en modo lote por defecto {corpus_path()})")
+    p1.add_argument("--report", metavar="PATH", help="Escribe un reporte de tiempos por etapa (JSON, o CSV si termina en .csv)")
+    _add_protocol_arg(p1)
+    _add_profile_args(p1)
+    _add_cassette_args(p1)
     p1.set_defaults(func=cmd_practice)
 
     p2 = sub.add_parser("official", help="Inicia el intento oficial (3 minutos)")
+    p2.add_argument("--async", dest="use_async", action="store_true",
+                    help="Resuelve entidades y planetas natales en paralelo (httpx.AsyncClient)")
+    p2.add_argument("--no-warmup", dest="no_warmup", action="store_true",
+                    help="No precalentar conexiones/cachés antes de iniciar el reloj")
+    p2.add_argument("--http2", action="store_true", help="Usa HTTP/2 si está instalado el paquete 'h2'")
+    p2.add_argument("--stream", action="store_true",
+                    help="Pide el parse al LLM en streaming y resuelve cada entidad apenas llega")
+    p2.add_argument("--budget", type=float, metavar="SECONDS", nargs="?", const=PROBLEM_BUDGET,
+                    help=f"Presupuesto por problema (por defecto {PROBLEM_BUDGET:g}s) repartido entre parse/resolve/evaluate; "
+                         "una etapa que lo excede se abandona y se envía la respuesta de respaldo")
+    p2.add_argument("--report", metavar="PATH", help="Escribe un reporte de tiempos por etapa (JSON, o CSV si termina en .csv)")
+    _add_protocol_arg(p2)
+    _add_profile_args(p2)
+    _add_cassette_args(p2)
     p2.set_defaults(func=cmd_official)
 
-    args = parser.parse_args()
+    p3 = sub.add_parser("sync", help="Descarga personajes y planetas de SWAPI y nombres de Pokémon y construye el índice local")
+    p3.set_defaults(func=cmd_sync)
+
+    p5 = sub.add_parser("rescore", help="Vuelve a resolver un corpus JSONL (práctica o bench) en lote y mide la precisión")
+    p5.add_argument("corpus", nargs="?", default=corpus_path(), help=f"Corpus JSONL (por defecto {corpus_path()})")
+    p5.add_argument("--workers", type=int, default=BATCH_WORKERS, help="Parses en paralelo (llamadas al proxy de chat)")
+    p5.add_argument("--limit", type=int, help="Solo los primeros N enunciados")
+    p5.add_argument("--out", metavar="PATH", help="Escribe el resultado de cada enunciado en un JSONL")
+    p5.add_argument("--report", metavar="PATH", help="Escribe un reporte de tiempos por etapa (JSON, o CSV si termina en .csv)")
+    _add_protocol_arg(p5, compare=True)
+    _add_cassette_args(p5)
+    p5.set_defaults(func=cmd_rescore)
+
+    p6 = sub.add_parser("query", help="Evalúa una fórmula sobre todo el catálogo local (planetas, personajes o Pokémon)")
+    p6.add_argument("entity", help="planet | character | pokemon")
+    p6.add_argument("expression", help="Expresión sobre atributos del tipo, p.ej. 'diameter / rotation_period'")
+    p6.add_argument("--top", type=int, default=10, help="Cuántos resultados mostrar (por defecto 10)")
+    p6.add_argument("--all", action="store_true", help="Muestra todos los resultados")
+    p6.add_argument("--asc", action="store_true", help="Orden ascendente (por defecto, los mayores primero)")
+    p6.add_argument("--min", type=float, help="Solo resultados >= MIN")
+    p6.add_argument("--max", type=float, help="Solo resultados <= MAX")
+    p6.add_argument("--exact", action="store_true",
+                    help="Evalúa cada fila con el evaluador Decimal del solver (valores con round10 exactos)")
+    p6.add_argument("--no-numpy", dest="no_numpy", action="store_true", help="No usar NumPy aunque esté instalado")
+    p6.add_argument("--json", action="store_true", help="Salida JSON")
+    p6.set_defaults(func=cmd_query)
+
+    p4 = sub.add_parser("import-pokedex", help="Descarga toda la Pokédex una vez y escribe la tabla binaria local")
+    p4.add_argument("--workers", type=int, default=16, help="Descargas en paralelo")
+    p4.set_defaults(func=cmd_import_pokedex)
+
+    p7 = sub.add_parser("serve", help="Mantiene el solver residente (conexiones y cachés calientes); "
+                                      "los demás comandos se ejecutan en él")
+    p7.add_argument("--stop", action="store_true", help="Detiene el daemon en ejecución")
+    p7.add_argument("--no-warmup", dest="no_warmup", action="store_true",
+                    help="No precalentar conexiones/cachés al iniciar")
+    p7.set_defaults(func=cmd_serve)
+    return parser
+
+
+def _reset_run_state():
+    # Estadísticas por comando: en `serve` el proceso atiende muchos
+    RECORDER.reset()
+    for stats in (PARSE_STATS, LLM_TOKENS, TEMPLATE_STATS, PREFETCH_STATS, SINGLEFLIGHT_STATS, JOURNAL_STATS):
+        stats.clear()
+
+
+def run(argv: List[str]) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
     if not args.command:
         parser.print_help()
         return 0
-    return args.func(args)
+    _reset_run_state()
+    if getattr(args, "protocol", None) in PROTOCOLS:
+        os.environ["GALACTIC_PARSE_PROTOCOL"] = args.protocol
+    cassette = _use_cassette(args)
+    try:
+        return args.func(args)
+    finally:
+        if cassette is not None:
+            print(f"[INFO] Grabación: {cassette.summary()}")
+
+
+def main():
+    code = run(sys.argv[1:])
+    if daemon.timing_enabled():
+        print(f"[INFO] Arranque: imports {IMPORT_SECONDS * 1000:.0f}ms, "
+              f"{(time.perf_counter() - _STARTED) * 1000:.0f}ms en total", file=sys.stderr)
+    return code
 
 
 if __name__ == "__main__":
@@ -0,0 +1,155 @@
+from __future__ import annotations
+import json
+import random
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+from galactic_solver.evaluator import eval_expression
+from galactic_solver.utils import parse_decimal
+
+# Stand-in catalog served by the fake SWAPI/PokéAPI servers and used to compute the
+# expected answer of every generated problem.
+
+PLANETS: List[Dict[str, str]] = [
+    {"name": "Tatooine", "rotation_period": "23", "orbital_period": "304", "diameter": "10465", "surface_water": "1", "population": "200000"},
+    {"name": "Alderaan", "rotation_period": "24", "orbital_period": "364", "diameter": "12500", "surface_water": "40", "population": "2000000000"},
+    {"name": "Yavin IV", "rotation_period": "24", "orbital_period": "4818", "diameter": "10200", "surface_water": "8", "population": "1000"},
+    {"name": "Hoth", "rotation_period": "23", "orbital_period": "549", "diameter": "7200", "surface_water": "100", "population": "unknown"},
+    {"name": "Dagobah", "rotation_period": "23", "orbital_period": "341", "diameter": "8900", "surface_water": "8", "population": "unknown"},
+    {"name": "Bespin", "rotation_period": "12", "orbital_period": "5110", "diameter": "118000", "surface_water": "0", "population": "6000000"},
+    {"name": "Endor", "rotation_period": "18", "orbital_period": "402", "diameter": "4900", "surface_water": "8", "population": "30000000"},
+    {"name": "Naboo", "rotation_period": "26", "orbital_period": "312", "diameter": "12120", "surface_water": "12", "population": "4500000000"},
+    {"name": "Coruscant", "rotation_period": "24", "orbital_period": "368", "diameter": "12240", "surface_water": "unknown", "population": "1000000000000"},
+    {"name": "Kamino", "rotation_period": "27", "orbital_period": "463", "diameter": "19720", "surface_water": "100", "population": "1000000000"},
+]
+
+# homeworld is an index into PLANETS
+PEOPLE: List[Dict[str, Any]] = [
+    {"name": "Luke Skywalker", "height": "172", "mass": "77", "homeworld": 0},
+    {"name": "C-3PO", "height": "167", "mass": "75", "homeworld": 0},
+    {"name": "R2-D2", "height": "96", "mass": "32", "homeworld": 7},
+    {"name": "Darth Vader", "height": "202", "mass": "136", "homeworld": 0},
+    {"name": "Leia Organa", "height": "150", "mass": "49", "homeworld": 1},
+    {"name": "Obi-Wan Kenobi", "height": "182", "mass": "77", "homeworld": 0},
+    {"name": "Han Solo", "height": "180", "mass": "80", "homeworld": 8},
+    {"name": "Chewbacca", "height": "228", "mass": "112", "homeworld": 9},
+    {"name": "Yoda", "height": "66", "mass": "17", "homeworld": 4},
+    {"name": "Padmé Amidala", "height": "185", "mass": "45", "homeworld": 7},
+]
+
+POKEMON: Dict[str, Dict[str, int]] = {
+    "pikachu": {"base_experience": 112, "height": 4, "weight": 60},
+    "bulbasaur": {"base_experience": 64, "height": 7, "weight": 69},
+    "charmander": {"base_experience": 62, "height": 6, "weight": 85},
+    "squirtle": {"base_experience": 63, "height": 5, "weight": 90},
+    "snorlax": {"base_experience": 189, "height": 21, "weight": 4600},
+    "gengar": {"base_experience": 250, "height": 15, "weight": 405},
+    "mewtwo": {"base_experience": 340, "height": 20, "weight": 1220},
+    "eevee": {"base_experience": 65, "height": 3, "weight": 65},
+    "heatran": {"base_experience": 300, "height": 17, "weight": 4300},
+    "mr-mime": {"base_experience": 161, "height": 13, "weight": 545},
+}
+
+_ATTR_WORDS = {
+    ("sw_character", "height"): "la altura",
+    ("sw_character", "mass"): "la masa",
+    ("sw_planet", "population"): "la población",
+    ("sw_planet", "diameter"): "el diámetro",
+    ("sw_planet", "orbital_period"): "el período orbital",
+    ("sw_planet", "rotation_period"): "el período de rotación",
+    ("sw_planet", "surface_water"): "el agua superficial",
+    ("pokemon", "base_experience"): "la experiencia base",
+    ("pokemon", "height"): "la altura",
+    ("pokemon", "weight"): "el peso",
+}
+_OP_WORDS = {"+": "más", "-": "menos", "*": "multiplicado por", "/": "dividido por"}
+
+
+def _display_name(etype: str, name: str) -> str:
+    return name.replace("-", " ").title() if etype == "pokemon" else name
+
+
+def _entity_value(etype: str, name: str, attr: str) -> Any:
+    if etype == "pokemon":
+        return POKEMON[name][attr]
+    rows = PEOPLE if etype == "sw_character" else PLANETS
+    for row in rows:
+        if row["name"] == name:
+            return row[attr]
+    raise KeyError(name)
+
+
+def expected_answer(parsed: Dict[str, Any]) -> Optional[Decimal]:
+    # Same semantics as the solver: unknown values or division by zero -> no answer
+    variables: Dict[str, Any] = {}
+    for var, spec in parsed["vars"].items():
+        ent = parsed["entities"][spec["entity"]]
+        value = parse_decimal(_entity_value(ent["type"], ent["name"], spec["attribute"]))
+        if value is None:
+            return None
+        variables[var] = value
+    try:
+        return eval_expression(parsed["expression"], variables)
+    except ZeroDivisionError:
+        return None
+
+
+def _random_entity(rng: random.Random) -> tuple[str, str, str]:
+    etype = rng.choice(["sw_character", "sw_planet", "pokemon"])
+    if etype == "pokemon":
+        name = rng.choice(sorted(POKEMON))
+    else:
+        name = rng.choice(PEOPLE if etype == "sw_character" else PLANETS)["name"]
+    attr = rng.choice([a for t, a in _ATTR_WORDS if t == etype])
+    return etype, name, attr
+
+
+def generate(n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    # Two or three operands joined by the usual operator phrasings; a third of the
+    # statements use a narrative wording the local rule parser leaves to the LLM
+    rng = random.Random(seed)
+    problems: List[Dict[str, Any]] = []
+    while len(problems) < n:
+        k = rng.choice([2, 2, 3])
+        picks = [_random_entity(rng) for _ in range(k)]
+        ops = [rng.choice("+-*/") for _ in range(k - 1)]
+        if len({o in "+-" for o in ops}) > 1:
+            continue  # mixed precedence reads ambiguously in prose
+        entities: List[Dict[str, str]] = []
+        vars_spec: Dict[str, Dict[str, Any]] = {}
+        phrases = []
+        for i, (etype, name, attr) in enumerate(picks):
+            ent = {"type": etype, "name": name}
+            if ent not in entities:
+                entities.append(ent)
+            vars_spec[f"x{i + 1}"] = {"entity": entities.index(ent), "attribute": attr}
+            phrases.append(f"{_ATTR_WORDS[(etype, attr)]} de {_display_name(etype, name)}")
+        expression = " ".join(f"{op} x{i + 2}" for i, op in enumerate(ops))
+        expression = f"x1 {expression}"
+        body = phrases[0] + "".join(f" {_OP_WORDS[op]} {p}" for op, p in zip(ops, phrases[1:]))
+        if rng.random() < 1 / 3:
+            statement = f"En una galaxia muy, muy lejana, alguien quiere saber cuánto da {body}. ¿Cuál es el resultado?"
+        else:
+            statement = f"¿Cuál es {body}?"
+        parsed = {"entities": entities, "vars": vars_spec, "expression": expression}
+        answer = expected_answer(parsed)
+        problems.append({
+            "statement": statement,
+            "parse": parsed,
+            "expected": float(answer) if answer is not None else None,
+        })
+    return problems
+
+
+def load(path: str) -> List[Dict[str, Any]]:
+    # JSONL corpus with at least statement/parse/expected per line
+    problems = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            row = json.loads(line)
+            if isinstance(row.get("statement"), str) and isinstance(row.get("parse"), dict):
+                problems.append(row)
+    return problems
@@ -0,0 +1,295 @@
+from __future__ import annotations
+import json
+import math
+import random
+import sys
+import threading
+import time
+import urllib.parse
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+from . import corpus
+
+# Local stand-ins for the challenge API (with its chat proxy), SWAPI and PokéAPI. Each
+# server adds latency/jitter and fails a fraction of requests with a 503 so the client
+# paths for slow hosts, retries and mirror fallback are exercised too.
+
+
+@dataclass
+class Faults:
+    latency: float = 0.0      # seconds added to every response
+    jitter: float = 0.0       # +/- uniform seconds on top of latency
+    failure_rate: float = 0.0  # fraction of requests answered with 503
+    seed: int = 0
+    _rng: random.Random = field(init=False, repr=False)
+    _lock: threading.Lock = field(init=False, repr=False, default_factory=threading.Lock)
+
+    def __post_init__(self):
+        self._rng = random.Random(self.seed)
+
+    def draw(self) -> tuple[float, bool]:
+        # (delay, fail) for one request
+        with self._lock:
+            delay = self.latency + self._rng.uniform(-self.jitter, self.jitter)
+            fail = self._rng.random() < self.failure_rate
+        return max(delay, 0.0), fail
+
+    def apply(self) -> bool:
+        # Sleeps the configured delay; True when this request should fail
+        delay, fail = self.draw()
+        if delay > 0:
+            time.sleep(delay)
+        return fail
+
+
+def _tokens(text: str) -> int:
+    # Rough tokenizer estimate: ~4 characters per token
+    return max(1, len(text) // 4)
+
+
+@dataclass
+class EventStream:
+    # Server-sent events written one by one, `first` seconds before the first and
+    # `interval` seconds between the following ones (chunked transfer encoding)
+    events: List[str]
+    first: float = 0.0
+    interval: float = 0.0
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real hosts
+    server: "_Server"
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, obj: Any, code: int = 200):
+        body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _event_stream(self, stream: EventStream):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i, event in enumerate(stream.events):
+            delay = stream.first if i == 0 else stream.interval
+            if delay > 0:
+                time.sleep(delay)
+            data = f"data: {event}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _body(self) -> Dict[str, Any]:
+        n = int(self.headers.get("Content-Length") or 0)
+        try:
+            return json.loads(self.rfile.read(n) or b"{}")
+        except ValueError:
+            return {}
+
+    def _dispatch(self, method: str):
+        self.server.requests += 1
+        if self.server.faults.apply():
+            return self._json({"detail": "Service Unavailable"}, 503)
+        url = urllib.parse.urlsplit(self.path)
+        query = {k: v[0] for k, v in urllib.parse.parse_qs(url.query).items()}
+        body = self._body() if method == "POST" else {}
+        result = self.server.route(method, url.path, query, body)
+        if result is None:
+            return self._json({"detail": "Not found"}, 404)
+        if isinstance(result, EventStream):
+            return self._event_stream(result)
+        self._json(*result) if isinstance(result, tuple) else self._json(result)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_HEAD(self):
+        self.server.requests += 1
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, faults: Optional[Faults] = None):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.faults = faults or Faults()
+        self.requests = 0
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def start(self) -> "_Server":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def handle_error(self, request, client_address):
+        # Clients dropping keep-alive connections at the end of a run is expected
+        if isinstance(sys.exc_info()[1], (ConnectionError, TimeoutError)):
+            return
+        super().handle_error(request, client_address)
+
+    def route(self, method: str, path: str, query: Dict[str, str], body: Dict[str, Any]):
+        raise NotImplementedError
+
+
+class SwapiServer(_Server):
+    PAGE_SIZE = 10
+
+    def _planet(self, i: int) -> Dict[str, Any]:
+        return {**corpus.PLANETS[i], "url": f"{self.url}/api/planets/{i + 1}/"}
+
+    def _person(self, i: int) -> Dict[str, Any]:
+        p = corpus.PEOPLE[i]
+        return {"name": p["name"], "height": p["height"], "mass": p["mass"],
+                "homeworld": f"{self.url}/api/planets/{p['homeworld'] + 1}/",
+                "url": f"{self.url}/api/people/{i + 1}/"}
+
+    def route(self, method, path, query, body):
+        if path in ("/api", "/api/"):
+            return {"people": f"{self.url}/api/people/", "planets": f"{self.url}/api/planets/"}
+        for endpoint, rows, render in (("people", corpus.PEOPLE, self._person), ("planets", corpus.PLANETS, self._planet)):
+            prefix = f"/api/{endpoint}/"
+            if path == prefix:
+                if "search" in query:
+                    needle = query["search"].lower()
+                    results = [render(i) for i, r in enumerate(rows) if needle in r["name"].lower()]
+                    return {"count": len(results), "next": None, "previous": None, "results": results}
+                page = int(query.get("page") or 1)
+                start = (page - 1) * self.PAGE_SIZE
+                results = [render(i) for i in range(start, min(start + self.PAGE_SIZE, len(rows)))]
+                nxt = f"{self.url}{prefix}?page={page + 1}" if start + self.PAGE_SIZE < len(rows) else None
+                return {"count": len(rows), "next": nxt, "previous": None, "results": results}
+            if path.startswith(prefix):
+                try:
+                    i = int(path[len(prefix):].strip("/")) - 1
+                except ValueError:
+                    return None
+                return render(i) if 0 <= i < len(rows) else None
+        return None
+
+
+class PokeApiServer(_Server):
+    def route(self, method, path, query, body):
+        if path in ("/api/v2", "/api/v2/"):
+            return {"pokemon": f"{self.url}/api/v2/pokemon/"}
+        if path.rstrip("/") == "/api/v2/pokemon":
+            return {"count": len(corpus.POKEMON), "next": None, "previous": None,
+                    "results": [{"name": n, "url": f"{self.url}/api/v2/pokemon/{n}/"} for n in corpus.POKEMON]}
+        if path.startswith("/api/v2/pokemon/"):
+            name = path.rstrip("/").rsplit("/", 1)[-1]
+            stats = corpus.POKEMON.get(name)
+            if stats is None:
+                return None
+            # Real responses are large; pad so JSON decoding costs something
+            return {"name": name, **stats, "moves": [{"move": {"name": "tackle"}}] * 80}
+        return None
+
+
+class ChallengeServer(_Server):
+    """Serves the corpus in order (cycling), grades every submitted answer and times
+    each problem from the moment it was handed out until its solution arrived."""
+
+    CHUNK_CHARS = 8  # streamed answer: roughly a few tokens per event
+
+    def __init__(self, problems: List[Dict[str, Any]], faults: Optional[Faults] = None,
+                 chat_faults: Optional[Faults] = None, token_latency: float = 0.0):
+        super().__init__(faults)
+        self.problems = problems
+        self.chat_faults = chat_faults or Faults()
+        # Seconds per generated token on top of chat_faults (prompt tokens cost a tenth)
+        self.token_latency = token_latency
+        self._by_statement = {p["statement"]: p for p in problems}
+        self._lock = threading.Lock()
+        self._next = 0
+        self._issued: Dict[str, tuple[Dict[str, Any], float]] = {}
+        self.results: List[Dict[str, Any]] = []
+        self.chat_calls = 0
+
+    def _issue(self) -> Dict[str, Any]:
+        with self._lock:
+            n = self._next
+            self._next += 1
+            problem = self.problems[n % len(self.problems)]
+            problem_id = f"p{n}"
+            self._issued[problem_id] = (problem, time.perf_counter())
+        return {"problem_id": problem_id, "statement": problem["statement"]}
+
+    def _grade(self, body: Dict[str, Any]):
+        with self._lock:
+            problem, t0 = self._issued.pop(str(body.get("problem_id")), (None, None))
+        if problem is None:
+            return
+        answer, expected = body.get("answer"), problem.get("expected")
+        if expected is None:
+            correct = answer in (0, None)  # the solver sends 0 for unsolvable problems
+        else:
+            correct = isinstance(answer, (int, float)) and math.isclose(answer, expected, rel_tol=1e-9, abs_tol=1e-9)
+        with self._lock:
+            self.results.append({"seconds": time.perf_counter() - t0, "correct": correct,
+                                 "unsolvable": expected is None, "statement": problem["statement"],
+                                 "answer": answer, "expected": expected})
+
+    def route(self, method, path, query, body):
+        if method == "GET" and path in ("/challenge/start", "/challenge/test"):
+            data = self._issue()
+            if path == "/challenge/test":
+                data["expected"] = self.problems[int(data["problem_id"][1:]) % len(self.problems)]["expected"]
+            return data
+        if method == "POST" and path == "/challenge/solution":
+            self._grade(body)
+            return self._issue()
+        if method == "POST" and path == "/chat_completion":
+            self.chat_calls += 1
+            delay, fail = self.chat_faults.draw()
+            messages = body.get("messages") or []
+            # The statement is the first user message (a retry appends a correction request)
+            statement = next((m.get("content") for m in messages if m.get("role") == "user"), None)
+            problem = self._by_statement.get(statement)
+            content = self._answer(messages, problem["parse"]) if problem else "{}"
+            usage = {"prompt_tokens": sum(_tokens(str(m.get("content") or "")) for m in messages),
+                     "completion_tokens": _tokens(content)}
+            delay += self.token_latency * (usage["completion_tokens"] + usage["prompt_tokens"] / 10)
+            if body.get("stream") and not fail:
+                return self._chat_stream(content, delay)
+            time.sleep(delay)
+            if fail:
+                return {"detail": "Upstream error"}, 503
+            return {"choices": [{"message": {"role": "assistant", "content": content}}], "usage": usage}
+        return None
+
+    @staticmethod
+    def _answer(messages: List[Dict[str, Any]], parse: Dict[str, Any]) -> str:
+        # Follows whichever protocol the developer prompt asks for
+        from galactic_solver.nlu_parser import COMPACT_DEV_MSG, encode_compact
+        prompt = messages[0].get("content") if messages else None
+        if prompt == COMPACT_DEV_MSG:
+            return json.dumps(encode_compact(parse), ensure_ascii=False)
+        return json.dumps({**parse, "notes": ""}, ensure_ascii=False)
+
+    @classmethod
+    def _chat_stream(cls, content: str, delay: float) -> EventStream:
+        # Same total time as the plain answer: a fifth before the first token, the rest
+        # spread over the chunks
+        pieces = [content[i:i + cls.CHUNK_CHARS] for i in range(0, len(content), cls.CHUNK_CHARS)] or [""]
+        events = [json.dumps({"choices": [{"delta": {"content": p}}]}, ensure_ascii=False) for p in pieces]
+        return EventStream(events + ["[DONE]"], first=delay * 0.2, interval=delay * 0.8 / len(events))
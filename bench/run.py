@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""Offline benchmark of the official loop.
+
+Starts the local stand-in servers, points every client at them through the usual
+environment variables and runs ``cmd_official`` for ``--seconds`` on a seeded corpus:
+
+    python -m bench.run --seconds 30 --latency 0.05 --chat-latency 0.4 --async
+
+The JSON report (bench/results/ by default) records the commit and configuration, so
+runs with the same flags can be compared across commits (``--baseline`` prints deltas).
+"""
+from __future__ import annotations
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+from . import corpus
+from .fake_servers import ChallengeServer, Faults, PokeApiServer, SwapiServer
+
+OFFICIAL_SECONDS = 175
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(RESULTS_DIR), timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    from galactic_solver.metrics import _percentile
+    vs = sorted(values)
+    return {
+        "count": len(vs),
+        "mean": sum(vs) / len(vs) if vs else 0.0,
+        "p50": _percentile(vs, 0.50),
+        "p90": _percentile(vs, 0.90),
+        "p95": _percentile(vs, 0.95),
+        "p99": _percentile(vs, 0.99),
+        "max": vs[-1] if vs else 0.0,
+    }
+
+
+def _configure_env(challenge: ChallengeServer, mirrors: List[SwapiServer], poke: PokeApiServer,
+                   cache_dir: str, args):
+    # Must run before galactic_solver is imported: base URLs and paths are read at import
+    os.environ.update({
+        "CHALLENGE_BASE_URL": challenge.url,
+        "CHALLENGE_TOKEN": "bench",
+        "SWAPI_BASE_URLS": ",".join(f"{m.url}/api" for m in mirrors),
+        "POKEAPI_BASE_URL": f"{poke.url}/api/v2",
+        "GALACTIC_CACHE_DIR": cache_dir,
+    })
+    for var in ("SWAPI_BASE_URL", "SWAPI_INDEX_PATH", "POKEAPI_NAMES_PATH", "POKEAPI_TABLE_PATH",
+                "GALACTIC_CACHE_PATH", "GALACTIC_TEMPLATES_PATH", "GALACTIC_JOURNAL_PATH"):
+        os.environ.pop(var, None)
+    os.environ["GALACTIC_PARSE_PROTOCOL"] = args.protocol
+    if args.hedge_delay:
+        os.environ["SWAPI_HEDGE_DELAY"] = str(args.hedge_delay)
+    else:
+        os.environ.pop("SWAPI_HEDGE_DELAY", None)
+
+
+def run(args) -> Dict[str, Any]:
+    problems = corpus.load(args.corpus) if args.corpus else corpus.generate(args.problems, seed=args.seed)
+    if not problems:
+        raise SystemExit("[ERROR] Corpus vacío")
+
+    def faults(latency: float, offset: int) -> Faults:
+        return Faults(latency, args.jitter, args.failure_rate, seed=args.seed + offset)
+
+    challenge = ChallengeServer(problems, faults=Faults(args.latency, args.jitter, 0.0, seed=args.seed),
+                                chat_faults=faults(args.chat_latency, 1),
+                                token_latency=args.chat_token_latency).start()
+    # Later mirrors are slower, so the mirror ranking has something to find
+    mirrors = [SwapiServer(faults(args.latency * (1 + i), 2 + i)).start() for i in range(args.mirrors)]
+    poke = PokeApiServer(faults(args.latency, 100)).start()
+    servers = [challenge, poke, *mirrors]
+
+    with tempfile.TemporaryDirectory(prefix="galactic-bench-") as cache_dir:
+        _configure_env(challenge, mirrors, poke, cache_dir, args)
+        import app
+        from galactic_solver.metrics import RECORDER
+
+        app.LIMIT_SECONDS = args.seconds
+        official_args = argparse.Namespace(use_async=args.use_async, no_warmup=args.no_warmup,
+                                           http2=False, stream=args.stream,
+                                           budget=args.budget, report=None)
+        log = io.StringIO()
+        with contextlib.redirect_stdout(sys.stdout if args.verbose else log):
+            if args.sync:
+                app.cmd_sync(argparse.Namespace())
+            RECORDER.reset()
+            t0 = time.perf_counter()
+            app.cmd_official(official_args)
+            elapsed = time.perf_counter() - t0
+        solver_summary = RECORDER.summary()
+
+    for s in servers:
+        s.stop()
+
+    graded = challenge.results
+    correct = sum(1 for r in graded if r["correct"])
+    scale = OFFICIAL_SECONDS / elapsed if elapsed > 0 else 0.0
+    return {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {
+            "seconds": args.seconds, "problems": len(problems), "seed": args.seed,
+            "corpus": args.corpus, "async": args.use_async, "stream": args.stream, "budget": args.budget, "warmup": not args.no_warmup,
+            "sync": args.sync, "latency": args.latency, "chat_latency": args.chat_latency,
+            "jitter": args.jitter, "failure_rate": args.failure_rate, "mirrors": args.mirrors,
+            "hedge_delay": args.hedge_delay, "protocol": args.protocol,
+            "chat_token_latency": args.chat_token_latency,
+        },
+        "elapsed_seconds": elapsed,
+        "problems": len(graded),
+        "correct": correct,
+        "accuracy": correct / len(graded) if graded else 0.0,
+        "problems_per_175s": len(graded) * scale,
+        "correct_per_175s": correct * scale,
+        "latency": _percentiles([r["seconds"] for r in graded]),
+        "wrong": [{k: r[k] for k in ("statement", "answer", "expected")} for r in graded if not r["correct"]][:20],
+        "requests": {"challenge": challenge.requests, "chat": challenge.chat_calls,
+                     "swapi": sum(m.requests for m in mirrors), "pokeapi": poke.requests},
+        "solver": solver_summary,
+    }
+
+
+def _compare(report: Dict[str, Any], baseline_path: str):
+    try:
+        with open(baseline_path, encoding="utf-8") as f:
+            base = json.load(f)
+    except (OSError, ValueError) as ex:
+        print(f"[WARN] No se pudo leer la línea base: {ex}")
+        return
+    if base.get("config") != report["config"]:
+        print("[WARN] La línea base usa otra configuración; la comparación no es directa")
+    for key, get in (("problems_per_175s", lambda r: r["problems_per_175s"]),
+                     ("accuracy", lambda r: r["accuracy"]),
+                     ("latency.p50", lambda r: r["latency"]["p50"]),
+                     ("latency.p95", lambda r: r["latency"]["p95"])):
+        old, new = get(base), get(report)
+        delta = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+        print(f"  {key:<18} {old:>12.4f} -> {new:>12.4f} ({delta})")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark offline del intento oficial contra servidores locales")
+    parser.add_argument("--seconds", type=float, default=30.0, help="Duración del intento (el oficial dura 175s)")
+    parser.add_argument("--problems", type=int, default=200, help="Tamaño del corpus generado")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--corpus", metavar="PATH", help="Corpus JSONL (statement, parse, expected) en vez del generado")
+    parser.add_argument("--latency", type=float, default=0.02, help="Latencia base de cada servidor (s)")
+    parser.add_argument("--chat-latency", type=float, default=0.3, help="Latencia del proxy de chat (s)")
+    parser.add_argument("--chat-token-latency", type=float, default=0.0,
+                        help="Segundos extra por token generado en el proxy de chat (los del prompt cuestan 1/10)")
+    parser.add_argument("--protocol", choices=("full", "compact"), default="full",
+                        help="Protocolo de parse con el LLM (GALACTIC_PARSE_PROTOCOL)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Variación uniforme ± sobre la latencia (s)")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fracción de respuestas 503 (chat/SWAPI/PokéAPI)")
+    parser.add_argument("--mirrors", type=int, default=2, help="Cantidad de mirrors SWAPI")
+    parser.add_argument("--hedge-delay", type=float, default=0.0, help="SWAPI_HEDGE_DELAY para el run")
+    parser.add_argument("--async", dest="use_async", action="store_true")
+    parser.add_argument("--stream", action="store_true", help="Parse del LLM en streaming (SSE)")
+    parser.add_argument("--budget", type=float, metavar="SECONDS", nargs="?", const=8.0, help="official --budget")
+    parser.add_argument("--no-warmup", dest="no_warmup", action="store_true")
+    parser.add_argument("--sync", action="store_true", help="Ejecuta 'sync' contra los servidores antes del intento")
+    parser.add_argument("--out", metavar="PATH", help="Ruta del reporte JSON (por defecto bench/results/)")
+    parser.add_argument("--baseline", metavar="PATH", help="Reporte anterior con el que comparar")
+    parser.add_argument("--verbose", action="store_true", help="Muestra la salida del solver")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    out = args.out or os.path.join(RESULTS_DIR, f"{report['commit'] or 'local'}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    lat = report["latency"]
+    print(f"[BENCH] {report['problems']} problemas en {report['elapsed_seconds']:.1f}s "
+          f"-> {report['problems_per_175s']:.1f} por 175s, precisión {report['accuracy']:.1%}")
+    print(f"[BENCH] latencia por problema p50={lat['p50'] * 1000:.1f}ms p95={lat['p95'] * 1000:.1f}ms "
+          f"max={lat['max'] * 1000:.1f}ms | requests {report['requests']}")
+    print(f"[BENCH] Reporte -> {out}")
+    if args.baseline:
+        _compare(report, args.baseline)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
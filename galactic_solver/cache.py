@@ -0,0 +1,213 @@
+from __future__ import annotations
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class _Missing:
+    # Marker for "known missing" results (e.g. a search with no matches)
+    _instance: Optional["_Missing"] = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __repr__(self) -> str:
+        return "MISSING"
+
+    def __bool__(self) -> bool:
+        return False
+
+
+MISSING = _Missing()
+_ABSENT = object()
+
+DAY = 24 * 3600.0
+
+# TTL per key namespace (prefix before the first ':'); None means no expiry
+NAMESPACE_TTLS: Dict[str, Optional[float]] = {
+    "swapi": 30 * DAY,
+    "pokemon": 30 * DAY,
+}
+DEFAULT_TTL: Optional[float] = 7 * DAY
+MISSING_TTL = 1 * DAY
+
+
+def namespace_of(key: str) -> str:
+    return key.split(":", 1)[0]
+
+
+def ttl_for(key: str, value: Any) -> Optional[float]:
+    if value is MISSING:
+        return MISSING_TTL
+    return NAMESPACE_TTLS.get(namespace_of(key), DEFAULT_TTL)
+
+
+class MemoryCache:
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, tuple[Any, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return _ABSENT
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.time():
+                del self._data[key]
+                return _ABSENT
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class SqliteCache:
+    # Values are stored as JSON; LRU eviction by last access once max_entries is exceeded
+    _EVICT_EVERY = 100
+
+    def __init__(self, path: str, max_entries: int = 50000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._writes = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY, value TEXT, missing INTEGER NOT NULL,"
+            " expires_at REAL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed_at)")
+
+    def get(self, key: str) -> Any:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, missing, expires_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return _ABSENT
+            value, missing, expires_at = row
+            if expires_at is not None and expires_at < now:
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                return _ABSENT
+            self._conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+        if missing:
+            return MISSING
+        try:
+            return json.loads(value)
+        except ValueError:
+            return _ABSENT
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        now = time.time()
+        if value is MISSING:
+            payload, missing = None, 1
+        else:
+            try:
+                payload, missing = json.dumps(value, ensure_ascii=False), 0
+            except (TypeError, ValueError):
+                return  # not persistable; the memory tier still has it
+        expires_at = now + ttl if ttl is not None else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, missing, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, payload, missing, expires_at, now),
+            )
+            self._writes += 1
+            if self._writes % self._EVICT_EVERY == 0:
+                self._evict(now)
+
+    def _evict(self, now: float):
+        self._conn.execute("DELETE FROM entries WHERE expires_at IS NOT NULL AND expires_at < ?", (now,))
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY accessed_at LIMIT ?)",
+                (excess,),
+            )
+
+    def recent(self, limit: int) -> List[Tuple[str, Any]]:
+        # Most recently used live entries, for preloading the memory tier
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, value, missing FROM entries WHERE expires_at IS NULL OR expires_at >= ?"
+                " ORDER BY accessed_at DESC LIMIT ?",
+                (time.time(), limit),
+            ).fetchall()
+        out: List[Tuple[str, Any]] = []
+        for key, value, missing in rows:
+            if missing:
+                out.append((key, MISSING))
+                continue
+            try:
+                out.append((key, json.loads(value)))
+            except ValueError:
+                continue
+        return out
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class TieredCache:
+    # In-memory LRU in front of an optional persistent tier
+    def __init__(self, memory: MemoryCache, persistent: Optional[SqliteCache] = None):
+        self.memory = memory
+        self.persistent = persistent
+
+    def get(self, key: str) -> Any:
+        value = self.memory.get(key)
+        if value is not _ABSENT:
+            return value
+        if self.persistent is None:
+            return _ABSENT
+        value = self.persistent.get(key)
+        if value is not _ABSENT:
+            self.memory.set(key, value, ttl_for(key, value))
+        return value
+
+    def set(self, key: str, value: Any, persist: bool = True):
+        ttl = ttl_for(key, value)
+        self.memory.set(key, value, ttl)
+        if persist and self.persistent is not None:
+            self.persistent.set(key, value, ttl)
+
+    def preload(self, limit: Optional[int] = None) -> int:
+        if self.persistent is None:
+            return 0
+        entries = self.persistent.recent(limit or self.memory.max_entries)
+        for key, value in reversed(entries):  # oldest first so LRU order is preserved
+            self.memory.set(key, value, ttl_for(key, value))
+        return len(entries)
+
+    def clear(self):
+        self.memory.clear()
+        if self.persistent is not None:
+            self.persistent.clear()
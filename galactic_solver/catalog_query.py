@@ -0,0 +1,201 @@
+from __future__ import annotations
+import ast
+import importlib.util
+import operator
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from .data_sources import pokeapi, swapi
+from .evaluator import eval_many
+from .schema import SCHEMAS, Record
+
+# Formula checks over a whole catalog: an expression over the attributes of one entity
+# type ("diameter / rotation_period") is evaluated column-wise over every planet,
+# character or Pokémon in the local index/table. Unknown values and divisions by zero are
+# masked out. The fast path works on float columns (NumPy arrays when NumPy is installed,
+# plain lists otherwise); exact mode runs the solver's own Decimal evaluator over every
+# row so values and ordering match round10 semantics.
+
+CATALOG_TYPES = {
+    "planet": "sw_planet", "planets": "sw_planet", "sw_planet": "sw_planet",
+    "character": "sw_character", "characters": "sw_character", "people": "sw_character",
+    "sw_character": "sw_character",
+    "pokemon": "pokemon",
+}
+
+_ARITH = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv}
+
+
+class QueryError(ValueError):
+    pass
+
+
+def numpy_available() -> bool:
+    return importlib.util.find_spec("numpy") is not None
+
+
+def load_catalog(etype: str) -> List[Record]:
+    if etype == "sw_planet":
+        return swapi.catalog("planets/")
+    if etype == "sw_character":
+        return swapi.catalog("people/")
+    if etype == "pokemon":
+        return pokeapi.catalog()
+    raise QueryError(f"tipo de entidad desconocido: {etype}")
+
+
+def _check_names(tree: ast.AST, etype: str):
+    fields = SCHEMAS[etype].FIELD_SET
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and node.id != "len" and node.id not in fields:
+            raise QueryError(f"atributo '{node.id}' no existe para {etype} (válidos: {', '.join(sorted(fields))})")
+
+
+# --- fast path ----------------------------------------------------------------
+# A column is (values, valid): float values plus a validity mask. String attributes only
+# make sense through len(); used bare they count as their length, like the evaluator does.
+
+class _ListColumns:
+    def column(self, records: Sequence[Record], attr: str):
+        values, valid = [], []
+        for rec in records:
+            v = getattr(rec, attr)
+            if isinstance(v, str):
+                v = len(v)
+            valid.append(v is not None)
+            values.append(float(v) if v is not None else 0.0)
+        return values, valid
+
+    def constant(self, value: float, n: int):
+        return [value] * n, [True] * n
+
+    def length(self, records: Sequence[Record], attr: str):
+        values = [float(len(str(getattr(rec, attr)))) if getattr(rec, attr) is not None else 0.0 for rec in records]
+        return values, [getattr(rec, attr) is not None for rec in records]
+
+    def binop(self, op: type, a, b):
+        (av, am), (bv, bm) = a, b
+        if op is ast.Div:
+            valid = [x and y and d != 0 for x, y, d in zip(am, bm, bv)]
+            return [n / d if ok else 0.0 for n, d, ok in zip(av, bv, valid)], valid
+        fn = _ARITH[op]
+        return [fn(x, y) for x, y in zip(av, bv)], [x and y for x, y in zip(am, bm)]
+
+    def negate(self, a):
+        return [-x for x in a[0]], a[1]
+
+    def result(self, a) -> List[Optional[float]]:
+        return [v if ok else None for v, ok in zip(*a)]
+
+
+class _NumpyColumns:
+    def __init__(self):
+        import numpy
+        self.np = numpy
+
+    def column(self, records: Sequence[Record], attr: str):
+        np = self.np
+        raw = [getattr(rec, attr) for rec in records]
+        nan = float("nan")
+        values = np.fromiter((nan if v is None else (len(v) if isinstance(v, str) else v) for v in raw),
+                             dtype=np.float64, count=len(raw))
+        valid = ~np.isnan(values)
+        return np.where(valid, values, 0.0), valid
+
+    def constant(self, value: float, n: int):
+        return self.np.full(n, value, dtype=self.np.float64), self.np.ones(n, dtype=bool)
+
+    def length(self, records: Sequence[Record], attr: str):
+        values, valid = _ListColumns().length(records, attr)
+        return self.np.array(values, dtype=self.np.float64), self.np.array(valid, dtype=bool)
+
+    def binop(self, op: type, a, b):
+        (av, am), (bv, bm) = a, b
+        valid = am & bm
+        with self.np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            if op is ast.Div:
+                valid = valid & (bv != 0)
+                return self.np.where(valid, av / self.np.where(bv == 0, 1.0, bv), 0.0), valid
+            return _ARITH[op](av, bv), valid
+
+    def negate(self, a):
+        return -a[0], a[1]
+
+    def result(self, a) -> List[Optional[float]]:
+        values, valid = a
+        return [float(v) if ok else None for v, ok in zip(values.tolist(), valid.tolist())]
+
+
+def _vectorize(node: ast.AST, records: Sequence[Record], ops, cache: Dict[str, Any]):
+    if isinstance(node, ast.Expression):
+        return _vectorize(node.body, records, ops, cache)
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        return ops.constant(float(node.value), len(records))
+    if isinstance(node, ast.Name):
+        if node.id not in cache:
+            cache[node.id] = ops.column(records, node.id)
+        return cache[node.id]
+    if isinstance(node, ast.BinOp) and type(node.op) in _ARITH:
+        return ops.binop(type(node.op), _vectorize(node.left, records, ops, cache),
+                         _vectorize(node.right, records, ops, cache))
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.UAdd, ast.USub)):
+        operand = _vectorize(node.operand, records, ops, cache)
+        return ops.negate(operand) if isinstance(node.op, ast.USub) else operand
+    if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == "len"
+            and len(node.args) == 1 and isinstance(node.args[0], ast.Name)):
+        return ops.length(records, node.args[0].id)
+    raise QueryError("expresión no soportada en modo catálogo (solo + - * /, números, atributos y len(atributo))")
+
+
+def evaluate_columns(expression: str, records: Sequence[Record], use_numpy: bool = False) -> List[Optional[float]]:
+    tree = ast.parse(expression, mode="eval")
+    ops = _NumpyColumns() if use_numpy else _ListColumns()
+    return ops.result(_vectorize(tree, records, ops, {}))
+
+
+# --- exact path ---------------------------------------------------------------
+
+def evaluate_exact(expression: str, records: Sequence[Record]) -> List[Optional[Decimal]]:
+    # Same compiled Decimal evaluator (and round10) the solver uses; an unknown value leaves
+    # its variable unbound, so the row fails and is skipped like the solver skips the problem
+    bindings = [{k: v for k, v in rec.as_dict().items() if v is not None} for rec in records]
+    return eval_many(expression, bindings, skip_errors=True)
+
+
+# --- query --------------------------------------------------------------------
+
+def query(entity: str, expression: str, top: Optional[int] = 10, descending: bool = True,
+          minimum: Optional[float] = None, maximum: Optional[float] = None,
+          exact: bool = False, use_numpy: Optional[bool] = None) -> Dict[str, Any]:
+    etype = CATALOG_TYPES.get(entity.lower())
+    if etype is None:
+        raise QueryError(f"tipo de entidad desconocido: {entity} (usa planet, character o pokemon)")
+    try:
+        tree = ast.parse(expression, mode="eval")
+    except SyntaxError as ex:
+        raise QueryError(f"expresión inválida: {ex.msg}") from None
+    _check_names(tree, etype)
+    records = load_catalog(etype)
+    if use_numpy is None:
+        use_numpy = numpy_available()
+    engine = "exact" if exact else ("numpy" if use_numpy else "python")
+
+    values: Sequence[Any] = (evaluate_exact(expression, records) if exact
+                             else evaluate_columns(expression, records, use_numpy))
+    lo = Decimal(str(minimum)) if exact and minimum is not None else minimum
+    hi = Decimal(str(maximum)) if exact and maximum is not None else maximum
+    rows: List[Tuple[str, Any]] = []
+    for rec, value in zip(records, values):
+        if value is None or (lo is not None and value < lo) or (hi is not None and value > hi):
+            continue
+        rows.append((rec.name, value))
+    masked = len(records) - sum(1 for v in values if v is not None)
+    rows.sort(key=lambda r: r[1], reverse=descending)
+    return {
+        "type": etype,
+        "expression": expression,
+        "catalog": len(records),
+        "masked": masked,
+        "matched": len(rows),
+        "rows": rows[:top] if top else rows,
+        "engine": engine,
+    }
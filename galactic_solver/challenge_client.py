@@ -1,24 +1,63 @@
 from __future__ import annotations
 import os
-from typing import Any, Dict, Optional
-import httpx
+import json as jsonlib
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Tuple
+from .utils import make_client
 
 DEFAULT_BASE_URL = os.getenv("CHALLENGE_BASE_URL", "https://recruiting.adere.so").rstrip("/")
 HTTP_TIMEOUT = 10.0
 
+def _auth_headers(token: Optional[str]) -> Dict[str, str]:
+    # Prefer generic env var
+    env_token = os.getenv("CHALLENGE_TOKEN")
+    token = token or env_token
+    if not token:
+        raise RuntimeError("CHALLENGE_TOKEN is not set. Use a .env file or environment variable.")
+    return {
+        "Authorization": f"Bearer {token}",
+        "Content-Type": "application/json",
+        "Accept": "application/json",
+    }
+
+
+def _message_content(data: Any) -> str:
+    if not isinstance(data, dict):
+        return ""
+    return data.get("choices", [{}])[0].get("message", {}).get("content") or ""
+
+
+def _sse_delta(line: str) -> Tuple[bool, str]:
+    # (done, content delta) for one server-sent-events line
+    if not line.startswith("data:"):
+        return False, ""
+    data = line[5:].strip()
+    if data == "[DONE]":
+        return True, ""
+    try:
+        event = jsonlib.loads(data)
+    except ValueError:
+        return False, ""
+    choice = (event.get("choices") or [{}])[0] if isinstance(event, dict) else {}
+    delta = choice.get("delta") or choice.get("message") or {}
+    return False, delta.get("content") or ""
+
+
+def _is_event_stream(headers) -> bool:
+    return "text/event-stream" in headers.get("content-type", "")
+
+
 class ChallengeClient:
-    def __init__(self, token: Optional[str] = None, base_url: Optional[str] = None):
-        # Prefer generic env var
-        env_token = os.getenv("CHALLENGE_TOKEN")
-        token = token or env_token
-        if not token:
-            raise RuntimeError("CHALLENGE_TOKEN is not set. Use a .env file or environment variable.")
+    def __init__(self, token: Optional[str] = None, base_url: Optional[str] = None, http2: bool = False):
+        headers = _auth_headers(token)
         self.base_url = (base_url or DEFAULT_BASE_URL).rstrip("/")
-        self._client = httpx.Client(timeout=HTTP_TIMEOUT, headers={
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json",
-            "Accept": "application/json",
-        })
+        self._client = make_client(HTTP_TIMEOUT, headers=headers, http2=http2)
+
+    def close(self):
+        self._client.close()
+
+    def ping(self):
+        # Opens (and keeps alive) the connection; any HTTP status is fine
+        self._client.head(f"{self.base_url}/")
 
     def _get(self, path: str) -> Dict[str, Any]:
         resp = self._client.get(f"{self.base_url}{path}")
@@ -43,7 +82,79 @@ class ChallengeClient:
         payload = {"problem_id": problem_id, "answer": answer}
         return self._post("/challenge/solution", payload)
 
-    # Chat completion proxy to GPT-4o-mini
-    def chat_completion(self, messages: list[dict], model: str = "gpt-4o-mini") -> Dict[str, Any]:
-        payload = {"model": model, "messages": messages}
+    # Chat completion proxy to GPT-4o-mini; options (max_tokens, response_format, ...) go
+    # into the request body as they are
+    def chat_completion(self, messages: list[dict], model: str = "gpt-4o-mini", **options) -> Dict[str, Any]:
+        payload = {"model": model, "messages": messages, **options}
         return self._post("/chat_completion", payload)
+
+    # Streaming variant: yields content deltas as they arrive (server-sent events).
+    # A proxy that ignores "stream" answers with the usual JSON, yielded in one piece.
+    def chat_completion_stream(self, messages: list[dict], model: str = "gpt-4o-mini", **options) -> Iterator[str]:
+        payload = {"model": model, "messages": messages, **options, "stream": True}
+        with self._client.stream("POST", f"{self.base_url}/chat_completion", json=payload) as resp:
+            resp.raise_for_status()
+            if not _is_event_stream(resp.headers):
+                resp.read()
+                yield _message_content(resp.json())
+                return
+            for line in resp.iter_lines():
+                done, delta = _sse_delta(line)
+                if done:
+                    break
+                if delta:
+                    yield delta
+
+
+class AsyncChallengeClient:
+    # Same endpoints as ChallengeClient on top of httpx.AsyncClient
+    def __init__(self, token: Optional[str] = None, base_url: Optional[str] = None, http2: bool = False):
+        headers = _auth_headers(token)
+        self.base_url = (base_url or DEFAULT_BASE_URL).rstrip("/")
+        self._client = make_client(HTTP_TIMEOUT, headers=headers, http2=http2, asynchronous=True)
+
+    async def ping(self):
+        await self._client.head(f"{self.base_url}/")
+
+    async def _get(self, path: str) -> Dict[str, Any]:
+        resp = await self._client.get(f"{self.base_url}{path}")
+        resp.raise_for_status()
+        return resp.json()
+
+    async def _post(self, path: str, json: Dict[str, Any]) -> Dict[str, Any]:
+        resp = await self._client.post(f"{self.base_url}{path}", json=json)
+        resp.raise_for_status()
+        return resp.json()
+
+    async def get_test(self) -> Dict[str, Any]:
+        return await self._get("/challenge/test")
+
+    async def start(self) -> Dict[str, Any]:
+        return await self._get("/challenge/start")
+
+    async def submit_solution(self, problem_id: str, answer: Any) -> Dict[str, Any]:
+        payload = {"problem_id": problem_id, "answer": answer}
+        return await self._post("/challenge/solution", payload)
+
+    async def chat_completion(self, messages: list[dict], model: str = "gpt-4o-mini", **options) -> Dict[str, Any]:
+        payload = {"model": model, "messages": messages, **options}
+        return await self._post("/chat_completion", payload)
+
+    async def chat_completion_stream(self, messages: list[dict], model: str = "gpt-4o-mini",
+                                     **options) -> AsyncIterator[str]:
+        payload = {"model": model, "messages": messages, **options, "stream": True}
+        async with self._client.stream("POST", f"{self.base_url}/chat_completion", json=payload) as resp:
+            resp.raise_for_status()
+            if not _is_event_stream(resp.headers):
+                await resp.aread()
+                yield _message_content(resp.json())
+                return
+            async for line in resp.aiter_lines():
+                done, delta = _sse_delta(line)
+                if done:
+                    break
+                if delta:
+                    yield delta
+
+    async def aclose(self):
+        await self._client.aclose()
@@ -0,0 +1,232 @@
+from __future__ import annotations
+import contextlib
+import io
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+import traceback
+from typing import Any, Callable, Dict, List, Optional
+
+# Resident solver: `app.py serve` keeps one process alive on a Unix socket, with its HTTP
+# connections, caches, local indexes, parse templates and compiled expressions warm.
+# Other `app.py` invocations send it their arguments and print what it writes back, so
+# they skip importing httpx and the solver modules. One command runs at a time (its
+# stdout is redirected to the caller). Only the standard library is imported here: this
+# module is loaded before anything else when app.py starts.
+#
+# The daemon read its environment (.env included) once: base URLs, token and settings are
+# baked into clients and module constants. A caller whose solver variables differ from
+# the daemon's (another token, GALACTIC_CACHE_DIR, SWAPI_BASE_URLS...) runs locally.
+#
+# Wire format: one JSON line per message. Request {"argv": [...], "cwd": "...", "env": {...}}
+# or {"stop": true}; replies {"out": text}... then {"exit": code}, or {"refuse": reason}
+# when the caller should run the command itself.
+
+
+# Commands and flags that always run in the calling process (cassettes swap the process'
+# HTTP transport)
+LOCAL_COMMANDS = ("serve",)
+LOCAL_FLAGS = ("--record", "--replay")
+
+# Environment the solver reads, compared between caller and daemon; the GALACTIC_* that
+# only steer the forwarding itself are left out
+ENV_PREFIXES = ("GALACTIC_", "CHALLENGE_", "SWAPI_", "POKEAPI_")
+FORWARDING_ENV = ("GALACTIC_DAEMON", "GALACTIC_SOCKET", "GALACTIC_TIMING")
+
+Runner = Callable[[List[str]], int]
+
+
+def socket_path() -> str:
+    # Same default directory as utils.cache_path (not imported here: it pulls in httpx)
+    return os.getenv("GALACTIC_SOCKET") or os.path.join(os.getenv("GALACTIC_CACHE_DIR", ".galactic_cache"), "solver.sock")
+
+
+def daemon_enabled() -> bool:
+    return os.getenv("GALACTIC_DAEMON", "on").lower() not in ("off", "0", "false", "no")
+
+
+def timing_enabled() -> bool:
+    return os.getenv("GALACTIC_TIMING", "off").lower() in ("on", "1", "true", "yes")
+
+
+def solver_env() -> Dict[str, str]:
+    return {k: v for k, v in os.environ.items() if k.startswith(ENV_PREFIXES) and k not in FORWARDING_ENV}
+
+
+def _forwardable(argv: List[str]) -> bool:
+    if not argv or argv[0] in LOCAL_COMMANDS:
+        return False
+    return not any(a.split("=", 1)[0] in LOCAL_FLAGS for a in argv)
+
+
+def _connect(path: str) -> Optional[socket.socket]:
+    if not os.path.exists(path):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError:  # stale socket file: no daemon behind it
+        sock.close()
+        return None
+    return sock
+
+
+def _send(wfile, message: Dict[str, Any]):
+    wfile.write(json.dumps(message, ensure_ascii=False).encode("utf-8") + b"\n")
+    wfile.flush()
+
+
+def forward(argv: List[str], path: Optional[str] = None, started: Optional[float] = None) -> Optional[int]:
+    # Exit code of the command run by the daemon, or None to run it here
+    if not daemon_enabled() or not _forwardable(argv):
+        return None
+    path = path or socket_path()
+    sock = _connect(path)
+    if sock is None:
+        return None
+    with sock, sock.makefile("rb") as rfile, sock.makefile("wb") as wfile:
+        _send(wfile, {"argv": argv, "cwd": os.getcwd(), "env": solver_env()})
+        for line in rfile:
+            message = json.loads(line)
+            if "out" in message:
+                sys.stdout.write(message["out"])
+                sys.stdout.flush()
+            elif "refuse" in message:
+                return None
+            elif "exit" in message:
+                if timing_enabled() and started is not None:
+                    print(f"[INFO] Arranque: reenviado al daemon ({path}), "
+                          f"{(time.perf_counter() - started) * 1000:.0f}ms en total", file=sys.stderr)
+                return int(message["exit"])
+    print("[ERROR] El daemon cerró la conexión sin terminar el comando", file=sys.stderr)
+    return 1
+
+
+def stop(path: Optional[str] = None) -> bool:
+    path = path or socket_path()
+    sock = _connect(path)
+    if sock is None:
+        return False
+    with sock, sock.makefile("rb") as rfile, sock.makefile("wb") as wfile:
+        _send(wfile, {"stop": True})
+        rfile.readline()
+    return True
+
+
+def running(path: Optional[str] = None) -> bool:
+    path = path or socket_path()
+    sock = _connect(path)
+    if sock is None:
+        return False
+    sock.close()
+    return True
+
+
+class _Output(io.TextIOBase):
+    # stdout/stderr of a command, sent to the caller as it is written. If the caller went
+    # away the command still runs to the end (its caches and corpus writes stay consistent).
+    def __init__(self, wfile):
+        self._wfile = wfile
+        self._gone = False
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        if text and not self._gone:
+            try:
+                _send(self._wfile, {"out": text})
+            except OSError:
+                self._gone = True
+        return len(text)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: "_Server"
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:  # running(): connection probe
+            return
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return
+        if request.get("stop"):
+            _send(self.wfile, {"exit": 0})
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+            return
+        argv = request.get("argv")
+        if not isinstance(argv, list) or request.get("cwd") != os.getcwd():
+            # Relative paths (corpus, report, cache dir) would point somewhere else
+            _send(self.wfile, {"refuse": "cwd"})
+            return
+        if request.get("env") != self.server.env:
+            _send(self.wfile, {"refuse": "env"})
+            return
+        code = self.server.execute([str(a) for a in argv], _Output(self.wfile))
+        try:
+            _send(self.wfile, {"exit": code})
+        except OSError:
+            pass
+
+
+class _Server(socketserver.UnixStreamServer):
+    def __init__(self, path: str, run: Runner, reset: Optional[Callable[[], None]] = None):
+        self.run = run
+        self.reset = reset
+        self.env = solver_env()
+        self.commands = 0
+        super().__init__(path, _Handler)
+
+    def execute(self, argv: List[str], out: _Output) -> int:
+        # Commands may set env vars (--stream, --protocol) or process state (HTTP/2 clients)
+        # for themselves: undone afterwards, through `reset` for the state
+        env = dict(os.environ)
+        self.commands += 1
+        try:
+            with contextlib.redirect_stdout(out), contextlib.redirect_stderr(out):
+                try:
+                    return self.run(argv)
+                except SystemExit as ex:  # argparse errors and --help
+                    return ex.code if isinstance(ex.code, int) else (0 if ex.code is None else 1)
+                except Exception:
+                    traceback.print_exc()
+                    return 1
+        finally:
+            os.environ.clear()
+            os.environ.update(env)
+            if self.reset is not None:
+                try:
+                    self.reset()
+                except Exception:
+                    traceback.print_exc()
+
+
+def serve(run: Runner, path: Optional[str] = None, reset: Optional[Callable[[], None]] = None) -> int:
+    path = path or socket_path()
+    # Blocks until `serve --stop` or Ctrl-C; one command at a time
+    if running(path):
+        print(f"[ERROR] Ya hay un daemon escuchando en {path}")
+        return 1
+    if os.path.exists(path):
+        os.remove(path)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    server = _Server(path, run, reset)
+    print(f"[INFO] Daemon escuchando en {path} (detener con `serve --stop` o Ctrl-C)", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    print(f"[INFO] Daemon detenido ({server.commands} comandos atendidos)")
+    return 0
@@ -1,13 +1,28 @@
 from __future__ import annotations
-import httpx
-from typing import Optional, Dict, Any
-from ..utils import cache_get, cache_set
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Optional, Dict, Any, List, Tuple
+from . import poketable
+from ..fuzzy import FuzzyIndex
+from ..metrics import count
+from ..schema import Pokemon
+from ..singleflight import AsyncSingleFlight, SingleFlight
+from ..utils import MISSING, cache_get, cache_set, LazyClient, cache_path, write_json_atomic
 
-BASE_URL = "https://pokeapi.co/api/v2"
+if TYPE_CHECKING:
+    import httpx
+
+BASE_URL = os.getenv("POKEAPI_BASE_URL", "https://pokeapi.co/api/v2").rstrip("/")
 HTTP_TIMEOUT = 8.0
 
-client = httpx.Client(timeout=HTTP_TIMEOUT)
+# Built on first use (see LazyClient)
+client = LazyClient(HTTP_TIMEOUT)
+async_client = LazyClient(HTTP_TIMEOUT, asynchronous=True)
 
+# Concurrent misses for the same Pokémon share one request
+_FETCHES = SingleFlight("pokemon")
+_AFETCHES = AsyncSingleFlight("pokemon")
 
 _ALIAS = {
     "nidoran♀": "nidoran-f",
@@ -22,34 +37,200 @@ _OVERRIDES = {
 }
 
 
+_NAMES: Optional[List[str]] = None
+
+
+def names_path() -> str:
+    return os.getenv("POKEAPI_NAMES_PATH") or cache_path("pokemon_names.json")
+
+# Fuzzy matcher over known_names(), built on first use
+_FUZZY: Optional[FuzzyIndex] = None
+
+
+def sync_names(path: Optional[str] = None) -> int:
+    # One request for the full list of Pokémon names (used to spot names in statements)
+    resp = client.get(f"{BASE_URL}/pokemon", params={"limit": 100000})
+    resp.raise_for_status()
+    names = [r["name"] for r in resp.json().get("results", []) if isinstance(r.get("name"), str)]
+    write_json_atomic(path or names_path(), names)
+    global _NAMES, _FUZZY
+    _NAMES = names
+    _FUZZY = None
+    return len(names)
+
+
+def known_names() -> List[str]:
+    global _NAMES
+    if _NAMES is None:
+        try:
+            with open(names_path(), encoding="utf-8") as f:
+                _NAMES = [n for n in json.load(f) if isinstance(n, str)]
+        except (OSError, ValueError):
+            table = poketable.get_table()
+            _NAMES = table.names() if table is not None else []
+    return _NAMES
+
+
+def import_pokedex(path: Optional[str] = None, workers: int = 16) -> Dict[str, Any]:
+    # Whole Pokédex once into the memory-mapped table: the name list, then one detail
+    # request per Pokémon of which only the table columns are kept (overrides applied).
+    # A detail that fails is skipped and reported: get_pokemon still asks the API for it
+    resp = client.get(f"{BASE_URL}/pokemon", params={"limit": 100000})
+    resp.raise_for_status()
+    names = [r["name"] for r in resp.json().get("results", []) if isinstance(r.get("name"), str)]
+    names += [alias for alias in dict.fromkeys(_ALIAS.values()) if alias not in names]
+
+    def fetch(cname: str) -> Tuple[Optional[Dict[str, Any]], bool]:
+        # (record, failed); a 404 just means the name has no Pokémon behind it
+        try:
+            r = client.get(f"{BASE_URL}/pokemon/{cname}")
+            if r.status_code == 404:
+                return None, False
+            r.raise_for_status()
+            return _pokemon_record(cname, r.json()), False
+        except Exception:
+            return None, True
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(fetch, names))
+    rows = [(cname, rec) for cname, (rec, _) in zip(names, results) if rec is not None]
+    failed = [cname for cname, (_, err) in zip(names, results) if err]
+    if not rows and failed:
+        raise RuntimeError(f"fallaron las {len(failed)} descargas de detalle")
+    n = poketable.write_table(path or poketable.table_path(), rows)
+    poketable.reset_table()
+    known = [cname for cname, _ in rows] + failed
+    write_json_atomic(names_path(), known)
+    global _NAMES, _FUZZY
+    _NAMES = known
+    _FUZZY = None
+    return {"imported": n, "failed": failed}
+
+
+def resolve_name(name: str) -> Optional[Tuple[str, float]]:
+    # Known API name closest to a misspelled or Spanish one ("Mr Mime", "Nidoran hembra")
+    global _FUZZY
+    if _FUZZY is None:
+        _FUZZY = FuzzyIndex(known_names())
+    return _FUZZY.lookup(name)
+
+
+def _exact_name(name: str) -> str:
+    n = name.strip().lower()
+    return _ALIAS.get(n, n).replace(" ", "-")
+
+
 def _canonical_name(name: str) -> str:
+    # Fuzzy match: only asked for names the table and the cache don't have as written
     n = name.strip().lower()
     n = _ALIAS.get(n, n)
+    match = resolve_name(n)
+    if match is not None:
+        if match[0] != n:
+            count("fuzzy.hit.pokemon")
+        return match[0]
     n = n.replace(" ", "-")
     return n
 
 
-def get_pokemon(name: str) -> Optional[Dict[str, Any]]:
+def _pokemon_record(cname: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    item = {
+        "name": data.get("name"),
+        "base_experience": data.get("base_experience"),
+        "height": data.get("height"),
+        "weight": data.get("weight"),
+    }
+    # Apply overrides if needed
+    override = _OVERRIDES.get(cname)
+    if override:
+        item.update(override)
+    return item
+
+
+def _store_pokemon(key: str, cname: str, resp: httpx.Response) -> Optional[Dict[str, Any]]:
+    if resp.status_code == 404:
+        cache_set(key, MISSING)
+        return None
+    resp.raise_for_status()
+    item = _pokemon_record(cname, resp.json())
+    cache_set(key, item)
+    return item
+
+
+def _table_lookup(cname: str) -> Optional[Dict[str, Any]]:
+    table = poketable.get_table()
+    if table is None:
+        return None
+    item = table.lookup(cname)
+    return _pokemon_record(cname, item) if item is not None else None
+
+
+def catalog() -> List[Pokemon]:
+    # Every Pokémon of the imported table (empty until `import-pokedex` has run)
+    table = poketable.get_table()
+    if table is None:
+        return []
+    return [Pokemon.from_item(_pokemon_record(row["name"], row)) for row in table.rows()]
+
+
+def get_pokemon(name: str) -> Optional[Pokemon]:
+    item = _pokemon_item(name)
+    return Pokemon.from_item(item) if item is not None else None
+
+
+async def aget_pokemon(name: str) -> Optional[Pokemon]:
+    item = await _apokemon_item(name)
+    return Pokemon.from_item(item) if item is not None else None
+
+
+def _pokemon_item(name: str) -> Optional[Dict[str, Any]]:
+    # Imported table first; HTTP only for names it doesn't have
+    exact = _exact_name(name)
+    item = _table_lookup(exact)
+    if item is not None:
+        return item
     key = f"pokemon:{name.lower()}"
     cached = cache_get(key)
+    if cached is MISSING:
+        return None
     if cached is not None:
         return cached  # type: ignore
+    cname = _canonical_name(name)
+    if cname != exact:
+        item = _table_lookup(cname)
+        if item is not None:
+            return item
     try:
-        cname = _canonical_name(name)
-        resp = client.get(f"{BASE_URL}/pokemon/{cname}")
-        resp.raise_for_status()
-        data = resp.json()
-        item = {
-            "name": data.get("name"),
-            "base_experience": data.get("base_experience"),
-            "height": data.get("height"),
-            "weight": data.get("weight"),
-        }
-        # Apply overrides if needed
-        override = _OVERRIDES.get(cname)
-        if override:
-            item.update(override)
-        cache_set(key, item)
+        return _FETCHES.do(key, _fetch_pokemon, key, cname)
+    except Exception:
+        return None
+
+
+def _fetch_pokemon(key: str, cname: str) -> Optional[Dict[str, Any]]:
+    return _store_pokemon(key, cname, client.get(f"{BASE_URL}/pokemon/{cname}"))
+
+
+async def _afetch_pokemon(key: str, cname: str) -> Optional[Dict[str, Any]]:
+    return _store_pokemon(key, cname, await async_client.get(f"{BASE_URL}/pokemon/{cname}"))
+
+
+async def _apokemon_item(name: str) -> Optional[Dict[str, Any]]:
+    exact = _exact_name(name)
+    item = _table_lookup(exact)
+    if item is not None:
         return item
+    key = f"pokemon:{name.lower()}"
+    cached = cache_get(key)
+    if cached is MISSING:
+        return None
+    if cached is not None:
+        return cached  # type: ignore
+    cname = _canonical_name(name)
+    if cname != exact:
+        item = _table_lookup(cname)
+        if item is not None:
+            return item
+    try:
+        return await _AFETCHES.do(key, _afetch_pokemon, key, cname)
     except Exception:
         return None
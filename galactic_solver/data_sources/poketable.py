@@ -0,0 +1,127 @@
+from __future__ import annotations
+import mmap
+import os
+import struct
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from ..utils import cache_path
+
+# Compact Pokémon attribute table, memory-mapped read-only:
+#   header   <4sHHI: magic, version, name width, row count
+#   names    count * width bytes, UTF-8 canonical names NUL-padded, sorted
+#   columns  one little-endian int32 array per field in COLUMNS (NULL_VALUE = missing)
+# Lookups binary-search the name block in place; nothing is parsed at load time.
+
+def table_path() -> str:
+    return os.getenv("POKEAPI_TABLE_PATH") or cache_path("pokemon.table")
+
+MAGIC = b"GSPK"
+VERSION = 1
+COLUMNS = ("base_experience", "height", "weight")
+NULL_VALUE = -2 ** 31
+
+_HEADER = struct.Struct("<4sHHI")
+
+Row = Tuple[str, Dict[str, Optional[int]]]
+
+
+def write_table(path: str, rows: Iterable[Row]) -> int:
+    by_name: Dict[bytes, Dict[str, Optional[int]]] = {}
+    for name, values in rows:
+        by_name[name.strip().lower().encode("utf-8")] = values
+    names = sorted(by_name)
+    width = max((len(n) for n in names), default=1)
+    out = bytearray(_HEADER.pack(MAGIC, VERSION, width, len(names)))
+    for n in names:
+        out += n.ljust(width, b"\0")
+    for col in COLUMNS:
+        values = []
+        for n in names:
+            v = by_name[n].get(col)
+            values.append(int(v) if isinstance(v, (int, float)) and not isinstance(v, bool) else NULL_VALUE)
+        out += struct.pack(f"<{len(values)}i", *values)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(out)
+    os.replace(tmp, path)
+    return len(names)
+
+
+class PokeTable:
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mm) < _HEADER.size:
+            raise ValueError("truncated table")
+        magic, version, self._width, self._count = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a pokemon table (or an older version)")
+        self._names_at = _HEADER.size
+        self._columns_at = self._names_at + self._count * self._width
+        if len(self._mm) < self._columns_at + 4 * self._count * len(COLUMNS):
+            raise ValueError("truncated table")
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _name(self, i: int) -> bytes:
+        start = self._names_at + i * self._width
+        return self._mm[start:start + self._width].rstrip(b"\0")
+
+    def _find(self, name: str) -> int:
+        key = name.strip().lower().encode("utf-8")
+        if len(key) > self._width:
+            return -1
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._name(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < self._count and self._name(lo) == key else -1
+
+    def _row(self, i: int) -> Dict[str, Any]:
+        item: Dict[str, Any] = {"name": self._name(i).decode("utf-8")}
+        for c, col in enumerate(COLUMNS):
+            (v,) = struct.unpack_from("<i", self._mm, self._columns_at + 4 * (c * self._count + i))
+            item[col] = None if v == NULL_VALUE else v
+        return item
+
+    def lookup(self, name: str) -> Optional[Dict[str, Any]]:
+        i = self._find(name)
+        return self._row(i) if i >= 0 else None
+
+    def rows(self) -> Iterator[Dict[str, Any]]:
+        for i in range(self._count):
+            yield self._row(i)
+
+    def names(self) -> List[str]:
+        return [self._name(i).decode("utf-8") for i in range(self._count)]
+
+    def close(self):
+        self._mm.close()
+
+
+_TABLE: Optional[PokeTable] = None
+_TABLE_LOADED = False
+
+
+def get_table() -> Optional[PokeTable]:
+    # None until `import-pokedex` has written the table
+    global _TABLE, _TABLE_LOADED
+    if not _TABLE_LOADED:
+        _TABLE_LOADED = True
+        try:
+            _TABLE = PokeTable(table_path())
+        except (OSError, ValueError):
+            _TABLE = None
+    return _TABLE
+
+
+def reset_table():
+    global _TABLE, _TABLE_LOADED
+    if _TABLE is not None:
+        _TABLE.close()
+    _TABLE, _TABLE_LOADED = None, False
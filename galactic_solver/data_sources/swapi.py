@@ -1,94 +1,358 @@
 from __future__ import annotations
-import httpx
+import json
 import os
-from decimal import Decimal
-from typing import Optional, Dict, Any
-from ..utils import cache_get, cache_set, parse_decimal
+from typing import TYPE_CHECKING, Optional, Dict, Any, List, Tuple
+from ..fuzzy import FuzzyIndex
+from ..metrics import count
+from ..mirrors import MirrorPool
+from ..schema import Character, Planet
+from ..singleflight import AsyncSingleFlight, SingleFlight
+from ..utils import MISSING, cache_get, cache_set, LazyClient, normalize_name, cache_path, write_json_atomic
+
+if TYPE_CHECKING:
+    import httpx
 
 BASE_URLS = [
     os.getenv("SWAPI_BASE_URL", "https://swapi.dev/api").rstrip("/"),
     "https://swapi.py4e.com/api",
 ]
+if os.getenv("SWAPI_BASE_URLS"):
+    BASE_URLS = [b.strip().rstrip("/") for b in os.getenv("SWAPI_BASE_URLS", "").split(",") if b.strip()]
 HTTP_TIMEOUT = 8.0
+# Seconds to wait on the fastest mirror before also asking the next one (unset: no hedging)
+HEDGE_DELAY = float(os.getenv("SWAPI_HEDGE_DELAY") or 0) or None
+
+MIRRORS = MirrorPool(BASE_URLS)
+
+# Concurrent misses for the same search / homeworld share one request
+_SEARCHES = SingleFlight("swapi.search")
+_ASEARCHES = AsyncSingleFlight("swapi.search")
+_HOMEWORLDS = SingleFlight("swapi.homeworld")
+_AHOMEWORLDS = AsyncSingleFlight("swapi.homeworld")
+
+# Built on first use (see LazyClient)
+client = LazyClient(HTTP_TIMEOUT)
+async_client = LazyClient(HTTP_TIMEOUT, asynchronous=True)
+
+def index_path() -> str:
+    return os.getenv("SWAPI_INDEX_PATH") or cache_path("swapi_index.json")
+
+INDEX_VERSION = 1
+
+PLANET_FIELDS = ("name", "rotation_period", "orbital_period", "diameter", "surface_water", "population")
+CHARACTER_FIELDS = ("name", "height", "mass")
+
+# Local name index: endpoint -> lookup key -> record (raw SWAPI strings, homeworld already a name)
+_INDEX: Dict[str, Dict[str, Dict[str, Any]]] = {}
+_INDEX_LOADED = False
+# endpoint -> fuzzy matcher over the index names, built on first miss
+_FUZZY: Dict[str, FuzzyIndex] = {}
+
+# Spanish (dubbed) names the API doesn't know
+_ALIAS = {
+    "people/": {
+        "arturito": "R2-D2",
+        "citripio": "C-3PO",
+        "chubaca": "Chewbacca",
+        "chewie": "Chewbacca",
+    },
+}
+
+
+def _index_keys(name: str) -> List[str]:
+    keys = [name.strip().lower(), normalize_name(name)]
+    return [k for k in dict.fromkeys(keys) if k]
+
+
+def _url_path(url: str) -> str:
+    # "https://swapi.dev/api/planets/1/" -> "planets/1/" (mirror independent)
+    _, sep, rest = url.partition("/api/")
+    return rest if sep else url
+
+
+def _build_index(people: List[Dict[str, Any]], planets: List[Dict[str, Any]]) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    index: Dict[str, Dict[str, Dict[str, Any]]] = {"people/": {}, "planets/": {}}
+    for endpoint, records in (("people/", people), ("planets/", planets)):
+        for rec in records:
+            name = rec.get("name")
+            if not isinstance(name, str):
+                continue
+            for k in _index_keys(name):
+                index[endpoint].setdefault(k, rec)
+    return index
+
+
+def load_index(path: Optional[str] = None) -> bool:
+    global _INDEX, _INDEX_LOADED
+    _INDEX_LOADED = True
+    try:
+        with open(path or index_path(), encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if not isinstance(data, dict) or data.get("version") != INDEX_VERSION:
+        return False
+    _INDEX = _build_index(data.get("people") or [], data.get("planets") or [])
+    _FUZZY.clear()
+    return True
+
+
+def _index_lookup(endpoint: str, name: str) -> Optional[Dict[str, Any]]:
+    if not _INDEX_LOADED:
+        load_index()
+    entries = _INDEX.get(endpoint)
+    if not entries:
+        return None
+    for k in _index_keys(name):
+        rec = entries.get(k)
+        if rec is not None:
+            return rec
+    return None
+
+
+def resolve_name(endpoint: str, name: str) -> Optional[Tuple[str, float]]:
+    # Index name closest to a misspelled, partial or Spanish one, with its score
+    fuzzy = _FUZZY.get(endpoint)
+    if fuzzy is None:
+        fuzzy = _FUZZY[endpoint] = FuzzyIndex(known_names(endpoint), _ALIAS.get(endpoint))
+    return fuzzy.lookup(name)
 
-client = httpx.Client(timeout=HTTP_TIMEOUT)
+
+def _fuzzy_lookup(endpoint: str, name: str) -> Tuple[Optional[Dict[str, Any]], str]:
+    # Only reached after an exact index miss; a hit saves the search request. Without the
+    # record (index not synced, alias only) the canonical name is what to search for
+    match = resolve_name(endpoint, name)
+    if match is None:
+        return None, name
+    count("fuzzy.hit.swapi")
+    return _index_lookup(endpoint, match[0]), match[0]
+
+
+def known_names(endpoint: str) -> List[str]:
+    if not _INDEX_LOADED:
+        load_index()
+    return sorted({rec["name"] for rec in _INDEX.get(endpoint, {}).values() if isinstance(rec.get("name"), str)})
+
+
+def catalog(endpoint: str) -> List[Any]:
+    # Every record of the local index as typed records (empty until `sync` has run)
+    if not _INDEX_LOADED:
+        load_index()
+    seen: Dict[int, Dict[str, Any]] = {}
+    for rec in _INDEX.get(endpoint, {}).values():
+        seen.setdefault(id(rec), rec)
+    if endpoint == "planets/":
+        return [_planet_record(rec) for rec in seen.values()]
+    return [_character_record(rec, rec.get("homeworld")) for rec in seen.values()]
+
+
+def _fetch_all(endpoint: str) -> List[Dict[str, Any]]:
+    results: List[Dict[str, Any]] = []
+    path: Optional[str] = endpoint
+    while path:
+        resp = MIRRORS.get(client, path, hedge_delay=HEDGE_DELAY)
+        resp.raise_for_status()
+        data = resp.json()
+        results.extend(data.get("results", []))
+        nxt = data.get("next")
+        path = _url_path(nxt) if nxt else None
+    return results
+
+
+def sync(path: Optional[str] = None) -> Dict[str, int]:
+    # Walk every people/ and planets/ page once and persist a local name index
+    raw_planets = _fetch_all("planets/")
+    raw_people = _fetch_all("people/")
+    planet_names = {_url_path(p.get("url") or ""): p.get("name") for p in raw_planets}
+    planets = [{f: p.get(f) for f in PLANET_FIELDS} for p in raw_planets]
+    people = []
+    for c in raw_people:
+        rec = {f: c.get(f) for f in CHARACTER_FIELDS}
+        hw = c.get("homeworld")
+        rec["homeworld"] = planet_names.get(_url_path(hw)) if hw else None
+        if hw and rec["homeworld"] is None:
+            rec["homeworld"] = _resolve_homeworld_name(hw)
+        people.append(rec)
+    write_json_atomic(path or index_path(), {"version": INDEX_VERSION, "people": people, "planets": planets})
+    global _INDEX, _INDEX_LOADED
+    _INDEX = _build_index(people, planets)
+    _INDEX_LOADED = True
+    _FUZZY.clear()
+    return {"people": len(people), "planets": len(planets)}
+
+
+def _pick_result(results: List[Dict[str, Any]], name: str) -> Optional[Dict[str, Any]]:
+    # Choose exact name match if available, then the closest name; otherwise first result
+    for r in results:
+        if r.get("name", "").lower() == name.lower():
+            return r
+    by_name = {r["name"]: r for r in results if isinstance(r.get("name"), str)}
+    match = FuzzyIndex(by_name).lookup(name) if len(by_name) > 1 else None
+    if match is not None:
+        return by_name[match[0]]
+    return results[0] if results else None
 
 
 def _search(endpoint: str, name: str) -> Optional[Dict[str, Any]]:
     key = f"swapi:{endpoint}:{name.lower()}"
     cached = cache_get(key)
+    if cached is MISSING:
+        return None
     if cached is not None:
         return cached  # type: ignore
-    # Try multiple SWAPI base URLs (primary and mirror)
-    for base in BASE_URLS:
-        try:
-            resp = client.get(f"{base}/{endpoint}", params={"search": name})
-            resp.raise_for_status()
-            data = resp.json()
-            results = data.get("results", [])
-            # Choose exact name match if available; otherwise first result
-            item = None
-            for r in results:
-                if r.get("name", "").lower() == name.lower():
-                    item = r
-                    break
-            if item is None and results:
-                item = results[0]
-            cache_set(key, item)
-            return item
-        except Exception:
-            # try next base URL
-            continue
-    # Cache miss as None to avoid repeated failing lookups
-    cache_set(key, None)
-    return None
+    try:
+        return _SEARCHES.do(key, _search_remote, key, endpoint, name)
+    except Exception:  # waited on another caller's search past the stage deadline
+        return None
 
 
-def _normalize_number(v) -> Optional[Decimal]:
-    return parse_decimal(v)
+def _search_remote(key: str, endpoint: str, name: str) -> Optional[Dict[str, Any]]:
+    # Fastest healthy mirror first (see MIRRORS), falling back to the others
+    try:
+        resp = MIRRORS.get(client, endpoint, params={"search": name}, hedge_delay=HEDGE_DELAY)
+        resp.raise_for_status()
+        item = _pick_result(resp.json().get("results", []), name)
+    except Exception:
+        # Every mirror failed: remember it for this run only, it may be transient
+        cache_set(key, MISSING, persist=False)
+        return None
+    cache_set(key, item if item is not None else MISSING)
+    return item
 
 
-def get_planet(name: str) -> Optional[Dict[str, Any]]:
-    p = _search("planets/", name)
+async def _asearch(endpoint: str, name: str) -> Optional[Dict[str, Any]]:
+    key = f"swapi:{endpoint}:{name.lower()}"
+    cached = cache_get(key)
+    if cached is MISSING:
+        return None
+    if cached is not None:
+        return cached  # type: ignore
+    try:
+        return await _ASEARCHES.do(key, _asearch_remote, key, endpoint, name)
+    except Exception:
+        return None
+
+
+async def _asearch_remote(key: str, endpoint: str, name: str) -> Optional[Dict[str, Any]]:
+    try:
+        resp = await MIRRORS.aget(async_client, endpoint, params={"search": name}, hedge_delay=HEDGE_DELAY)
+        resp.raise_for_status()
+        item = _pick_result(resp.json().get("results", []), name)
+    except Exception:
+        cache_set(key, MISSING, persist=False)
+        return None
+    cache_set(key, item if item is not None else MISSING)
+    return item
+
+
+def _planet_record(p: Dict[str, Any]) -> Planet:
+    return Planet.from_item(p)
+
+
+def _character_record(c: Dict[str, Any], homeworld_name: Optional[str]) -> Character:
+    record = Character.from_item(c)
+    record.homeworld = homeworld_name  # the raw item has the planet URL
+    return record
+
+
+def get_planet(name: str) -> Optional[Planet]:
+    # Local index first; HTTP search only for names the index doesn't know
+    p = _index_lookup("planets/", name)
+    if p is None:
+        p, name = _fuzzy_lookup("planets/", name)
+    p = p or _search("planets/", name)
     if not p:
         return None
-    return {
-        "name": p.get("name"),
-        "rotation_period": _normalize_number(p.get("rotation_period")),
-        "orbital_period": _normalize_number(p.get("orbital_period")),
-        "diameter": _normalize_number(p.get("diameter")),
-        "surface_water": _normalize_number(p.get("surface_water")),
-        "population": _normalize_number(p.get("population")),
-    }
+    return _planet_record(p)
+
+
+async def aget_planet(name: str) -> Optional[Planet]:
+    p = _index_lookup("planets/", name)
+    if p is None:
+        p, name = _fuzzy_lookup("planets/", name)
+    p = p or await _asearch("planets/", name)
+    if not p:
+        return None
+    return _planet_record(p)
+
+
+def _homeworld_key(url: str) -> str:
+    return f"swapi:planet-url:{_url_path(url)}"
+
+
+def _store_homeworld(key: str, resp: httpx.Response) -> Optional[str]:
+    if resp.status_code == 404:
+        cache_set(key, MISSING)
+        return None
+    resp.raise_for_status()
+    name = resp.json().get("name")
+    if isinstance(name, str):
+        cache_set(key, name)
+        return name
+    return None
 
 
 def _resolve_homeworld_name(url: Optional[str]) -> Optional[str]:
     if not url:
         return None
-    key = f"swapi:planet-url:{url}"
+    key = _homeworld_key(url)
     cached = cache_get(key)
+    if cached is MISSING:
+        return None
     if cached is not None:
         return cached  # type: ignore
     try:
-        resp = client.get(url)
-        resp.raise_for_status()
-        name = resp.json().get("name")
-        if isinstance(name, str):
-            cache_set(key, name)
-            return name
-        return None
+        return _HOMEWORLDS.do(key, _fetch_homeworld, key, url)
     except Exception:
         return None
 
 
-def get_character(name: str) -> Optional[Dict[str, Any]]:
-    c = _search("people/", name)
-    if not c:
+def _fetch_homeworld(key: str, url: str) -> Optional[str]:
+    return _store_homeworld(key, MIRRORS.get(client, _url_path(url), hedge_delay=HEDGE_DELAY))
+
+
+async def _afetch_homeworld(key: str, url: str) -> Optional[str]:
+    return _store_homeworld(key, await MIRRORS.aget(async_client, _url_path(url), hedge_delay=HEDGE_DELAY))
+
+
+async def _aresolve_homeworld_name(url: Optional[str]) -> Optional[str]:
+    if not url:
         return None
-    homeworld_name = _resolve_homeworld_name(c.get("homeworld"))
-    return {
-        "name": c.get("name"),
-        "height": _normalize_number(c.get("height")),
-        "mass": _normalize_number(c.get("mass")),
-        "homeworld": homeworld_name,
-    }
+    key = _homeworld_key(url)
+    cached = cache_get(key)
+    if cached is MISSING:
+        return None
+    if cached is not None:
+        return cached  # type: ignore
+    try:
+        return await _AHOMEWORLDS.do(key, _afetch_homeworld, key, url)
+    except Exception:
+        return None
+
+
+def get_character(name: str) -> Optional[Character]:
+    c = _index_lookup("people/", name)
+    if c is None:
+        c, name = _fuzzy_lookup("people/", name)
+    if c is not None:
+        homeworld_name = c.get("homeworld")
+    else:
+        c = _search("people/", name)
+        if not c:
+            return None
+        homeworld_name = _resolve_homeworld_name(c.get("homeworld"))
+    return _character_record(c, homeworld_name)
+
+
+async def aget_character(name: str) -> Optional[Character]:
+    c = _index_lookup("people/", name)
+    if c is None:
+        c, name = _fuzzy_lookup("people/", name)
+    if c is not None:
+        homeworld_name = c.get("homeworld")
+    else:
+        c = await _asearch("people/", name)
+        if not c:
+            return None
+        homeworld_name = await _aresolve_homeworld_name(c.get("homeworld"))
+    return _character_record(c, homeworld_name)
@@ -1,6 +1,7 @@
 from __future__ import annotations
 from decimal import Decimal, ROUND_HALF_UP
-from typing import Any, Dict
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional
 import ast
 
 ALLOWED_BIN_OPS = {
@@ -24,54 +25,106 @@ def _to_decimal(v: Any) -> Decimal:
     raise ValueError("Unsupported value type for Decimal conversion")
 
 
-def eval_expression(expression: str, variables: Dict[str, Any]) -> Decimal:
-    tree = ast.parse(expression, mode='eval')
-
-    def eval_node(node) -> Any:
-        if isinstance(node, ast.Expression):
-            return eval_node(node.body)
-        if isinstance(node, ast.Num):  # Python <3.8
-            return Decimal(str(node.n))
-        if isinstance(node, ast.Constant):  # Python 3.8+
-            if isinstance(node.value, (int, float)):
-                return Decimal(str(node.value))
-            if isinstance(node.value, str):
-                return node.value
-            raise ValueError("Unsupported constant type")
-        if isinstance(node, ast.Name):
-            if node.id not in variables:
-                raise ValueError(f"Unknown variable {node.id}")
-            return variables[node.id]
-        if isinstance(node, ast.BinOp) and type(node.op) in ALLOWED_BIN_OPS:
-            left = eval_node(node.left)
-            right = eval_node(node.right)
-            l = _to_decimal(left)
-            r = _to_decimal(right)
-            if isinstance(node.op, ast.Add):
-                return l + r
-            if isinstance(node.op, ast.Sub):
-                return l - r
-            if isinstance(node.op, ast.Mult):
-                return l * r
-            if isinstance(node.op, ast.Div):
-                if r == 0:
-                    raise ZeroDivisionError("Division by zero in expression")
-                return l / r
-        if isinstance(node, ast.UnaryOp) and type(node.op) in ALLOWED_UNARY_OPS:
-            operand = _to_decimal(eval_node(node.operand))
-            if isinstance(node.op, ast.UAdd):
-                return operand
-            if isinstance(node.op, ast.USub):
-                return -operand
-        if isinstance(node, ast.Call):
-            if isinstance(node.func, ast.Name) and node.func.id == 'len' and len(node.args) == 1:
-                val = eval_node(node.args[0])
+Compiled = Callable[[Dict[str, Any]], Any]
+
+
+def _raiser(make_exc: Callable[[], Exception]) -> Compiled:
+    # Unsupported elements fail when evaluated (not when compiled) to keep the
+    # original evaluation order, e.g. a ZeroDivisionError on the left still wins
+    def run(variables: Dict[str, Any]) -> Any:
+        raise make_exc()
+    return run
+
+
+def _compile_node(node: ast.AST) -> Compiled:
+    if isinstance(node, ast.Expression):
+        return _compile_node(node.body)
+    if isinstance(node, ast.Constant):
+        value = node.value
+        if isinstance(value, (int, float, complex)):
+            try:
+                const = Decimal(str(value))
+            except Exception:
+                return lambda variables: Decimal(str(value))  # re-raises on every evaluation
+            return lambda variables: const
+        if isinstance(value, str):
+            return lambda variables: value
+        return _raiser(lambda: ValueError("Unsupported constant type"))
+    if isinstance(node, ast.Name):
+        name = node.id
+
+        def lookup(variables: Dict[str, Any]) -> Any:
+            if name not in variables:
+                raise ValueError(f"Unknown variable {name}")
+            return variables[name]
+        return lookup
+    if isinstance(node, ast.BinOp) and type(node.op) in ALLOWED_BIN_OPS:
+        left, right = _compile_node(node.left), _compile_node(node.right)
+        op = type(node.op)
+        if op is ast.Add:
+            def add(variables: Dict[str, Any]) -> Decimal:
+                lv, rv = left(variables), right(variables)
+                return _to_decimal(lv) + _to_decimal(rv)
+            return add
+        if op is ast.Sub:
+            def sub(variables: Dict[str, Any]) -> Decimal:
+                lv, rv = left(variables), right(variables)
+                return _to_decimal(lv) - _to_decimal(rv)
+            return sub
+        if op is ast.Mult:
+            def mul(variables: Dict[str, Any]) -> Decimal:
+                lv, rv = left(variables), right(variables)
+                return _to_decimal(lv) * _to_decimal(rv)
+            return mul
+
+        def div(variables: Dict[str, Any]) -> Decimal:
+            lv, rv = left(variables), right(variables)
+            l, r = _to_decimal(lv), _to_decimal(rv)
+            if r == 0:
+                raise ZeroDivisionError("Division by zero in expression")
+            return l / r
+        return div
+    if isinstance(node, ast.UnaryOp) and type(node.op) in ALLOWED_UNARY_OPS:
+        operand = _compile_node(node.operand)
+        if isinstance(node.op, ast.UAdd):
+            return lambda variables: _to_decimal(operand(variables))
+        return lambda variables: -_to_decimal(operand(variables))
+    if isinstance(node, ast.Call):
+        if isinstance(node.func, ast.Name) and node.func.id == 'len' and len(node.args) == 1:
+            arg = _compile_node(node.args[0])
+
+            def length(variables: Dict[str, Any]) -> Decimal:
+                val = arg(variables)
                 if isinstance(val, str):
                     return Decimal(len(val))
                 # If val is not string, coerce to string length safely
                 return Decimal(len(str(val)))
-            raise ValueError("Only len(x) function is allowed")
-        raise ValueError("Unsupported expression element")
+            return length
+        return _raiser(lambda: ValueError("Only len(x) function is allowed"))
+    return _raiser(lambda: ValueError("Unsupported expression element"))
+
+
+@lru_cache(maxsize=1024)
+def compile_expression(expression: str) -> Compiled:
+    # Parsed and validated once per expression string
+    return _compile_node(ast.parse(expression, mode='eval'))
+
 
-    result = eval_node(tree)
+def eval_expression(expression: str, variables: Dict[str, Any]) -> Decimal:
+    result = compile_expression(expression)(variables)
     return round10(_to_decimal(result))
+
+
+def eval_many(expression: str, bindings: Iterable[Dict[str, Any]], skip_errors: bool = False) -> List[Optional[Decimal]]:
+    # One compiled expression over many variable bindings; with skip_errors a failing
+    # binding (division by zero, unknown variable...) yields None instead of raising
+    fn = compile_expression(expression)
+    results: List[Optional[Decimal]] = []
+    for variables in bindings:
+        try:
+            results.append(round10(_to_decimal(fn(variables))))
+        except Exception:
+            if not skip_errors:
+                raise
+            results.append(None)
+    return results
@@ -0,0 +1,124 @@
+from __future__ import annotations
+from collections import Counter
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+from .utils import normalize_name
+
+# Offline fuzzy name resolution: canonical names are indexed by normalized key (accents,
+# case and punctuation dropped), by the key without spaces, by their words and by
+# character trigrams. A lookup tries, in order: exact key ("Mr Mime" -> "mr-mime"), the
+# same words in a longer name when only one name has them ("Obi Wan" -> "Obi-Wan
+# Kenobi"), then trigram overlap re-scored by edit distance for typos ("Skywaker").
+# Ambiguous or weak matches return None so the caller falls back to its remote lookup.
+
+MIN_SCORE = 0.8
+# The best match must beat the runner-up by this much
+MIN_MARGIN = 0.05
+SHORTLIST = 4
+TOKEN_SUBSET_SCORE = 0.9
+
+# Spanish words for name parts the catalogs spell differently
+_WORD_SYNONYMS = {"hembra": "f", "macho": "m"}
+_SYMBOLS = str.maketrans({"♀": " f", "♂": " m"})
+
+Match = Tuple[str, float]
+
+
+def fuzzy_key(name: str) -> str:
+    words = normalize_name(name.translate(_SYMBOLS)).split()
+    return " ".join(_WORD_SYNONYMS.get(w, w) for w in words)
+
+
+def _trigrams(key: str) -> set:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _edit_similarity(a: str, b: str) -> float:
+    # 1 - Levenshtein distance / longer length
+    if a == b:
+        return 1.0
+    if len(a) < len(b):
+        a, b = b, a
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        prev = cur
+    return 1.0 - prev[-1] / len(a)
+
+
+class FuzzyIndex:
+    def __init__(self, names: Iterable[str], aliases: Optional[Mapping[str, str]] = None):
+        self._names: List[str] = []
+        self._keys: List[str] = []
+        self._grams: List[set] = []
+        self._exact: Dict[str, int] = {}
+        self._by_word: Dict[str, List[int]] = {}
+        self._by_gram: Dict[str, List[int]] = {}
+        for name in names:
+            self._add(name, name)
+        for alias, target in (aliases or {}).items():
+            self._add(alias, target)
+
+    def _add(self, text: str, canonical: str):
+        key = fuzzy_key(text)
+        if not key or key in self._exact:
+            return
+        i = len(self._names)
+        self._names.append(canonical)
+        self._keys.append(key)
+        self._exact[key] = i
+        self._exact.setdefault(key.replace(" ", ""), i)
+        for w in set(key.split()):
+            self._by_word.setdefault(w, []).append(i)
+        grams = _trigrams(key)
+        self._grams.append(grams)
+        for g in grams:
+            self._by_gram.setdefault(g, []).append(i)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def lookup(self, name: str) -> Optional[Match]:
+        # (canonical name, score in 0..1) or None
+        key = fuzzy_key(name)
+        if not key:
+            return None
+        i = self._exact.get(key)
+        if i is None:
+            i = self._exact.get(key.replace(" ", ""))
+        if i is not None:
+            return self._names[i], 1.0
+        words = key.split()
+        common = None
+        for w in words:
+            ids = set(self._by_word.get(w, ()))
+            common = ids if common is None else common & ids
+            if not common:
+                break
+        if common:
+            targets = {self._names[j] for j in common}
+            if len(targets) == 1:
+                return targets.pop(), TOKEN_SUBSET_SCORE
+            return None  # "Darth": Vader or Maul
+        return self._closest(key)
+
+    def _closest(self, key: str) -> Optional[Match]:
+        grams = _trigrams(key)
+        shared: Counter = Counter()
+        for g in grams:
+            for i in self._by_gram.get(g, ()):
+                shared[i] += 1
+        if not shared:
+            return None
+        dice = {i: 2 * n / (len(grams) + len(self._grams[i])) for i, n in shared.items()}
+        shortlist = sorted(dice, key=dice.get, reverse=True)[:SHORTLIST]
+        scored = sorted(((max(dice[i], _edit_similarity(key, self._keys[i])), i) for i in shortlist), reverse=True)
+        best, i = scored[0]
+        if best < MIN_SCORE:
+            return None
+        for score, j in scored[1:]:
+            if self._names[j] != self._names[i] and best - score < MIN_MARGIN:
+                return None
+        return self._names[i], best
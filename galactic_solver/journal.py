@@ -0,0 +1,147 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from decimal import Decimal
+from typing import Any, Dict, Optional
+from .metrics import count
+from .utils import cache_path, json_default
+
+# Append-only journal of every solved statement (practice, rescore, official): normalized
+# statement hash, parse, resolved entity values, round10 answer and, when the API's
+# expected value was known, whether the answer matched it. The latest graded entry of a
+# statement decides: verified answers are kept in memory (loaded once, e.g. by warmup), so
+# the official loop answers a statement practice already confirmed with a dict lookup,
+# before any parse or fetch. Disable with GALACTIC_JOURNAL=off.
+
+JOURNAL_STATS: Counter = Counter()
+
+
+def journal_path() -> str:
+    return os.getenv("GALACTIC_JOURNAL_PATH") or cache_path("answers.sqlite3")
+
+
+def journal_enabled() -> bool:
+    return os.getenv("GALACTIC_JOURNAL", "on").lower() not in ("off", "0", "false", "no")
+
+
+def statement_key(statement: str) -> str:
+    # Same statement regardless of case and spacing; numbers and names are kept as written
+    text = " ".join(statement.split()).casefold()
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _json(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    return json.dumps(value, ensure_ascii=False, default=json_default)
+
+
+class AnswerJournal:
+    def __init__(self, path: Optional[str] = None):
+        self.path = path = path or journal_path()
+        self._lock = threading.Lock()
+        self._verified: Optional[Dict[str, Optional[Decimal]]] = None  # key -> answer, None if refuted
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            " id INTEGER PRIMARY KEY, statement_key TEXT NOT NULL, statement TEXT NOT NULL,"
+            " parse TEXT, entities TEXT, answer TEXT, expected TEXT, verified INTEGER,"
+            " source TEXT, recorded_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS answers_key ON answers(statement_key, id)")
+
+    def _load(self) -> Dict[str, Optional[Decimal]]:
+        # Latest graded entry per statement
+        if self._verified is None:
+            rows = self._conn.execute(
+                "SELECT statement_key, answer, verified FROM answers WHERE verified IS NOT NULL ORDER BY id"
+            ).fetchall()
+            verified: Dict[str, Optional[Decimal]] = {}
+            for key, answer, ok in rows:
+                verified[key] = Decimal(answer) if ok and answer is not None else None
+            self._verified = verified
+        return self._verified
+
+    def preload(self) -> int:
+        # Verified statements available to lookup()
+        with self._lock:
+            return sum(1 for answer in self._load().values() if answer is not None)
+
+    def lookup(self, statement: str) -> Optional[Decimal]:
+        # Answer practice confirmed for this statement, or None
+        key = statement_key(statement)
+        with self._lock:
+            return self._load().get(key)
+
+    def record(self, statement: str, answer: Optional[Decimal], parse: Any = None, entities: Any = None,
+               verified: Optional[bool] = None, expected: Any = None, source: str = ""):
+        key = statement_key(statement)
+        row = (key, statement, _json(parse), _json(entities), str(answer) if answer is not None else None,
+               str(expected) if expected is not None else None,
+               None if verified is None else int(bool(verified)), source, time.time())
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO answers (statement_key, statement, parse, entities, answer, expected, verified,"
+                " source, recorded_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                row,
+            )
+            if verified is not None and self._verified is not None:
+                self._verified[key] = answer if verified and answer is not None else None
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_JOURNAL: Optional[AnswerJournal] = None
+_JOURNAL_LOCK = threading.Lock()
+
+
+def get_journal() -> Optional[AnswerJournal]:
+    # None when disabled or the file can't be opened (the solver works without it)
+    global _JOURNAL
+    if not journal_enabled():
+        return None
+    with _JOURNAL_LOCK:
+        if _JOURNAL is None:
+            try:
+                _JOURNAL = AnswerJournal()
+            except sqlite3.Error as ex:
+                print(f"[WARN] No se pudo abrir el diario de respuestas {journal_path()}: {ex}")
+                return None
+        return _JOURNAL
+
+
+def lookup_answer(statement: str) -> Optional[Decimal]:
+    journal = get_journal()
+    answer = journal.lookup(statement) if journal is not None else None
+    if answer is not None:
+        JOURNAL_STATS["hit"] += 1
+        count("journal.hit")
+    return answer
+
+
+def record_answer(statement: str, answer: Optional[Decimal], trace: Optional[Dict[str, Any]] = None,
+                  verified: Optional[bool] = None, expected: Any = None, source: str = ""):
+    journal = get_journal()
+    if journal is None:
+        return
+    trace = trace or {}
+    try:
+        journal.record(statement, answer, trace.get("parse"), trace.get("entities"), verified, expected, source)
+    except sqlite3.Error as ex:
+        print(f"[WARN] No se pudo escribir en el diario de respuestas: {ex}")
+        return
+    JOURNAL_STATS["recorded"] += 1
+
+
+def journal_stats_summary() -> str:
+    return f"hit={JOURNAL_STATS['hit']}, recorded={JOURNAL_STATS['recorded']}"
@@ -0,0 +1,182 @@
+from __future__ import annotations
+import contextvars
+import csv
+import json
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+from urllib.parse import urlsplit
+
+# Timing spans for every stage (parse, fetch, evaluate, submit...) and HTTP call, plus
+# per-problem outcomes; write_report() turns them into p50/p95/max tables.
+
+
+# HTTP requests issued inside the innermost open span (per thread / asyncio task)
+_HTTP_CALLS: contextvars.ContextVar[Optional[List[int]]] = contextvars.ContextVar("galactic_http_calls", default=None)
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started = time.perf_counter()
+            self.spans: List[Dict[str, Any]] = []
+            self.counters: Counter = Counter()
+            self.problems: List[Dict[str, Any]] = []
+            self._inflight: Dict[int, float] = {}
+
+    def add_span(self, stage: str, seconds: float, **tags):
+        with self._lock:
+            self.spans.append({"stage": stage, "seconds": seconds, **tags})
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] += n
+
+    def add_problem(self, problem_id: Any, seconds: float, fallback: bool, **extra):
+        with self._lock:
+            self.problems.append({"problem_id": problem_id, "seconds": seconds, "fallback": fallback, **extra})
+
+    # httpx event hooks (sync and async flavours)
+    def _on_request(self, request):
+        calls = _HTTP_CALLS.get()
+        if calls is not None:
+            calls[0] += 1
+        with self._lock:
+            self._inflight[id(request)] = time.perf_counter()
+
+    def _on_response(self, response):
+        request = response.request
+        with self._lock:
+            t0 = self._inflight.pop(id(request), None)
+        if t0 is None:
+            return
+        self.add_span("http", time.perf_counter() - t0, host=urlsplit(str(request.url)).hostname or "",
+                      method=request.method, status=response.status_code)
+
+    async def _aon_request(self, request):
+        self._on_request(request)
+
+    async def _aon_response(self, response):
+        self._on_response(response)
+
+    def event_hooks(self, asynchronous: bool = False) -> Dict[str, list]:
+        if asynchronous:
+            return {"request": [self._aon_request], "response": [self._aon_response]}
+        return {"request": [self._on_request], "response": [self._on_response]}
+
+    def stage_stats(self, stage: str, **tags) -> Dict[str, float]:
+        # Stats of one stage's spans, only those carrying the given tags
+        with self._lock:
+            spans = list(self.spans)
+        return _stats([sp["seconds"] for sp in spans
+                       if sp["stage"] == stage and all(sp.get(k) == v for k, v in tags.items())])
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = list(self.spans)
+            problems = list(self.problems)
+            counters = dict(self.counters)
+            elapsed = time.perf_counter() - self.started
+        by_stage: Dict[str, List[float]] = defaultdict(list)
+        by_host: Dict[str, List[float]] = defaultdict(list)
+        hits: Counter = Counter()
+        for sp in spans:
+            by_stage[sp["stage"]].append(sp["seconds"])
+            if sp.get("cache") == "hit":
+                hits[sp["stage"]] += 1
+            if sp["stage"] == "http":
+                by_host[sp.get("host") or "?"].append(sp["seconds"])
+        fallbacks = [p for p in problems if p["fallback"]]
+        solved = len(problems) - len(fallbacks)
+        retry_seconds = sum(sp["seconds"] for sp in spans if sp.get("retry"))
+        return {
+            "elapsed_seconds": elapsed,
+            "problems": len(problems),
+            "solved": solved,
+            "fallbacks": len(fallbacks),
+            # Solved (not fallback) problems over wall-clock time: concurrent problems overlap
+            "problems_per_minute": solved / (elapsed / 60.0) if elapsed > 0 else 0.0,
+            "fallback_seconds": sum(p["seconds"] for p in fallbacks) + retry_seconds,
+            "stages": {k: _stats(v, hits[k]) for k, v in sorted(by_stage.items()) if k != "http"},
+            "http_hosts": {k: _stats(v) for k, v in sorted(by_host.items())},
+            "counters": counters,
+        }
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    # Nearest-rank percentile
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, int(round(q * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+
+def _stats(values: List[float], cache_hits: Optional[int] = None) -> Dict[str, float]:
+    vs = sorted(values)
+    out = {
+        "count": len(vs),
+        "p50": _percentile(vs, 0.50),
+        "p95": _percentile(vs, 0.95),
+        "max": vs[-1] if vs else 0.0,
+        "total": sum(vs),
+    }
+    if cache_hits is not None:
+        out["cache_hits"] = cache_hits
+    return out
+
+
+RECORDER = Recorder()
+
+
+@contextmanager
+def span(stage: str, **tags) -> Iterator[Dict[str, Any]]:
+    # Tags can be added inside the block through the yielded dict (e.g. cache="hit")
+    t0 = time.perf_counter()
+    extra: Dict[str, Any] = dict(tags)
+    parent = _HTTP_CALLS.get()
+    calls = [0]
+    token = _HTTP_CALLS.set(calls)
+    try:
+        yield extra
+    finally:
+        _HTTP_CALLS.reset(token)
+        if parent is not None:
+            parent[0] += calls[0]
+        # No HTTP request inside the span means it was served from cache/index/local data
+        extra.setdefault("http_calls", calls[0])
+        extra.setdefault("cache", "hit" if calls[0] == 0 else "miss")
+        RECORDER.add_span(stage, time.perf_counter() - t0, **extra)
+
+
+def count(name: str, n: int = 1):
+    RECORDER.count(name, n)
+
+
+def write_report(path: str, recorder: Optional[Recorder] = None) -> Dict[str, Any]:
+    # JSON by default; a .csv path gets one row per stage/host plus a run row
+    data = (recorder or RECORDER).summary()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if path.lower().endswith(".csv"):
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            w.writerow(["kind", "name", "count", "p50", "p95", "max", "total", "cache_hits"])
+            for kind, table in (("stage", data["stages"]), ("http", data["http_hosts"])):
+                for name, st in table.items():
+                    w.writerow([kind, name, st["count"], f"{st['p50']:.6f}", f"{st['p95']:.6f}",
+                                f"{st['max']:.6f}", f"{st['total']:.6f}", st.get("cache_hits", "")])
+            w.writerow(["run", "problems", data["problems"], "", "", "", f"{data['elapsed_seconds']:.6f}", ""])
+            w.writerow(["run", "fallbacks", data["fallbacks"], "", "", "", f"{data['fallback_seconds']:.6f}", ""])
+            w.writerow(["run", "problems_per_minute", f"{data['problems_per_minute']:.3f}", "", "", "", "", ""])
+            for name, n in sorted(data["counters"].items()):
+                w.writerow(["counter", name, n, "", "", "", "", ""])
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+    return data
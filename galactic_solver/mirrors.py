@@ -0,0 +1,176 @@
+from __future__ import annotations
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+from .profiling import in_worker
+
+if TYPE_CHECKING:
+    import httpx
+
+# Latency-ranked base URLs with optional hedging: after hedge_delay seconds without an
+# answer the same request is also sent to the next mirror and the first answer wins.
+
+EWMA_ALPHA = 0.3
+MAX_COOLDOWN = 60.0
+
+_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="mirror")
+
+
+class MirrorStats:
+    __slots__ = ("ewma", "successes", "failures", "consecutive_failures", "last_failure")
+
+    def __init__(self):
+        self.ewma: Optional[float] = None
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.last_failure = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "ewma": self.ewma,
+            "successes": self.successes,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+        }
+
+
+class MirrorPool:
+    def __init__(self, bases: List[str]):
+        self.bases = [b.rstrip("/") for b in bases]
+        self.stats = {b: MirrorStats() for b in self.bases}
+        self._lock = threading.Lock()
+
+    def ranked(self) -> List[str]:
+        # Healthy mirrors first, fastest EWMA first. Untried mirrors rank as instant so each
+        # one gets measured once; ties keep the configured order
+        now = time.monotonic()
+        with self._lock:
+            def key(item):
+                i, base = item
+                st = self.stats[base]
+                cooldown = min(MAX_COOLDOWN, 2.0 ** st.consecutive_failures) if st.consecutive_failures else 0.0
+                cooling = st.consecutive_failures > 0 and now - st.last_failure < cooldown
+                return (cooling, st.ewma if st.ewma is not None else 0.0, i)
+            return [b for _, b in sorted(enumerate(self.bases), key=key)]
+
+    def record_success(self, base: str, latency: float):
+        with self._lock:
+            st = self.stats[base]
+            st.ewma = latency if st.ewma is None else EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * st.ewma
+            st.successes += 1
+            st.consecutive_failures = 0
+
+    def record_failure(self, base: str):
+        with self._lock:
+            st = self.stats[base]
+            st.failures += 1
+            st.consecutive_failures += 1
+            st.last_failure = time.monotonic()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {b: st.as_dict() for b, st in self.stats.items()}
+
+    def _attempt(self, client: httpx.Client, base: str, path: str, params: Optional[Dict[str, Any]]) -> httpx.Response:
+        t0 = time.monotonic()
+        try:
+            resp = client.get(f"{base}/{path}", params=params)
+            if resp.status_code >= 500:
+                resp.raise_for_status()
+        except Exception:
+            self.record_failure(base)
+            raise
+        # 4xx is a valid answer (e.g. 404 for an unknown id); only 5xx/transport errors count against a mirror
+        self.record_success(base, time.monotonic() - t0)
+        return resp
+
+    def probe(self, client: httpx.Client) -> int:
+        # One request to every mirror's root, in parallel: opens the connections and seeds
+        # the ranking (warmup). Returns how many mirrors answered
+        futures = [_EXECUTOR.submit(self._attempt, client, base, "", None) for base in self.bases]
+        return sum(1 for fut in futures if fut.exception() is None)
+
+    async def aprobe(self, client: httpx.AsyncClient) -> int:
+        results = await asyncio.gather(*(self._aattempt(client, base, "", None) for base in self.bases),
+                                       return_exceptions=True)
+        return sum(1 for r in results if not isinstance(r, BaseException))
+
+    def get(self, client: httpx.Client, path: str, params: Optional[Dict[str, Any]] = None,
+            hedge_delay: Optional[float] = None) -> httpx.Response:
+        order = self.ranked()
+        if not hedge_delay or len(order) < 2:
+            last_error: Optional[Exception] = None
+            for base in order:
+                try:
+                    return self._attempt(client, base, path, params)
+                except Exception as ex:
+                    # try next base URL
+                    last_error = ex
+            raise last_error or RuntimeError("No mirrors configured")
+
+        pending: set[Future] = set()
+        remaining = list(order)
+        last_error = None
+        while remaining or pending:
+            if remaining:
+                # Same contextvars: the hedged attempt keeps the caller's stage deadline
+                pending.add(_EXECUTOR.submit(contextvars.copy_context().run, in_worker(self._attempt), client,
+                                             remaining.pop(0), path, params))
+            # Wait for an answer; hedge to the next mirror if none arrives in time
+            done, pending = wait(pending, timeout=hedge_delay if remaining else None, return_when=FIRST_COMPLETED)
+            for fut in done:
+                try:
+                    return fut.result()
+                except Exception as ex:
+                    last_error = ex
+        raise last_error or RuntimeError("No mirrors configured")
+
+    async def _aattempt(self, client: httpx.AsyncClient, base: str, path: str, params: Optional[Dict[str, Any]]) -> httpx.Response:
+        t0 = time.monotonic()
+        try:
+            resp = await client.get(f"{base}/{path}", params=params)
+            if resp.status_code >= 500:
+                resp.raise_for_status()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.record_failure(base)
+            raise
+        self.record_success(base, time.monotonic() - t0)
+        return resp
+
+    async def aget(self, client: httpx.AsyncClient, path: str, params: Optional[Dict[str, Any]] = None,
+                   hedge_delay: Optional[float] = None) -> httpx.Response:
+        order = self.ranked()
+        if not hedge_delay or len(order) < 2:
+            last_error: Optional[Exception] = None
+            for base in order:
+                try:
+                    return await self._aattempt(client, base, path, params)
+                except Exception as ex:
+                    last_error = ex
+            raise last_error or RuntimeError("No mirrors configured")
+
+        pending: set[asyncio.Task] = set()
+        remaining = list(order)
+        last_error = None
+        try:
+            while remaining or pending:
+                if remaining:
+                    pending.add(asyncio.ensure_future(self._aattempt(client, remaining.pop(0), path, params)))
+                done, pending = await asyncio.wait(pending, timeout=hedge_delay if remaining else None,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    try:
+                        return task.result()
+                    except Exception as ex:
+                        last_error = ex
+            raise last_error or RuntimeError("No mirrors configured")
+        finally:
+            # The slower duplicate is no longer needed
+            for task in pending:
+                task.cancel()
@@ -0,0 +1,82 @@
+from __future__ import annotations
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+from .data_sources import swapi, pokeapi
+from .utils import normalize_name
+
+# Tokens of a statement; punctuation that never belongs to a name is left out
+_TOKEN_RE = re.compile(r"[^\s,;:¿?¡!()\"]+")
+_MAX_WORDS = 6
+
+
+@dataclass(frozen=True)
+class Mention:
+    start: int
+    end: int
+    text: str
+    candidates: Tuple[Tuple[str, str], ...]  # (entity type, canonical name)
+
+
+class NameDictionary:
+    # Normalized entity name -> candidate (type, canonical name) pairs
+    def __init__(self, entries: Iterable[Tuple[str, str]]):
+        self._by_key: Dict[str, List[Tuple[str, str]]] = {}
+        self.max_words = 1
+        for etype, name in entries:
+            key = normalize_name(name)
+            if not key:
+                continue
+            bucket = self._by_key.setdefault(key, [])
+            if (etype, name) not in bucket:
+                bucket.append((etype, name))
+            self.max_words = max(self.max_words, min(len(key.split()), _MAX_WORDS))
+
+    def __len__(self) -> int:
+        return len(self._by_key)
+
+    def lookup(self, name: str) -> List[Tuple[str, str]]:
+        return self._by_key.get(normalize_name(name), [])
+
+    def find_mentions(self, text: str) -> List[Mention]:
+        # Longest match first; a mention must start with an uppercase letter
+        tokens = [(m.start(), m.end()) for m in _TOKEN_RE.finditer(text)]
+        mentions: List[Mention] = []
+        i = 0
+        while i < len(tokens):
+            if not text[tokens[i][0]].isupper():
+                i += 1
+                continue
+            for n in range(min(self.max_words, len(tokens) - i), 0, -1):
+                start, end = tokens[i][0], tokens[i + n - 1][1]
+                candidates = self._by_key.get(normalize_name(text[start:end]))
+                if candidates:
+                    mentions.append(Mention(start, end, text[start:end].rstrip("."), tuple(candidates)))
+                    i += n
+                    break
+            else:
+                i += 1
+        return mentions
+
+
+def _catalog_entries() -> List[Tuple[str, str]]:
+    entries = [("sw_character", n) for n in swapi.known_names("people/")]
+    entries += [("sw_planet", n) for n in swapi.known_names("planets/")]
+    entries += [("pokemon", n) for n in pokeapi.known_names()]
+    entries += [("pokemon", alias) for alias in pokeapi._ALIAS]
+    return entries
+
+
+_DICTIONARY: Optional[NameDictionary] = None
+
+
+def get_dictionary() -> NameDictionary:
+    global _DICTIONARY
+    if _DICTIONARY is None:
+        _DICTIONARY = NameDictionary(_catalog_entries())
+    return _DICTIONARY
+
+
+def reset_dictionary():
+    global _DICTIONARY
+    _DICTIONARY = None
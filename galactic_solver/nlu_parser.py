@@ -1,9 +1,21 @@
 from __future__ import annotations
+import ast
 import json
-from typing import Any, Dict, List, Optional
-from .challenge_client import ChallengeClient
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from .challenge_client import AsyncChallengeClient, ChallengeClient
+from .metrics import count, span
+from .parse_cache import get_template_cache
+from .rule_parser import parse_local
+from .scheduler import ProblemBudget, time_left
+from .schema import ATTRIBUTE_OWNER, SCHEMAS
+from .stream_json import EntityStreamParser
 
-# Expected deterministic schema from the LLM:
+# Expected deterministic schema from the LLM (full protocol; "notes" is asked for but
+# not used):
 # {
 #   "entities": [ {"type": "sw_character"|"sw_planet"|"pokemon", "name": string}, ... ],
 #   "vars": { "x1": {"entity": 0, "attribute": string }, ... },
@@ -29,48 +41,358 @@ SYSTEM_DEV_MSG = (
     "No incluyas texto adicional, solo JSON."
 )
 
+# Compact protocol: schema first, short keys and nothing the code doesn't read, so both
+# the prompt and the answer are a fraction of the full protocol's tokens:
+# {"e": [[type, name], ...], "v": {"x1": [entity, attribute], ...}, "x": "x1 * 2"}
+COMPACT_DEV_MSG = (
+    'Solo JSON: {"e":[[tipo,nombre]],"v":{var:[i,atributo]},"x":expresión}; i = índice en e.\n'
+    "sw_planet: rotation_period orbital_period diameter surface_water population name\n"
+    "sw_character: height mass homeworld name (peso=mass, planeta natal=homeworld)\n"
+    "pokemon: base_experience height weight name (peso=weight)\n"
+    "Largo de un texto: len(var). Operadores: + - * / ( )"
+)
+
+PROTOCOLS = ("full", "compact")
+# Output token cap for the compact answer (a parse takes 30-80 tokens)
+COMPACT_MAX_TOKENS = int(os.getenv("GALACTIC_COMPACT_MAX_TOKENS") or 200)
+# Characters of a rejected answer echoed back in the repair request
+MAX_ECHO_CHARS = 400
+
+
+# Local rule-based parses at or above this confidence skip the LLM
+LOCAL_MIN_CONFIDENCE = 0.85
+
+# How often each parse path is taken: local, template, llm, llm_retry, failed, skipped
+# (no LLM call: the time budget left for the parse was below the usual LLM latency)
+PARSE_STATS: Counter = Counter()
+
+
+def _local_parse(statement: str) -> Optional[Dict[str, Any]]:
+    if os.getenv("GALACTIC_LOCAL_PARSER", "on").lower() in ("off", "0", "false", "no"):
+        return None
+    try:
+        parsed, confidence = parse_local(statement)
+    except Exception:
+        return None
+    if parsed is not None and confidence >= LOCAL_MIN_CONFIDENCE:
+        PARSE_STATS["local"] += 1
+        return parsed
+    return None
+
+
+def _templates_enabled() -> bool:
+    return os.getenv("GALACTIC_PARSE_TEMPLATES", "on").lower() not in ("off", "0", "false", "no")
+
+
+def _cached_parse(statement: str) -> Optional[Dict[str, Any]]:
+    # Local rules first, then a memoized parse of a statement with the same template
+    local = _local_parse(statement)
+    if local is not None or not _templates_enabled():
+        return local
+    try:
+        parsed = get_template_cache().lookup(statement)
+    except Exception:
+        return None
+    if parsed is not None:
+        PARSE_STATS["template"] += 1
+    return parsed
+
+
+def _stream_enabled() -> bool:
+    return os.getenv("GALACTIC_STREAM", "off").lower() in ("on", "1", "true", "yes")
+
+
+EntityCallback = Optional[Callable[[Dict[str, Any]], None]]
+
+
+def _notify(on_entity: EntityCallback, entities: List[Dict[str, Any]]):
+    if on_entity is None:
+        return
+    for ent in entities:
+        try:
+            on_entity(ent)
+        except Exception:
+            pass
+
+
+def _stream_reader(protocol: str) -> EntityStreamParser:
+    if protocol == "compact":
+        return EntityStreamParser("e", _compact_entity)
+    return EntityStreamParser()
+
+
+def _streamed_completion(client: ChallengeClient, messages: List[Dict[str, str]],
+                         on_entity: EntityCallback, protocol: str = "full", **options) -> Dict[str, Any]:
+    # Entities are handed out as soon as they are closed; the full text is parsed as usual
+    reader = _stream_reader(protocol)
+    for delta in client.chat_completion_stream(messages, **options):
+        # Each chunk read is capped by the stage deadline, a trickling stream is not
+        if time_left() == 0:
+            raise TimeoutError("streamed completion past the stage deadline")
+        _notify(on_entity, reader.feed(delta))
+    return {"choices": [{"message": {"content": reader.text}}]}
+
+
+async def _astreamed_completion(client: AsyncChallengeClient, messages: List[Dict[str, str]],
+                                on_entity: EntityCallback, protocol: str = "full", **options) -> Dict[str, Any]:
+    reader = _stream_reader(protocol)
+    async for delta in client.chat_completion_stream(messages, **options):
+        _notify(on_entity, reader.feed(delta))
+    return {"choices": [{"message": {"content": reader.text}}]}
+
+
+def _remember(statement: str, data: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if data is not None and _templates_enabled():
+        try:
+            get_template_cache().store(statement, data)
+        except Exception:
+            pass
+    return data
+
+
+# Tokens reported by the proxy (usage), per direction
+LLM_TOKENS: Counter = Counter()
+
+
+def parse_stats_summary() -> str:
+    summary = ", ".join(f"{k}={PARSE_STATS[k]}" for k in ("local", "template", "llm", "llm_retry", "failed", "skipped"))
+    if LLM_TOKENS:
+        summary += f", tokens={LLM_TOKENS['prompt']}+{LLM_TOKENS['completion']}"
+    return summary
+
+
+def _protocol() -> str:
+    protocol = os.getenv("GALACTIC_PARSE_PROTOCOL", "full").lower()
+    return protocol if protocol in PROTOCOLS else "full"
+
 
-def parse_statement(statement: str, client: ChallengeClient) -> Optional[Dict[str, Any]]:
-    messages = [
-        {"role": "developer", "content": SYSTEM_DEV_MSG},
+def _json_mode() -> bool:
+    # response_format=json_object, for proxies that pass it through to the model
+    return os.getenv("GALACTIC_CHAT_JSON_MODE", "off").lower() in ("on", "1", "true", "yes")
+
+
+def _request_options(protocol: str) -> Dict[str, Any]:
+    if protocol != "compact":
+        return {}
+    options: Dict[str, Any] = {"max_tokens": COMPACT_MAX_TOKENS, "temperature": 0}
+    if _json_mode():
+        options["response_format"] = {"type": "json_object"}
+    return options
+
+
+def _build_messages(statement: str, protocol: str = "full") -> List[Dict[str, str]]:
+    return [
+        {"role": "developer", "content": COMPACT_DEV_MSG if protocol == "compact" else SYSTEM_DEV_MSG},
         {"role": "user", "content": statement},
     ]
+
+
+class ParseRejected(ValueError):
+    # The answer broke the response contract; `code` groups the reasons for the stats and
+    # the message says exactly what was wrong (it goes back to the model on retry)
+    def __init__(self, code: str, reason: str, content: str = ""):
+        super().__init__(reason)
+        self.code = code
+        self.content = content
+
+
+def encode_compact(parsed: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "e": [[e.get("type"), e.get("name")] for e in parsed.get("entities", [])],
+        "v": {var: [spec.get("entity"), spec.get("attribute")] for var, spec in parsed.get("vars", {}).items()},
+        "x": parsed.get("expression"),
+    }
+
+
+def _compact_entity(item: Any) -> Optional[Dict[str, Any]]:
+    if isinstance(item, list) and len(item) == 2:
+        return {"type": item[0], "name": item[1]}
+    return None
+
+
+def _decode_compact(data: Dict[str, Any]) -> Dict[str, Any]:
+    missing = [k for k in ("e", "v", "x") if k not in data]
+    if missing:
+        raise ParseRejected("shape", f"faltan las claves {', '.join(missing)}")
+    if not isinstance(data["e"], list) or not isinstance(data["v"], dict):
+        raise ParseRejected("shape", "'e' debe ser una lista y 'v' un objeto")
+    entities = []
+    for i, item in enumerate(data["e"]):
+        ent = _compact_entity(item)
+        if ent is None:
+            raise ParseRejected("entity", f"e[{i}] debe ser [tipo, nombre]")
+        entities.append(ent)
+    vars_spec = {}
+    for var, spec in data["v"].items():
+        if not isinstance(spec, list) or len(spec) != 2:
+            raise ParseRejected("var", f"v.{var} debe ser [i, atributo]")
+        vars_spec[var] = {"entity": spec[0], "attribute": spec[1]}
+    return {"entities": entities, "vars": vars_spec, "expression": data["x"]}
+
+
+def validate_parse(data: Any) -> Dict[str, Any]:
+    # Strict response contract (both protocols): known types, named entities, variables
+    # pointing at an existing entity and a known attribute, and an expression that only
+    # uses declared variables. Returns the parse without extra keys (e.g. "notes").
+    if not isinstance(data, dict):
+        raise ParseRejected("shape", "la respuesta no es un objeto JSON")
+    missing = [k for k in ("entities", "vars", "expression") if k not in data]
+    if missing:
+        raise ParseRejected("shape", f"faltan las claves {', '.join(missing)}")
+    entities, vars_spec, expression = data["entities"], data["vars"], data["expression"]
+    if not isinstance(entities, list) or not entities:
+        raise ParseRejected("entity", "'entities' debe ser una lista no vacía")
+    for i, ent in enumerate(entities):
+        if not isinstance(ent, dict) or not isinstance(ent.get("name"), str) or not ent["name"].strip():
+            raise ParseRejected("entity", f"la entidad {i} no tiene nombre")
+        if str(ent.get("type") or "").lower() not in SCHEMAS:
+            raise ParseRejected("entity", f"la entidad {i} tiene tipo desconocido '{ent.get('type')}' "
+                                          f"(válidos: {', '.join(SCHEMAS)})")
+    if not isinstance(vars_spec, dict):
+        raise ParseRejected("var", "'vars' debe ser un objeto")
+    for var, spec in vars_spec.items():
+        idx = spec.get("entity") if isinstance(spec, dict) else None
+        attr = spec.get("attribute") if isinstance(spec, dict) else None
+        if not isinstance(idx, int) or isinstance(idx, bool) or not 0 <= idx < len(entities):
+            raise ParseRejected("var", f"la variable {var} apunta a la entidad {idx!r}, que no existe")
+        if attr not in ATTRIBUTE_OWNER:
+            raise ParseRejected("var", f"la variable {var} usa el atributo desconocido {attr!r}")
+    if not isinstance(expression, str) or not expression.strip():
+        raise ParseRejected("expression", "'expression' vacía")
+    try:
+        tree = ast.parse(expression, mode="eval")
+    except SyntaxError as ex:
+        raise ParseRejected("expression", f"expresión inválida: {ex.msg}") from None
+    unknown = sorted({n.id for n in ast.walk(tree) if isinstance(n, ast.Name)} - set(vars_spec) - {"len"})
+    if unknown:
+        raise ParseRejected("expression", f"la expresión usa variables no declaradas: {', '.join(unknown)}")
+    return {"entities": entities, "vars": vars_spec, "expression": expression}
+
+
+def _record_usage(resp: Any):
+    usage = resp.get("usage") if isinstance(resp, dict) else None
+    if isinstance(usage, dict):
+        for direction in ("prompt", "completion"):
+            n = int(usage.get(f"{direction}_tokens") or 0)
+            LLM_TOKENS[direction] += n
+            count(f"llm.tokens.{direction}", n)
+
+
+def _parse_response(resp: Any, protocol: str = "full") -> Dict[str, Any]:
+    # Raises ParseRejected (with the reason) so callers can retry
+    _record_usage(resp)
+    content = resp.get("choices", [{}])[0].get("message", {}).get("content") if isinstance(resp, dict) else None
+    if not content:
+        raise ParseRejected("empty", "respuesta vacía")
+    # Ensure pure JSON (strip code fences if any)
+    content_str = str(content).strip()
+    if content_str.startswith("```"):
+        content_str = content_str.strip("` ")
+        if content_str.lower().startswith("json"):
+            content_str = content_str[4:].strip()
     try:
-        resp = client.chat_completion(messages)
-        content = resp.get("choices", [{}])[0].get("message", {}).get("content") if isinstance(resp, dict) else None
-        if not content:
-            return None
-        # Ensure pure JSON (strip code fences if any)
-        content_str = str(content).strip()
-        if content_str.startswith("```"):
-            content_str = content_str.strip("` ")
-            if content_str.lower().startswith("json"):
-                content_str = content_str[4:].strip()
         data = json.loads(content_str)
-        # Basic validation
-        if not isinstance(data, dict):
-            return None
-        if "entities" not in data or "vars" not in data or "expression" not in data:
-            return None
-        return data
-    except Exception:
-        # One simple retry with stricter reminder
+        if protocol == "compact" and isinstance(data, dict):
+            data = _decode_compact(data)
+        return validate_parse(data)
+    except ValueError as ex:
+        if isinstance(ex, ParseRejected):
+            ex.content = content_str
+            raise
+        raise ParseRejected("json", f"JSON inválido: {ex}", content_str) from None
+
+
+def _retry_messages(messages: List[Dict[str, str]], error: Exception) -> List[Dict[str, str]]:
+    # A rejected answer goes back with the exact reason; a failed request is sent again as is
+    if not isinstance(error, ParseRejected):
+        return messages
+    count(f"parse.reject.{error.code}")
+    return messages + [
+        {"role": "assistant", "content": error.content[:MAX_ECHO_CHARS]},
+        {"role": "user", "content": f"Respuesta inválida: {error}. Responde solo el JSON corregido."},
+    ]
+
+
+def _count(data: Optional[Dict[str, Any]], path: str) -> Optional[Dict[str, Any]]:
+    PARSE_STATS[path if data is not None else "failed"] += 1
+    return data
+
+
+def _llm_result(statement: str, data: Optional[Dict[str, Any]], path: str) -> Optional[Dict[str, Any]]:
+    return _remember(statement, _count(data, path))
+
+
+def _llm_allowed(budget: Optional[ProblemBudget]) -> bool:
+    return budget is None or budget.allows("parse", "llm")
+
+
+@contextmanager
+def _llm_timer(budget: Optional[ProblemBudget]) -> Iterator[None]:
+    # Feeds the scheduler's expected LLM latency
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        if budget is not None:
+            budget.observe("llm", time.perf_counter() - t0)
+
+
+def parse_statement(statement: str, client: ChallengeClient, on_entity: EntityCallback = None,
+                    budget: Optional[ProblemBudget] = None) -> Optional[Dict[str, Any]]:
+    cached = _cached_parse(statement)
+    if cached is not None:
+        return cached
+    if not _llm_allowed(budget):
+        PARSE_STATS["skipped"] += 1
+        return None
+    protocol = _protocol()
+    messages = _build_messages(statement, protocol)
+    options = _request_options(protocol)
+    stream = _stream_enabled()
+    try:
+        with span("llm", retry=False, stream=stream, protocol=protocol), _llm_timer(budget):
+            if stream:
+                resp = _streamed_completion(client, messages, on_entity, protocol, **options)
+            else:
+                resp = client.chat_completion(messages, **options)
+        return _llm_result(statement, _parse_response(resp, protocol), "llm")
+    except Exception as ex:
+        # One retry, told what was wrong (never streamed: it is the fallback path)
+        if not _llm_allowed(budget):
+            return _count(None, "failed")
+        try:
+            with span("llm", retry=True, protocol=protocol), _llm_timer(budget):
+                resp = client.chat_completion(_retry_messages(messages, ex), **options)
+            return _llm_result(statement, _parse_response(resp, protocol), "llm_retry")
+        except Exception:
+            return _count(None, "failed")
+
+
+async def aparse_statement(statement: str, client: AsyncChallengeClient, on_entity: EntityCallback = None,
+                           budget: Optional[ProblemBudget] = None) -> Optional[Dict[str, Any]]:
+    cached = _cached_parse(statement)
+    if cached is not None:
+        return cached
+    if not _llm_allowed(budget):
+        PARSE_STATS["skipped"] += 1
+        return None
+    protocol = _protocol()
+    messages = _build_messages(statement, protocol)
+    options = _request_options(protocol)
+    stream = _stream_enabled()
+    try:
+        with span("llm", retry=False, stream=stream, protocol=protocol), _llm_timer(budget):
+            if stream:
+                resp = await _astreamed_completion(client, messages, on_entity, protocol, **options)
+            else:
+                resp = await client.chat_completion(messages, **options)
+        return _llm_result(statement, _parse_response(resp, protocol), "llm")
+    except Exception as ex:
+        if not _llm_allowed(budget):
+            return _count(None, "failed")
         try:
-            messages[0]["content"] += "\nSOLO JSON. NO texto adicional."
-            resp = client.chat_completion(messages)
-            content = resp.get("choices", [{}])[0].get("message", {}).get("content") if isinstance(resp, dict) else None
-            if not content:
-                return None
-            content_str = str(content).strip()
-            if content_str.startswith("```"):
-                content_str = content_str.strip("` ")
-                if content_str.lower().startswith("json"):
-                    content_str = content_str[4:].strip()
-            data = json.loads(content_str)
-            if not isinstance(data, dict):
-                return None
-            if "entities" not in data or "vars" not in data or "expression" not in data:
-                return None
-            return data
+            with span("llm", retry=True, protocol=protocol), _llm_timer(budget):
+                resp = await client.chat_completion(_retry_messages(messages, ex), **options)
+            return _llm_result(statement, _parse_response(resp, protocol), "llm_retry")
         except Exception:
-            return None
+            return _count(None, "failed")
@@ -0,0 +1,253 @@
+from __future__ import annotations
+import copy
+import json
+import os
+import re
+import threading
+from collections import Counter
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, List, Optional
+from .names import get_dictionary
+from .rule_parser import has_attribute_phrase
+from .utils import cache_path, write_json_atomic
+
+# Statements that only differ in entity names and numbers share one parse. A template is
+# the statement with entity mentions replaced by {E<i>} and numeric literals by {N<j>};
+# the cached vars/expression are re-bound to the names and numbers of a new statement.
+
+def templates_path() -> str:
+    return os.getenv("GALACTIC_TEMPLATES_PATH") or cache_path("parse_templates.json")
+
+TEMPLATES_VERSION = 1
+
+_NUMBER_RE = re.compile(r"(?<![\w.,])\d+(?:[.,]\d+)?(?![\w])")
+_EXPR_NUMBER_RE = re.compile(r"(?<![\w.])\d+(?:\.\d+)?(?![\w.])")
+_PLACEHOLDER_RE = re.compile(r"\{([EN])(\d+)\}")
+_MAX_NAME_LEN = 60
+_MIN_LITERAL_WORDS = 3
+
+# Attributes that pin an entity to a single type; with only shared ones (height, name...)
+# a cached type is trusted only if the name dictionary confirms it
+_TYPE_SPECIFIC_ATTRS = {
+    "sw_planet": {"rotation_period", "orbital_period", "diameter", "surface_water", "population"},
+    "sw_character": {"mass", "homeworld"},
+    "pokemon": {"base_experience", "weight"},
+}
+
+TEMPLATE_STATS: Counter = Counter()
+
+
+def _to_decimal(s: str) -> Optional[Decimal]:
+    try:
+        return Decimal(s.replace(",", "."))
+    except InvalidOperation:
+        return None
+
+
+def _template_regex(template: str) -> re.Pattern:
+    parts: List[str] = []
+    seen: set[str] = set()
+    pos = 0
+    for m in _PLACEHOLDER_RE.finditer(template):
+        literal = template[pos:m.start()]
+        parts.append(r"\s+".join(re.escape(w) for w in literal.split(" ")))
+        group = f"{m.group(1).lower()}{m.group(2)}"
+        if group in seen:
+            parts.append(f"(?P={group})")
+        elif m.group(1) == "E":
+            parts.append(f"(?P<{group}>[^?¿!¡]{{1,{_MAX_NAME_LEN}}}?)")
+        else:
+            parts.append(rf"(?P<{group}>\d+(?:[.,]\d+)?)")
+        seen.add(group)
+        pos = m.end()
+    parts.append(r"\s+".join(re.escape(w) for w in template[pos:].split(" ")))
+    return re.compile("".join(parts), re.IGNORECASE)
+
+
+def _normalize_space(s: str) -> str:
+    return " ".join(s.split())
+
+
+def make_template(statement: str, parsed: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    entities = parsed.get("entities") or []
+    text = _normalize_space(statement)
+    spans: List[tuple[int, int, int]] = []
+    # Longest names first so "Luke Skywalker" wins over a shorter overlapping name
+    for idx in sorted(range(len(entities)), key=lambda i: -len(str(entities[i].get("name") or ""))):
+        name = entities[idx].get("name")
+        if not isinstance(name, str) or not name.strip():
+            return None
+        found = False
+        for m in re.finditer(re.escape(_normalize_space(name)), text, re.IGNORECASE):
+            if any(s < m.end() and m.start() < e for s, e, _ in spans):
+                continue
+            spans.append((m.start(), m.end(), idx))
+            found = True
+        if not found:
+            return None  # the LLM normalized the name; we can't locate it in the text
+
+    out: List[str] = []
+    numbers: List[Decimal] = []
+    pos = 0
+    for start, end, idx in sorted(spans):
+        chunk = text[pos:start]
+        out.append(_template_numbers(chunk, numbers))
+        out.append(f"{{E{idx}}}")
+        pos = end
+    out.append(_template_numbers(text[pos:], numbers))
+    template = "".join(out)
+
+    literal_words = _PLACEHOLDER_RE.sub(" ", template).split()
+    if len(literal_words) < _MIN_LITERAL_WORDS:
+        return None
+
+    # A literal of the expression becomes {Nj} only when it is certainly the statement's
+    # number: "la mitad de X y súmale 2" -> "x1 / 2 + 2" can't tell the parse's own 2 from
+    # the statement's, and "2 ... y 2" can't tell which 2 is which, so neither is stored
+    expression = str(parsed.get("expression") or "")
+    literals = [Decimal(m.group(0)) for m in _EXPR_NUMBER_RE.finditer(expression)]
+    for value in set(literals):
+        in_statement = numbers.count(value)
+        if in_statement and (in_statement > 1 or literals.count(value) != 1):
+            return None
+
+    def number_placeholder(m: re.Match) -> str:
+        value = Decimal(m.group(0))
+        if value in numbers:
+            return f"{{N{numbers.index(value)}}}"
+        return m.group(0)  # constant introduced by the parse ("doble" -> 2)
+
+    expression = _EXPR_NUMBER_RE.sub(number_placeholder, expression)
+
+    vars_spec = parsed.get("vars") or {}
+    certain = []
+    for idx, ent in enumerate(entities):
+        etype = (ent.get("type") or "").lower()
+        attrs = {v.get("attribute") for v in vars_spec.values() if isinstance(v, dict) and v.get("entity") == idx}
+        certain.append(bool(attrs & _TYPE_SPECIFIC_ATTRS.get(etype, set())))
+    return {
+        "template": template,
+        "types": [(e.get("type") or "").lower() for e in entities],
+        "type_certain": certain,
+        "vars": vars_spec,
+        "expression": expression,
+    }
+
+
+def _template_numbers(chunk: str, numbers: List[Decimal]) -> str:
+    def repl(m: re.Match) -> str:
+        value = _to_decimal(m.group(0))
+        if value is None:
+            return m.group(0)
+        numbers.append(value)
+        return f"{{N{len(numbers) - 1}}}"
+    return _NUMBER_RE.sub(repl, chunk)
+
+
+class TemplateCache:
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or templates_path()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._compiled: Dict[str, re.Pattern] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if not isinstance(data, dict) or data.get("version") != TEMPLATES_VERSION:
+            return
+        for entry in data.get("templates") or []:
+            if isinstance(entry, dict) and isinstance(entry.get("template"), str):
+                self._add(entry)
+
+    def _add(self, entry: Dict[str, Any]):
+        self._entries[entry["template"]] = entry
+        self._compiled[entry["template"]] = _template_regex(entry["template"])
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def expressions(self) -> set[str]:
+        # Cached expressions without number placeholders (compilable as-is)
+        with self._lock:
+            return {e["expression"] for e in self._entries.values() if "{" not in e["expression"]}
+
+    def store(self, statement: str, parsed: Dict[str, Any]) -> bool:
+        entry = make_template(statement, parsed)
+        if entry is None:
+            return False
+        with self._lock:
+            if entry["template"] in self._entries:
+                return False
+            self._add(entry)
+            snapshot = list(self._entries.values())
+        TEMPLATE_STATS["stored"] += 1
+        try:
+            write_json_atomic(self.path, {"version": TEMPLATES_VERSION, "templates": snapshot})
+        except OSError:
+            pass
+        return True
+
+    def lookup(self, statement: str) -> Optional[Dict[str, Any]]:
+        text = _normalize_space(statement)
+        with self._lock:
+            candidates = list(self._compiled.items())
+        for template, regex in candidates:
+            m = regex.fullmatch(text)
+            if not m:
+                continue
+            parsed = self._rebind(self._entries[template], m)
+            if parsed is not None:
+                TEMPLATE_STATS["hit"] += 1
+                return parsed
+        TEMPLATE_STATS["miss"] += 1
+        return None
+
+    def _rebind(self, entry: Dict[str, Any], m: re.Match) -> Optional[Dict[str, Any]]:
+        groups = m.groupdict()
+        dictionary = get_dictionary()
+        entities = []
+        for idx, etype in enumerate(entry["types"]):
+            name = (groups.get(f"e{idx}") or "").strip()
+            if not name:
+                return None
+            known_types = {t for t, _ in dictionary.lookup(name)}
+            if known_types and etype not in known_types:
+                return None
+            if not known_types and not entry["type_certain"][idx]:
+                return None
+            if not known_types and has_attribute_phrase(name):
+                # The placeholder swallowed the rest of a longer statement
+                # ("X multiplicado por la masa de Y")
+                return None
+            entities.append({"type": etype, "name": name})
+
+        def number(pm: re.Match) -> str:
+            if pm.group(1) == "E":
+                return pm.group(0)
+            return groups[f"n{pm.group(2)}"].replace(",", ".")
+
+        return {
+            "entities": entities,
+            "vars": copy.deepcopy(entry["vars"]),
+            "expression": _PLACEHOLDER_RE.sub(number, entry["expression"]),
+            "notes": "template",
+        }
+
+
+_TEMPLATE_CACHE: Optional[TemplateCache] = None
+
+
+def get_template_cache() -> TemplateCache:
+    global _TEMPLATE_CACHE
+    if _TEMPLATE_CACHE is None:
+        _TEMPLATE_CACHE = TemplateCache()
+    return _TEMPLATE_CACHE
+
+
+def template_stats_summary() -> str:
+    return ", ".join(f"{k}={TEMPLATE_STATS[k]}" for k in ("hit", "miss", "stored"))
@@ -0,0 +1,180 @@
+from __future__ import annotations
+import json
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from decimal import Decimal, InvalidOperation
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from .evaluator import round10
+from .journal import record_answer
+from .metrics import RECORDER, _stats
+from .profiling import ProblemProfiler, profile_problem
+from .utils import cache_path, json_default
+
+# Many /challenge/test problems at once: each one is solved, checked against the API's
+# expected value and appended to a JSONL corpus (statement, parse, resolved entities,
+# answer, timings). Solving also fills the persistent caches and parse templates.
+
+def corpus_path() -> str:
+    return os.getenv("GALACTIC_CORPUS_PATH") or cache_path("practice_corpus.jsonl")
+
+
+STATEMENT_KEYS = ("statement", "problem", "enunciado", "text")
+EXPECTED_KEYS = ("expected", "solution", "answer", "resultado")
+FLOAT_REL_TOL = 1e-9
+
+
+def practice_fields(test: Dict[str, Any]) -> Tuple[Optional[str], Any]:
+    statement = next((test[k] for k in STATEMENT_KEYS if isinstance(test.get(k), str)), None)
+    expected = next((test[k] for k in EXPECTED_KEYS if k in test), None)
+    return statement, expected
+
+
+def _decimal(value: Any) -> Optional[Decimal]:
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        return Decimal(str(value).strip().replace(",", "."))
+    except InvalidOperation:
+        return None
+
+
+def answer_matches(answer: Optional[Decimal], expected: Any) -> Optional[bool]:
+    # None when the API gave nothing comparable. A float expected value can't carry 10
+    # decimals for large results, so it is compared with a relative tolerance instead
+    exp = _decimal(expected)
+    if exp is None:
+        return None
+    if answer is None:
+        return False
+    if round10(answer) == round10(exp):
+        return True
+    return isinstance(expected, float) and math.isclose(float(answer), expected, rel_tol=FLOAT_REL_TOL, abs_tol=FLOAT_REL_TOL)
+
+
+class CorpusWriter:
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or corpus_path()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+
+    def append(self, row: Dict[str, Any]):
+        line = json.dumps(row, ensure_ascii=False, default=json_default)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+Solver = Callable[[str, Dict[str, Any]], Optional[Decimal]]
+
+
+def make_row(problem_id: Any, statement: str, expected: Any, answer: Optional[Decimal],
+             trace: Dict[str, Any], **timings: float) -> Dict[str, Any]:
+    exp = _decimal(expected)
+    return {
+        "problem_id": problem_id,
+        "statement": statement,
+        "parse": trace.get("parse"),
+        "entities": trace.get("entities"),
+        "answer": float(answer) if answer is not None else None,
+        "expected": float(exp) if exp is not None else expected,
+        "correct": answer_matches(answer, expected),
+        "timings": {**timings, **trace.get("timings", {})},
+        "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def practice_one(client, solve: Solver, writer: Optional[CorpusWriter],
+                 profiler: Optional[ProblemProfiler] = None) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    test = client.get_test()
+    fetched = time.perf_counter()
+    statement, expected = practice_fields(test)
+    problem_id = test.get("problem_id") or test.get("id")
+    if statement is None:
+        return {"problem_id": problem_id, "error": "sin enunciado"}
+    trace: Dict[str, Any] = {}
+    with profile_problem(profiler, problem_id, statement=statement):
+        answer = solve(statement, trace)
+    solved = time.perf_counter()
+    RECORDER.add_problem(problem_id, solved - fetched, answer is None)
+    row = make_row(problem_id, statement, expected, answer, trace, fetch=fetched - t0, solve=solved - fetched)
+    record_answer(statement, answer, trace, row["correct"], expected, source="practice")
+    if writer is not None:
+        writer.append(row)
+    return row
+
+
+def run_batch(client, solve: Solver, count: int, workers: int,
+              writer: Optional[CorpusWriter], profiler: Optional[ProblemProfiler] = None) -> List[Dict[str, Any]]:
+    rows: List[Dict[str, Any]] = []
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="practice") as pool:
+        futures = [pool.submit(practice_one, client, solve, writer, profiler) for _ in range(count)]
+        for fut in as_completed(futures):
+            try:
+                rows.append(fut.result())
+            except Exception as ex:
+                rows.append({"error": str(ex)})
+    return rows
+
+
+def summarize(rows: List[Dict[str, Any]], seconds: float) -> Dict[str, Any]:
+    done = [r for r in rows if "error" not in r]
+    graded = [r for r in done if r["correct"] is not None]
+    correct = sum(1 for r in graded if r["correct"])
+    return {
+        "problems": len(done),
+        "errors": len(rows) - len(done),
+        "graded": len(graded),
+        "correct": correct,
+        "accuracy": correct / len(graded) if graded else 0.0,
+        "per_minute": len(done) / (seconds / 60.0) if seconds > 0 else 0.0,
+        "solve": _stats([r["timings"]["solve"] for r in done]),
+    }
+
+
+def load_corpus(path: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    # Rows with a statement; practice and bench corpora both qualify
+    rows: List[Dict[str, Any]] = []
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(row, dict) and isinstance(row.get("statement"), str):
+                    rows.append(row)
+                    if limit is not None and len(rows) >= limit:
+                        break
+    except OSError:
+        return []
+    return rows
+
+
+def rescore_summary(rows: List[Dict[str, Any]], results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    graded = correct = fixed = regressed = 0
+    for row, result in zip(rows, results):
+        now = answer_matches(result["answer"], row.get("expected"))
+        if now is None:
+            continue
+        graded += 1
+        correct += now
+        before = row.get("correct")
+        if before is False and now:
+            fixed += 1
+        elif before is True and not now:
+            regressed += 1
+    return {
+        "solved": sum(1 for r in results if r["answer"] is not None),
+        "graded": graded,
+        "correct": correct,
+        "accuracy": correct / graded if graded else 0.0,
+        "fixed": fixed,
+        "regressed": regressed,
+    }
@@ -0,0 +1,193 @@
+from __future__ import annotations
+import asyncio
+import os
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from .metrics import count, span
+from .names import get_dictionary
+from .profiling import in_worker
+from .scheduler import ProblemBudget, problem_context, time_left
+from .utils import normalize_name
+
+# Speculative entity fetches: known names spotted in the raw statement are fetched while
+# the parse (usually the LLM call) is in flight. Once the parse is back the solver takes
+# the matching records; guesses the parse didn't use are dropped (their results still
+# land in the cache). Sync fetches run with the problem's deadline, so none outlives it.
+
+MAX_PREFETCH = 6
+
+# hit: parsed entity was prefetched; miss: it wasn't (or the prefetch failed);
+# wasted: prefetched entity the parse didn't use. Entities streamed from the LLM answer
+# (see stream_json) are added to the same prefetch and count as hits too.
+PREFETCH_STATS: Counter = Counter()
+
+_POOL: Optional[ThreadPoolExecutor] = None
+
+Ref = Tuple[str, str]
+
+
+def prefetch_enabled() -> bool:
+    return os.getenv("GALACTIC_PREFETCH", "on").lower() not in ("off", "0", "false", "no")
+
+
+def guess_entities(statement: str) -> List[Ref]:
+    # Every candidate of every mention: a name shared by two types is fetched as both
+    refs: List[Ref] = []
+    try:
+        mentions = get_dictionary().find_mentions(statement)
+    except Exception:
+        return refs
+    for m in mentions:
+        for ref in m.candidates:
+            if ref not in refs:
+                refs.append(ref)
+    return refs[:MAX_PREFETCH]
+
+
+def _key(etype: str, name: str) -> Ref:
+    return etype, normalize_name(name)
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _POOL
+    if _POOL is None:
+        _POOL = ThreadPoolExecutor(max_workers=2 * MAX_PREFETCH, thread_name_prefix="prefetch")
+    return _POOL
+
+
+def _record(hit: bool):
+    name = "hit" if hit else "miss"
+    PREFETCH_STATS[name] += 1
+    count(f"prefetch.{name}")
+
+
+def _fetch(fetcher: Callable[[str], Any], etype: str, name: str) -> Any:
+    with span("prefetch", type=etype):
+        return fetcher(name)
+
+
+class Prefetch:
+    def __init__(self, fetchers: Dict[str, Callable[[str], Any]], enabled: bool = True,
+                 budget: Optional[ProblemBudget] = None):
+        self._fetchers = fetchers
+        self._futures: Dict[Ref, Future] = {}
+        self._enabled = enabled
+        self._budget = budget
+        self._used: Set[Ref] = set()
+
+    @classmethod
+    def start(cls, statement: str, fetchers: Dict[str, Callable[[str], Any]],
+              budget: Optional[ProblemBudget] = None) -> "Prefetch":
+        self = cls(fetchers, prefetch_enabled(), budget)
+        if self._enabled:
+            for etype, name in guess_entities(statement):
+                self._submit(etype, name)
+        count("prefetch.started", len(self._futures))
+        return self
+
+    def _submit(self, etype: str, name: str) -> bool:
+        key = _key(etype, name)
+        if etype not in self._fetchers or key in self._futures:
+            return False
+        ctx = problem_context(self._budget)
+        self._futures[key] = _pool().submit(ctx.run, in_worker(_fetch), self._fetchers[etype], etype, name)
+        return True
+
+    def add(self, entity: Dict[str, Any]):
+        # Entity already known to be in the parse (streamed before the completion ended)
+        etype, name = (entity.get("type") or "").lower(), entity.get("name")
+        if isinstance(name, str) and self._submit(etype, name):
+            count("prefetch.streamed")
+
+    def take(self, etype: str, name: str) -> Tuple[bool, Any]:
+        # (True, record) when the entity was prefetched; (False, None) means fetch it now
+        key = _key(etype, name)
+        fut = self._futures.get(key)
+        if fut is None:
+            if self._enabled:
+                _record(False)
+            return False, None
+        self._used.add(key)
+        try:
+            item = fut.result(timeout=time_left())
+        except Exception:
+            _record(False)
+            return False, None
+        _record(True)
+        return True, item
+
+    def close(self):
+        # Fetches not started yet are dropped; running ones end by the problem's deadline
+        for fut in self._futures.values():
+            fut.cancel()
+        wasted = len(set(self._futures) - self._used)
+        if wasted:
+            PREFETCH_STATS["wasted"] += wasted
+            count("prefetch.wasted", wasted)
+
+
+class AsyncPrefetch:
+    def __init__(self, fetchers: Dict[str, Callable[[str], Awaitable[Any]]], enabled: bool = True):
+        self._fetchers = fetchers
+        self._tasks: Dict[Ref, "asyncio.Task[Any]"] = {}
+        self._enabled = enabled
+        self._used: Set[Ref] = set()
+
+    @classmethod
+    def start(cls, statement: str, fetchers: Dict[str, Callable[[str], Awaitable[Any]]]) -> "AsyncPrefetch":
+        self = cls(fetchers, prefetch_enabled())
+        if self._enabled:
+            for etype, name in guess_entities(statement):
+                self._submit(etype, name)
+        count("prefetch.started", len(self._tasks))
+        return self
+
+    def _submit(self, etype: str, name: str) -> bool:
+        key = _key(etype, name)
+        if etype not in self._fetchers or key in self._tasks:
+            return False
+        self._tasks[key] = asyncio.ensure_future(_afetch(self._fetchers[etype], etype, name))
+        return True
+
+    def add(self, entity: Dict[str, Any]):
+        etype, name = (entity.get("type") or "").lower(), entity.get("name")
+        if isinstance(name, str) and self._submit(etype, name):
+            count("prefetch.streamed")
+
+    async def take(self, etype: str, name: str) -> Tuple[bool, Any]:
+        key = _key(etype, name)
+        task = self._tasks.get(key)
+        if task is None:
+            if self._enabled:
+                _record(False)
+            return False, None
+        self._used.add(key)
+        try:
+            item = await asyncio.shield(task)
+        except Exception:
+            _record(False)
+            return False, None
+        _record(True)
+        return True, item
+
+    def close(self):
+        # Prefetches still running when the problem ends (answered, or out of budget) are dropped
+        for task in self._tasks.values():
+            task.cancel()
+        wasted = len(set(self._tasks) - self._used)
+        if wasted:
+            PREFETCH_STATS["wasted"] += wasted
+            count("prefetch.wasted", wasted)
+
+
+async def _afetch(fetcher: Callable[[str], Awaitable[Any]], etype: str, name: str) -> Any:
+    with span("prefetch", type=etype):
+        return await fetcher(name)
+
+
+def prefetch_stats_summary() -> str:
+    used = PREFETCH_STATS["hit"] + PREFETCH_STATS["miss"]
+    rate = PREFETCH_STATS["hit"] / used if used else 0.0
+    return (", ".join(f"{k}={PREFETCH_STATS[k]}" for k in ("hit", "miss", "wasted"))
+            + f" ({rate:.0%} aciertos)")
@@ -0,0 +1,207 @@
+from __future__ import annotations
+import contextvars
+import cProfile
+import functools
+import heapq
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, ContextManager, Dict, Iterator, List, Optional, Tuple, TypeVar
+from .utils import cache_path, write_json_atomic
+
+# Per-problem profiles for practice/official runs. Each problem is profiled twice while it
+# runs: cProfile (exact call counts and times, written as a .pstats file for
+# pstats/snakeviz) and a sampler over every thread written as collapsed stacks
+# ("thread;frame;frame N", the input of flamegraph.pl / speedscope). cProfile only sees
+# the thread it is enabled on, so work the problem hands to a pool (prefetch, hedged
+# mirror requests) goes through in_worker(), which profiles it on the worker thread; the
+# .pstats file merges the solving thread and those workers. Only the N slowest problems
+# are kept on disk, across runs; index.json lists them with their problem id and latency,
+# slowest first.
+
+def profile_dir() -> str:
+    return os.getenv("GALACTIC_PROFILE_DIR") or cache_path("profiles")
+
+PROFILE_KEEP = int(os.getenv("GALACTIC_PROFILE_KEEP") or 10)
+# Seconds between stack samples
+SAMPLE_INTERVAL = float(os.getenv("GALACTIC_PROFILE_INTERVAL") or 0.005)
+
+# Leaf frames of threads parked in a pool/queue/event wait: not time spent on the problem
+_IDLE_FILES = ("threading.py", "queue.py", os.path.join("concurrent", "futures", "thread.py"))
+_THREAD_NUMBER_RE = re.compile(r"[_-]\d+$")
+
+T = TypeVar("T")
+
+# Worker-thread profiles of the problem being profiled in this context
+_WORKER_PROFILES: contextvars.ContextVar[Optional[List[cProfile.Profile]]] = contextvars.ContextVar(
+    "worker_profiles", default=None)
+
+
+def in_worker(fn: Callable[..., T]) -> Callable[..., T]:
+    # Wrap `fn` before submitting it to a pool: when the submitting code runs inside a
+    # profiled problem, the worker thread is profiled while it runs `fn`
+    workers = _WORKER_PROFILES.get()
+    if workers is None:
+        return fn
+
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        prof = cProfile.Profile()
+        try:
+            prof.enable()
+        except ValueError:  # another profiler active on this thread
+            return fn(*args, **kwargs)
+        token = _WORKER_PROFILES.set(workers)  # work it submits in turn is profiled too
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _WORKER_PROFILES.reset(token)
+            prof.disable()
+            workers.append(prof)
+    return run
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class _Sampler(threading.Thread):
+    def __init__(self, interval: float, thread_id: Optional[int]):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.interval = interval
+        self.thread_id = thread_id  # None: every thread
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        me = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me or (self.thread_id is not None and ident != self.thread_id):
+                    continue
+                if frame.f_code.co_filename.endswith(_IDLE_FILES):
+                    continue
+                labels: List[str] = []
+                while frame is not None:
+                    labels.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                thread = _THREAD_NUMBER_RE.sub("", names.get(ident, "thread"))
+                self.stacks[";".join([thread, *reversed(labels)])] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class ProblemProfiler:
+    def __init__(self, out_dir: Optional[str] = None, keep: int = PROFILE_KEEP,
+                 interval: float = SAMPLE_INTERVAL, all_threads: bool = True):
+        self.out_dir = out_dir = out_dir or profile_dir()
+        self.keep = max(1, keep)
+        self.interval = interval
+        # With several problems solved at once the other threads belong to other problems
+        self.all_threads = all_threads
+        self.profiled = 0
+        self._lock = threading.Lock()
+        self._kept: List[Tuple[float, int, Dict[str, Any]]] = []  # min-heap on seconds
+        self._seq = 0
+        os.makedirs(out_dir, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        # Profiles kept by earlier runs still compete for the N slots
+        try:
+            with open(os.path.join(self.out_dir, "index.json"), encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return
+        for entry in entries if isinstance(entries, list) else []:
+            if isinstance(entry, dict) and os.path.exists(entry.get("collapsed") or ""):
+                self._seq += 1
+                heapq.heappush(self._kept, (float(entry.get("seconds") or 0), self._seq, entry))
+        while len(self._kept) > self.keep:
+            self._drop_fastest()
+
+    def _drop_fastest(self):
+        _, _, dropped = heapq.heappop(self._kept)
+        for key in ("pstats", "collapsed"):
+            if key in dropped:
+                try:
+                    os.remove(dropped[key])
+                except OSError:
+                    pass
+
+    @contextmanager
+    def profile(self, problem_id: Any, **tags) -> Iterator[None]:
+        sampler = _Sampler(self.interval, None if self.all_threads else threading.get_ident())
+        prof: Optional[cProfile.Profile] = cProfile.Profile()
+        t0 = time.perf_counter()
+        workers: List[cProfile.Profile] = []
+        sampler.start()
+        try:
+            prof.enable()
+        except ValueError:  # another profiler already active on this interpreter
+            prof = None
+        token = _WORKER_PROFILES.set(workers if prof is not None else None)
+        try:
+            yield
+        finally:
+            _WORKER_PROFILES.reset(token)
+            if prof is not None:
+                prof.disable()
+            sampler.stop()
+            # Workers still running (an unused prefetch) are left out
+            self._finish(problem_id, time.perf_counter() - t0, prof, list(workers), sampler, tags)
+
+    def _finish(self, problem_id: Any, seconds: float, prof: Optional[cProfile.Profile],
+                workers: List[cProfile.Profile], sampler: _Sampler, tags: Dict[str, Any]):
+        with self._lock:
+            self.profiled += 1
+            if len(self._kept) >= self.keep and seconds <= self._kept[0][0]:
+                return
+            base = os.path.join(self.out_dir, f"{int(seconds * 1000):07d}ms-{_safe(problem_id)}")
+            entry: Dict[str, Any] = {"problem_id": problem_id, "seconds": round(seconds, 6),
+                                     "samples": sampler.samples, **tags}
+            if prof is not None:
+                stats = pstats.Stats(prof)
+                if workers:
+                    stats.add(*workers)
+                stats.dump_stats(f"{base}.pstats")
+                entry["pstats"] = f"{base}.pstats"
+                entry["profiled_threads"] = 1 + len(workers)
+            with open(f"{base}.collapsed", "w", encoding="utf-8") as f:
+                for stack, n in sorted(sampler.stacks.items()):
+                    f.write(f"{stack} {n}\n")
+            entry["collapsed"] = f"{base}.collapsed"
+            self._seq += 1
+            heapq.heappush(self._kept, (seconds, self._seq, entry))
+            if len(self._kept) > self.keep:
+                self._drop_fastest()
+            write_json_atomic(os.path.join(self.out_dir, "index.json"), self.slowest())
+
+    def slowest(self) -> List[Dict[str, Any]]:
+        return [entry for _, _, entry in sorted(self._kept, key=lambda k: k[0], reverse=True)]
+
+    def summary(self) -> str:
+        kept = self.slowest()
+        if not kept:
+            return f"0 perfiles en {self.out_dir}"
+        return (f"{len(kept)} más lentos de {self.profiled} en {self.out_dir} "
+                f"({kept[-1]['seconds']:.2f}s-{kept[0]['seconds']:.2f}s)")
+
+
+def _safe(problem_id: Any) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", str(problem_id))[:64] or "problem"
+
+
+def profile_problem(profiler: Optional[ProblemProfiler], problem_id: Any, **tags) -> ContextManager[None]:
+    return profiler.profile(problem_id, **tags) if profiler is not None else nullcontext()
@@ -0,0 +1,216 @@
+from __future__ import annotations
+import re
+from typing import Any, Dict, List, Optional, Tuple
+from .names import NameDictionary, get_dictionary
+from .utils import normalize_name
+
+# Deterministic parser for the usual challenge phrasings:
+#   "la altura de Luke Skywalker multiplicada por la masa de Darth Vader"
+#   "la suma de la población de Tatooine y el diámetro de Hoth"
+#   "... y luego divide el resultado por 2"
+# It returns the same {entities, vars, expression} schema as the LLM parser plus a
+# confidence score; anything it does not fully understand gets a low score.
+
+# attribute phrase -> attribute per entity type
+_ATTRIBUTES: List[Tuple[str, Dict[str, str]]] = [
+    (r"experiencia\s+base", {"pokemon": "base_experience"}),
+    (r"altura|estatura", {"sw_character": "height", "pokemon": "height"}),
+    (r"masa|peso", {"sw_character": "mass", "pokemon": "weight"}),
+    (r"poblaci[oó]n", {"sw_planet": "population"}),
+    (r"di[aá]metro", {"sw_planet": "diameter"}),
+    (r"per[ií]odo\s+orbital|per[ií]odo\s+de\s+[oó]rbita", {"sw_planet": "orbital_period"}),
+    (r"per[ií]odo\s+de\s+rotaci[oó]n|per[ií]odo\s+rotacional", {"sw_planet": "rotation_period"}),
+    (r"agua\s+superficial|agua\s+en\s+(?:la\s+)?superficie|superficie\s+(?:de\s+|cubierta\s+por\s+)?agua", {"sw_planet": "surface_water"}),
+]
+_LENGTH = r"(?:longitud|largo|cantidad\s+de\s+(?:letras|caracteres)|n[uú]mero\s+de\s+(?:letras|caracteres))\s+del\s+"
+_LEN_ATTRIBUTES: List[Tuple[str, Dict[str, str]]] = [
+    (_LENGTH + r"nombre\s+del\s+planeta\s+natal", {"sw_character": "homeworld"}),
+    (_LENGTH + r"nombre", {"sw_character": "name", "sw_planet": "name", "pokemon": "name"}),
+]
+_CONNECTOR = r"\s+(?:de\s+la|del|de)\s+(?:(?:planeta|personaje|pok[eé]mon)\s+)?"
+
+_ATTR_RES = [(re.compile(rf"\b(?:{p}){_CONNECTOR}", re.IGNORECASE), m) for p, m in _LEN_ATTRIBUTES + _ATTRIBUTES]
+
+_NUMBER_RE = re.compile(r"(?<![\w.,])\d+(?:[.,]\d+)?(?![\w])")
+
+
+def has_attribute_phrase(text: str) -> bool:
+    # "la masa de ...", "el diámetro del planeta ...": never part of an entity name
+    return any(regex.search(text) for regex, _ in _ATTR_RES)
+_CAPITALIZED_RE = re.compile(r"(?:[A-ZÁÉÍÓÚÑ0-9][\w'’\-.]*)(?:\s+[A-ZÁÉÍÓÚÑ0-9][\w'’\-.]*)*")
+
+# Operator keywords, matched on the normalized gap text in this order (a match is
+# removed before the next pattern runs so "dividido por" never counts as "por")
+_OPERATORS: List[Tuple[re.Pattern, str]] = [
+    (re.compile(r"\b(?:dividid[oa]s?|divid\w*)(?:\s+\w+){0,3}?\s+(?:por|entre)\b|\bdivid\w*|\bcociente\b|\bentre\b"), "/"),
+    (re.compile(r"\bmultiplic\w*(?:\s+\w+){0,3}?\s+por\b|\bmultiplic\w*|\bproducto\b|\bveces\b|\bpor\b"), "*"),
+    (re.compile(r"\bmas\b|\bsum\w*|\bagreg\w*|\banad\w*"), "+"),
+    (re.compile(r"\bmenos\b|\brest\w*|\bdiferencia\b"), "-"),
+]
+_RESULT_RE = re.compile(r"\bresultado\b|\blo anterior\b|\btodo ello\b|\beso\b")
+_FILLER_RE = re.compile(r"^(?:y|e|luego|despues|a|al|la|el|lo|le|su|sus|de|del|se|es|con|eso|esto|entonces)?$")
+# Question/command frame allowed before the first operand and after the last one
+# ("¿Cuál es ...?", "Calcula ...", "... ¿Cuál es el resultado?"); any other word there
+# ("el doble de", "elevada al cuadrado") is an operation the grammar does not cover
+_FRAME_WORDS = {
+    "cual", "cuales", "cuanto", "cuanta", "que", "es", "son", "sera", "seria", "da", "dan", "vale", "resulta",
+    "valor", "calcula", "calcule", "calcular", "determina", "determine", "obten", "obtenga", "halla", "encuentra",
+    "dime", "indica", "los", "las", "un", "una",
+}
+_PRECEDENCE = {"+": 1, "-": 1, "*": 2, "/": 2}
+
+_UNKNOWN_NAME_PENALTY = 0.9
+
+
+class _Operand:
+    __slots__ = ("start", "end", "etype", "name", "attr", "number", "known")
+
+    def __init__(self, start: int, end: int, etype: Optional[str] = None, name: Optional[str] = None,
+                 attr: Optional[str] = None, number: Optional[str] = None, known: bool = True):
+        self.start = start
+        self.end = end
+        self.etype = etype
+        self.name = name
+        self.attr = attr
+        self.number = number
+        self.known = known
+
+
+def _entity_at(text: str, pos: int, attr_map: Dict[str, str], mentions) -> Optional[_Operand]:
+    allowed = set(attr_map)
+    for m in mentions:
+        if m.start == pos:
+            candidates = [(t, n) for t, n in m.candidates if t in allowed]
+            if len({t for t, _ in candidates}) != 1:
+                return None
+            etype, name = candidates[0]
+            return _Operand(pos, m.end, etype, name, attr_map[etype])
+    # Not in the catalog: take the capitalized run and infer the type from the attribute
+    cap = _CAPITALIZED_RE.match(text, pos)
+    if not cap or len(allowed) != 1:
+        return None
+    etype = next(iter(allowed))
+    return _Operand(pos, cap.end(), etype, cap.group(0).rstrip("."), attr_map[etype], known=False)
+
+
+def _gap_operator(gap: str) -> Tuple[Optional[str], bool, bool]:
+    # -> (operator, refers to previous result, gap fully understood)
+    norm = normalize_name(gap)
+    refers = bool(_RESULT_RE.search(norm))
+    norm = _RESULT_RE.sub(" ", norm)
+    ops = []
+    for pattern, op in _OPERATORS:
+        if pattern.search(norm):
+            ops.append(op)
+            norm = pattern.sub(" ", norm)
+    leftovers = [w for w in norm.split() if not _FILLER_RE.match(w)]
+    if len(ops) != 1:
+        return None, refers, False
+    return ops[0], refers, len(leftovers) <= 2
+
+
+def _frame_only(text: str, operator_consumed: bool = False) -> bool:
+    # Text outside the operands holds nothing but the question frame (and, before the first
+    # operand, the operator word when it was taken from there: "suma la X de A y ...")
+    norm = _RESULT_RE.sub(" ", normalize_name(text))
+    for pattern, _ in _OPERATORS:
+        if pattern.search(norm):
+            if not operator_consumed:
+                return False
+            norm = pattern.sub(" ", norm)
+    return all(_FILLER_RE.match(w) or w in _FRAME_WORDS for w in norm.split())
+
+
+def parse_local(statement: str, dictionary: Optional[NameDictionary] = None) -> Tuple[Optional[Dict[str, Any]], float]:
+    dictionary = dictionary if dictionary is not None else get_dictionary()
+    mentions = dictionary.find_mentions(statement)
+
+    operands: List[_Operand] = []
+    taken: List[Tuple[int, int]] = []
+    for pattern, attr_map in _ATTR_RES:
+        for m in pattern.finditer(statement):
+            if any(s <= m.start() < e for s, e in taken):
+                continue
+            op = _entity_at(statement, m.end(), attr_map, mentions)
+            if op is None:
+                return None, 0.0
+            op.start = m.start()
+            operands.append(op)
+            taken.append((op.start, op.end))
+    if not operands:
+        return None, 0.0
+
+    # Catalog names that are not bound to any attribute mean we missed part of the statement
+    for m in mentions:
+        if not any(s <= m.start < e for s, e in taken):
+            return None, 0.0
+
+    # Same for capitalized words outside operands (names we could not bind), except sentence starts
+    for m in re.finditer(r"[^\s¿¡\"(]+", statement):
+        if m.group(0)[0].isupper() and not any(s <= m.start() < e for s, e in taken):
+            before = statement[:m.start()].rstrip(" ¿¡\"(")
+            if before and before[-1] not in ".?!:;":
+                return None, 0.0
+
+    for m in _NUMBER_RE.finditer(statement):
+        if not any(s <= m.start() < e for s, e in taken):
+            operands.append(_Operand(m.start(), m.end(), number=m.group(0).replace(",", ".")))
+    operands.sort(key=lambda o: o.start)
+
+    entities: List[Dict[str, str]] = []
+    entity_idx: Dict[Tuple[str, str], int] = {}
+    vars_spec: Dict[str, Dict[str, Any]] = {}
+    var_of: Dict[Tuple[int, str], str] = {}
+    confidence = 1.0
+
+    def term(op: _Operand) -> str:
+        nonlocal confidence
+        if op.number is not None:
+            return op.number
+        key = (op.etype, op.name)
+        if key not in entity_idx:
+            entity_idx[key] = len(entities)
+            entities.append({"type": op.etype, "name": op.name})
+            if not op.known:
+                confidence *= _UNKNOWN_NAME_PENALTY
+        idx = entity_idx[key]
+        var = var_of.get((idx, op.attr))
+        if var is None:
+            var = f"x{len(vars_spec) + 1}"
+            var_of[(idx, op.attr)] = var
+            vars_spec[var] = {"entity": idx, "attribute": op.attr}
+        return f"len({var})" if op.attr in ("name", "homeworld") else var
+
+    # Words after the last operand ("al cuadrado", "por favor") are an operation we did not bind
+    if not _frame_only(statement[operands[-1].end:]):
+        return None, 0.0
+    prefix_used = False
+
+    expression = term(operands[0])
+    group_prec: Optional[int] = None
+    for prev, cur in zip(operands, operands[1:]):
+        gap = statement[prev.end:cur.start]
+        op, refers, clean = _gap_operator(gap)
+        if op is None and prev is operands[0] and all(_FILLER_RE.match(w) for w in normalize_name(gap).split()):
+            # "suma la X de A y la Y de B": the operator is in the text before the first operand
+            op, _, _ = _gap_operator(statement[:prev.start])
+            if op in ("-", "/") and set(normalize_name(gap).split()) & {"a", "al", "de", "del"}:
+                return None, 0.0  # "resta X a Y" is Y - X; operand order is not safe to guess
+            refers, clean, prefix_used = False, True, True
+        if op is None:
+            return None, 0.0
+        if not clean:
+            confidence *= 0.8
+        if refers:
+            expression = f"({expression})"
+            group_prec = None
+        elif group_prec is not None and group_prec != _PRECEDENCE[op]:
+            return None, 0.0  # "A más B por C" is ambiguous in prose; leave it to the LLM
+        group_prec = _PRECEDENCE[op]
+        expression = f"{expression} {op} {term(cur)}"
+
+    if not _frame_only(statement[:operands[0].start], operator_consumed=prefix_used):
+        return None, 0.0
+    if not vars_spec:
+        return None, 0.0
+    return {"entities": entities, "vars": vars_spec, "expression": expression, "notes": "local"}, confidence
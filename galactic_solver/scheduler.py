@@ -0,0 +1,198 @@
+from __future__ import annotations
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, Optional, TypeVar
+from .metrics import count
+
+if TYPE_CHECKING:
+    import httpx
+
+# Time budgets for the official loop. Every problem gets min(PROBLEM_BUDGET, time left
+# minus the submit reserve); its stages must finish by a cumulative share of that budget
+# (parse by 60%, resolve by 90%, evaluate by the end), so time a stage doesn't use carries
+# over to the next one. A stage over its budget is abandoned and the fallback answer is
+# submitted; an LLM call expected to take longer than what is left is not even started.
+# Submit has its own budget: the reserve plus whatever the problem left unused, never past
+# the end of the attempt (an answer sent after that no longer counts).
+# Sync stages run on the calling thread with their deadline in a contextvar: HTTP calls
+# made meanwhile get it as their timeout (cap_request_timeout), so nothing is left running
+# once the stage gives up. Async stages cancel every task they started.
+
+PROBLEM_BUDGET = float(os.getenv("GALACTIC_PROBLEM_BUDGET") or 8.0)
+SUBMIT_RESERVE = 1.5
+MIN_STAGE_SECONDS = 0.05
+STAGE_CHECKPOINTS = {"parse": 0.6, "resolve": 0.9, "evaluate": 1.0}
+EWMA_ALPHA = 0.3
+# Only skip what is clearly slow: expected time above this many times what is left
+SKIP_FACTOR = 1.5
+
+T = TypeVar("T")
+
+# time.monotonic() by which the running sync stage must end (None outside a stage)
+_DEADLINE: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("stage_deadline", default=None)
+# Shortest timeout handed to httpx: zero would make its sockets non-blocking
+_MIN_REQUEST_TIMEOUT = 0.001
+
+
+def time_left() -> Optional[float]:
+    # Seconds until the current stage's deadline; None when there is none
+    deadline = _DEADLINE.get()
+    return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+
+def cap_request_timeout(request: httpx.Request):
+    # httpx request hook: no phase of the request may outlive the stage that makes it
+    left = time_left()
+    if left is None:
+        return
+    left = max(left, _MIN_REQUEST_TIMEOUT)
+    timeouts = request.extensions.get("timeout") or {}
+    request.extensions["timeout"] = {k: left if v is None else min(v, left) for k, v in timeouts.items()}
+
+
+class StageTimeout(Exception):
+    def __init__(self, stage: str, seconds: float):
+        super().__init__(f"etapa '{stage}' excedió su presupuesto ({seconds:.2f}s)")
+        self.stage = stage
+        self.seconds = seconds
+
+
+class Scheduler:
+    def __init__(self, limit_seconds: float, problem_budget: float = PROBLEM_BUDGET):
+        self.limit_seconds = limit_seconds
+        self.problem_budget = problem_budget
+        self.started = time.monotonic()
+        self._expected: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def remaining(self) -> float:
+        return self.limit_seconds - self.elapsed()
+
+    def observe(self, what: str, seconds: float):
+        with self._lock:
+            prev = self._expected.get(what)
+            self._expected[what] = seconds if prev is None else EWMA_ALPHA * seconds + (1 - EWMA_ALPHA) * prev
+
+    def expected(self, what: str) -> Optional[float]:
+        with self._lock:
+            return self._expected.get(what)
+
+    def start_problem(self) -> "ProblemBudget":
+        total = min(self.problem_budget, self.remaining() - SUBMIT_RESERVE)
+        return ProblemBudget(self, max(total, 0.0))
+
+
+class ProblemBudget:
+    def __init__(self, scheduler: Scheduler, total: float):
+        self.scheduler = scheduler
+        self.total = total
+        self.started = time.monotonic()
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    @property
+    def exhausted(self) -> bool:
+        return self.total < MIN_STAGE_SECONDS
+
+    def stage_seconds(self, stage: str) -> float:
+        # Time left for `stage`: up to its checkpoint, never past the global deadline
+        if stage == "submit":
+            left = SUBMIT_RESERVE + max(0.0, self.total - self.elapsed())
+            return max(0.0, min(left, self.scheduler.remaining()))
+        share = STAGE_CHECKPOINTS.get(stage, 1.0)
+        left = self.total * share - self.elapsed()
+        return max(0.0, min(left, self.scheduler.remaining() - SUBMIT_RESERVE))
+
+    def allows(self, stage: str, what: str) -> bool:
+        # False when `what` usually takes clearly longer than the time left for `stage`
+        seconds = self.stage_seconds(stage)
+        if seconds < MIN_STAGE_SECONDS:
+            count(f"budget.skipped.{stage}")
+            return False
+        expected = self.scheduler.expected(what)
+        if expected is None or expected <= seconds * SKIP_FACTOR:
+            return True
+        # A skip teaches nothing about the real latency; pull the estimate towards the
+        # budget so a later problem tries again instead of skipping forever
+        self.scheduler.observe(what, seconds)
+        count(f"budget.skipped.{stage}")
+        return False
+
+    def observe(self, what: str, seconds: float):
+        self.scheduler.observe(what, seconds)
+
+    def run(self, stage: str, fn: Callable[..., T], *args, **kwargs) -> T:
+        seconds = self.stage_seconds(stage)
+        if seconds < MIN_STAGE_SECONDS:
+            count(f"budget.timeout.{stage}")
+            raise StageTimeout(stage, seconds)
+        deadline = time.monotonic() + seconds
+        outer = _DEADLINE.get()
+        token = _DEADLINE.set(deadline if outer is None else min(deadline, outer))
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            if time.monotonic() < deadline:
+                raise
+            # Whatever failed, it failed because the stage ran out of time
+            count(f"budget.timeout.{stage}")
+            raise StageTimeout(stage, seconds) from None
+        finally:
+            _DEADLINE.reset(token)
+        if time.monotonic() >= deadline:
+            count(f"budget.timeout.{stage}")
+            raise StageTimeout(stage, seconds)
+        return result
+
+    async def arun(self, stage: str, aw: Awaitable[T]) -> T:
+        seconds = self.stage_seconds(stage)
+        if seconds < MIN_STAGE_SECONDS:
+            if asyncio.iscoroutine(aw):
+                aw.close()
+            count(f"budget.timeout.{stage}")
+            raise StageTimeout(stage, seconds)
+        deadline = time.monotonic() + seconds
+        before = asyncio.all_tasks()
+        try:
+            result = await asyncio.wait_for(aw, timeout=seconds)
+        except asyncio.TimeoutError:
+            # wait_for only cancels `aw`; shielded singleflight leaders and prefetch/hedge
+            # tasks it started would keep fetching (and filling the caches) in the background.
+            # Problems are solved one at a time, so every task created meanwhile is the stage's
+            for task in asyncio.all_tasks() - before:
+                task.cancel()
+            count(f"budget.timeout.{stage}")
+            raise StageTimeout(stage, seconds) from None
+        if time.monotonic() >= deadline:
+            # CPU-bound stages (evaluate) never yield, so wait_for can't interrupt them
+            count(f"budget.timeout.{stage}")
+            raise StageTimeout(stage, seconds)
+        return result
+
+
+def problem_context(budget: Optional[ProblemBudget]) -> contextvars.Context:
+    # Context for work handed to another thread on behalf of the problem (prefetch): its
+    # HTTP calls are capped at the end of the problem, not at the stage that started it
+    ctx = contextvars.copy_context()
+    if budget is not None:
+        ctx.run(_DEADLINE.set, time.monotonic() + budget.stage_seconds("evaluate"))
+    return ctx
+
+
+def run_stage(budget: Optional[ProblemBudget], stage: str, fn: Callable[..., T], *args, **kwargs) -> T:
+    if budget is None:
+        return fn(*args, **kwargs)
+    return budget.run(stage, fn, *args, **kwargs)
+
+
+async def arun_stage(budget: Optional[ProblemBudget], stage: str, aw: Awaitable[T]) -> T:
+    if budget is None:
+        return await aw
+    return await budget.arun(stage, aw)
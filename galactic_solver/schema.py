@@ -0,0 +1,110 @@
+from __future__ import annotations
+from decimal import Decimal
+from typing import Any, Dict, FrozenSet, List, Mapping, Sequence, Tuple, Type
+from .utils import parse_decimal
+
+# Typed entity records returned by the data sources. Numeric fields are turned into
+# Decimal once, when the record is built from the fetched/cached item; the evaluator uses
+# them as they are. The registry maps entity types to records and every attribute to the
+# type that owns it, which is what the solver needs to bind and reassign variables.
+
+
+class Record:
+    __slots__ = ()
+    ETYPE = ""
+    FIELDS: Tuple[str, ...] = ()
+    NUMERIC: FrozenSet[str] = frozenset()
+    FIELD_SET: FrozenSet[str] = frozenset()
+
+    @classmethod
+    def from_item(cls, item: Mapping[str, Any]) -> "Record":
+        self = cls.__new__(cls)
+        for f in cls.FIELDS:
+            v = item.get(f)
+            if f in cls.NUMERIC and v is not None and not isinstance(v, Decimal):
+                v = parse_decimal(v)
+            setattr(self, f, v)
+        return self
+
+    def get(self, attr: str, default: Any = None) -> Any:
+        # dict-style access, so code written against plain dicts keeps working
+        return getattr(self, attr) if attr in self.FIELD_SET else default
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {f: getattr(self, f) for f in self.FIELDS}
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{f}={getattr(self, f)!r}" for f in self.FIELDS)
+        return f"{type(self).__name__}({fields})"
+
+
+class Planet(Record):
+    __slots__ = ("name", "rotation_period", "orbital_period", "diameter", "surface_water", "population")
+    ETYPE = "sw_planet"
+    FIELDS = __slots__
+    NUMERIC = frozenset(FIELDS[1:])
+    FIELD_SET = frozenset(FIELDS)
+
+
+class Character(Record):
+    __slots__ = ("name", "height", "mass", "homeworld")
+    ETYPE = "sw_character"
+    FIELDS = __slots__
+    NUMERIC = frozenset(("height", "mass"))
+    FIELD_SET = frozenset(FIELDS)
+
+
+class Pokemon(Record):
+    __slots__ = ("name", "base_experience", "height", "weight")
+    ETYPE = "pokemon"
+    FIELDS = __slots__
+    NUMERIC = frozenset(FIELDS[1:])
+    FIELD_SET = frozenset(FIELDS)
+
+
+# Registry order decides the owner of shared attributes (name -> planet, height -> character)
+SCHEMAS: Dict[str, Type[Record]] = {cls.ETYPE: cls for cls in (Planet, Character, Pokemon)}
+
+ATTRIBUTE_OWNER: Dict[str, str] = {}
+for _etype, _cls in SCHEMAS.items():
+    for _f in _cls.FIELDS:
+        ATTRIBUTE_OWNER.setdefault(_f, _etype)
+
+# Attribute names the parser/LLM mixes up between types (etype -> wrong -> right)
+ALIASES: Dict[str, Dict[str, str]] = {
+    "pokemon": {"mass": "weight"},
+    "sw_character": {"weight": "mass"},
+}
+_NO_ALIASES: Dict[str, str] = {}
+
+ALLOWED: Dict[str, FrozenSet[str]] = {etype: cls.FIELD_SET for etype, cls in SCHEMAS.items()}
+_NOTHING: FrozenSet[str] = frozenset()
+
+
+def attribute_allowed(etype: str, attr: str) -> bool:
+    return attr in ALLOWED.get(etype, _NOTHING)
+
+
+def canonical_attribute(etype: str, attr: str) -> str:
+    return ALIASES.get(etype, _NO_ALIASES).get(attr, attr)
+
+
+class AttributeIndex:
+    # attribute -> indexes of the problem's entities of the owning type that have a value.
+    # Filled per attribute on first use, so each attribute costs one pass over the entities.
+    __slots__ = ("_types", "_records", "_by_attr")
+
+    def __init__(self, types: Sequence[str], records: Sequence[Any]):
+        self._types = types
+        self._records = records
+        self._by_attr: Dict[str, List[int]] = {}
+
+    def candidates(self, attr: str) -> List[int]:
+        found = self._by_attr.get(attr)
+        if found is None:
+            owner = ATTRIBUTE_OWNER.get(attr)
+            found = [j for j, etype in enumerate(self._types)
+                     if etype == owner and self._records[j].get(attr) is not None] if owner else []
+            self._by_attr[attr] = found
+        return found
+
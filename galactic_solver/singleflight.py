@@ -0,0 +1,83 @@
+from __future__ import annotations
+import asyncio
+import threading
+from collections import Counter
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple, TypeVar
+from .metrics import count
+from .scheduler import time_left
+
+# Request coalescing for the data-source caches: while a fetch for a key is in flight,
+# other misses for the same key wait for it instead of issuing their own request, and
+# get its result (or its exception). Nothing is kept once the fetch ends; the cache is
+# what remembers results.
+
+T = TypeVar("T")
+
+# fetched: fetches actually run; shared: callers served by someone else's fetch
+SINGLEFLIGHT_STATS: Counter = Counter()
+
+
+def _record(name: str, shared: bool):
+    what = "shared" if shared else "fetched"
+    SINGLEFLIGHT_STATS[what] += 1
+    count(f"singleflight.{what}.{name}")
+
+
+class SingleFlight:
+    # Threaded flavour: followers block on the leader's Future
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, Future] = {}
+
+    def do(self, key: Hashable, fn: Callable[..., T], *args) -> T:
+        with self._lock:
+            fut = self._inflight.get(key)
+            leader = fut is None
+            if leader:
+                fut = self._inflight[key] = Future()
+        _record(self.name, not leader)
+        if not leader:
+            # Not past the deadline of the stage waiting (the leader's own calls are capped too)
+            return fut.result(timeout=time_left())
+        try:
+            result = fn(*args)
+        except BaseException as ex:
+            fut.set_exception(ex)
+            raise
+        else:
+            fut.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+
+class AsyncSingleFlight:
+    # asyncio flavour: followers await the leader's task (per event loop)
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Tuple[int, Hashable], "asyncio.Future[Any]"] = {}
+
+    async def do(self, key: Hashable, fn: Callable[..., Awaitable[T]], *args) -> T:
+        loop_key = (id(asyncio.get_running_loop()), key)
+        task = self._inflight.get(loop_key)
+        if task is not None:
+            _record(self.name, True)
+            # A follower cancelled mid-wait must not cancel the leader's fetch
+            return await asyncio.shield(task)
+        _record(self.name, False)
+        task = asyncio.ensure_future(fn(*args))
+        self._inflight[loop_key] = task
+        try:
+            return await asyncio.shield(task)
+        finally:
+            if task.done():
+                self._inflight.pop(loop_key, None)
+            else:
+                task.add_done_callback(lambda _: self._inflight.pop(loop_key, None))
+
+
+def singleflight_stats_summary() -> str:
+    return f"fetched={SINGLEFLIGHT_STATS['fetched']}, shared={SINGLEFLIGHT_STATS['shared']}"
@@ -0,0 +1,90 @@
+from __future__ import annotations
+import json
+from typing import Any, Callable, Dict, List, Optional
+
+# Incremental reader for the parser's JSON answer while it is still being generated.
+# Only the structure is tracked (strings, nesting, the current top-level key); each
+# item of the top-level "entities" array is decoded as soon as its closing brace (or
+# bracket, for the compact protocol's [type, name] pairs) arrives. The full text is kept
+# so the final answer goes through the normal parse.
+
+
+class EntityStreamParser:
+    def __init__(self, key: str = "entities",
+                 convert: Optional[Callable[[Any], Optional[Dict[str, Any]]]] = None):
+        self.key = key
+        self.convert = convert
+        self._text = ""
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._current_key: Optional[str] = None
+        self._array_depth: Optional[int] = None  # stack depth inside the target array
+        self._item_start: Optional[int] = None
+        self.entities: List[Dict[str, Any]] = []
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        # Returns the entities completed by this chunk
+        if not chunk:
+            return []
+        self._text += chunk
+        done: List[Dict[str, Any]] = []
+        text = self._text
+        stack = self._stack
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if len(stack) == 1:
+                        try:
+                            self._last_string = json.loads(text[self._string_start:i + 1])
+                        except ValueError:
+                            self._last_string = None
+                continue
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch == ":" and len(stack) == 1:
+                self._current_key = self._last_string
+            elif ch == "," and len(stack) == 1:
+                self._current_key = None
+            elif ch in "{[":
+                if ch == "[" and len(stack) == 1 and self._current_key == self.key and self._array_depth is None:
+                    self._array_depth = len(stack) + 1
+                elif self._array_depth is not None and len(stack) == self._array_depth:
+                    self._item_start = i
+                stack.append(ch)
+            elif ch in "}]":
+                if stack:
+                    stack.pop()
+                if self._item_start is not None and len(stack) == self._array_depth:
+                    item = self._decode(text[self._item_start:i + 1])
+                    self._item_start = None
+                    if item is not None:
+                        self.entities.append(item)
+                        done.append(item)
+                elif ch == "]" and self._array_depth is not None and len(stack) == self._array_depth - 1:
+                    self._array_depth = -1  # array closed; ignore any later one
+        self._pos = len(text)
+        return done
+
+    def _decode(self, raw: str) -> Optional[Dict[str, Any]]:
+        try:
+            item = json.loads(raw)
+        except ValueError:
+            return None
+        if self.convert is not None:
+            return self.convert(item)
+        return item if isinstance(item, dict) else None
+
+    @property
+    def text(self) -> str:
+        return self._text
@@ -0,0 +1,306 @@
+from __future__ import annotations
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, List, Optional, Tuple, Union
+import httpx
+
+# HTTP record/replay ("cassette") shared by every client built with make_client: the
+# challenge API, SWAPI and PokéAPI. Recording wraps the real transport and appends each
+# exchange to a JSONL file (request method/URL/body hash, status, headers, body chunks with
+# their arrival offsets); replaying answers from that file without touching the network.
+# Requests are matched on method + URL + body, in recorded order for repeated requests.
+# A GET whose body differs falls back to method + URL; any other method only does with
+# loose=True (GALACTIC_CASSETTE_MATCH=url), since a chat POST replayed by URL alone would
+# answer one statement with another's parse. Otherwise it is a miss.
+
+MODES = ("record", "replay")
+# Methods replayed by URL alone when the body differs
+_URL_FALLBACK_METHODS = ("GET", "HEAD")
+
+Latency = Union[None, str, float]
+_Key = Tuple[str, str, str]
+
+
+def _body_hash(content: bytes) -> str:
+    return hashlib.sha1(content).hexdigest() if content else ""
+
+
+def _encode(data: bytes) -> str:
+    # Lossless for any bytes (invalid UTF-8 survives as escaped surrogates)
+    return data.decode("utf-8", "surrogateescape")
+
+
+def _decode(text: str) -> bytes:
+    return text.encode("utf-8", "surrogateescape")
+
+
+class CassetteMiss(httpx.TransportError):
+    pass
+
+
+class Cassette:
+    def __init__(self, path: str, mode: str = "replay", latency: Latency = None, loose: bool = False):
+        if mode not in MODES:
+            raise ValueError(f"cassette mode must be one of {MODES}")
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.loose = loose
+        self._lock = threading.Lock()
+        self._exact: Dict[_Key, Deque[Dict[str, Any]]] = defaultdict(deque)
+        self._by_url: Dict[Tuple[str, str], Deque[Dict[str, Any]]] = defaultdict(deque)
+        self.recorded = 0
+        self.replayed = 0
+        self.missed = 0
+        if mode == "record":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            open(path, "w", encoding="utf-8").close()
+        else:
+            self._load()
+
+    def _load(self):
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                entry["used"] = False
+                self._exact[(entry["method"], entry["url"], entry["body"])].append(entry)
+                self._by_url[(entry["method"], entry["url"])].append(entry)
+
+    def __len__(self) -> int:
+        return sum(len(q) for q in self._by_url.values())
+
+    @staticmethod
+    def _pop(queue: Deque[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        while queue:
+            entry = queue.popleft()
+            if not entry["used"]:
+                return entry
+        return None
+
+    def match(self, request: httpx.Request) -> Dict[str, Any]:
+        method, url, body = request.method, str(request.url), _body_hash(request.content)
+        with self._lock:
+            entry = self._pop(self._exact[(method, url, body)])
+            if entry is None and (self.loose or method in _URL_FALLBACK_METHODS):
+                entry = self._pop(self._by_url[(method, url)])
+            if entry is None:
+                self.missed += 1
+                raise CassetteMiss(f"no recorded response for {method} {url}", request=request)
+            entry["used"] = True
+            self.replayed += 1
+        return entry
+
+    def save(self, request: httpx.Request, response: httpx.Response, elapsed: float,
+             chunks: List[Tuple[float, bytes]]):
+        entry = {
+            "method": request.method,
+            "url": str(request.url),
+            "body": _body_hash(request.content),
+            "status": response.status_code,
+            "headers": [[k, v] for k, v in response.headers.multi_items()],
+            "elapsed": round(elapsed, 6),
+            "chunks": [[round(t, 6), _encode(c)] for t, c in chunks],
+        }
+        line = json.dumps(entry, ensure_ascii=True)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            self.recorded += 1
+
+    def delay(self, recorded: float) -> float:
+        if self.latency is None:
+            return 0.0
+        if self.latency == "recorded":
+            return recorded
+        return float(self.latency)
+
+    def summary(self) -> str:
+        if self.mode == "record":
+            return f"{self.recorded} respuestas grabadas en {self.path}"
+        return f"{self.replayed} respuestas reproducidas, {self.missed} sin grabación ({self.path})"
+
+
+def _replayed_response(entry: Dict[str, Any], stream) -> httpx.Response:
+    return httpx.Response(entry["status"], headers=entry["headers"], stream=stream)
+
+
+# --- sync -------------------------------------------------------------------
+
+class _RecordingStream(httpx.SyncByteStream):
+    def __init__(self, cassette: Cassette, request: httpx.Request, response: httpx.Response,
+                 started: float, elapsed: float):
+        self._cassette = cassette
+        self._request = request
+        self._response = response
+        self._started = started
+        self._elapsed = elapsed
+        self._chunks: List[Tuple[float, bytes]] = []
+
+    def __iter__(self) -> Iterator[bytes]:
+        for chunk in self._response.stream:
+            self._chunks.append((time.perf_counter() - self._started - self._elapsed, chunk))
+            yield chunk
+
+    def close(self):
+        # Whatever the caller read is what a replay has to serve (an SSE reader stops at [DONE])
+        self._response.close()
+        self._cassette.save(self._request, self._response, self._elapsed, self._chunks)
+
+
+class _ReplayStream(httpx.SyncByteStream):
+    def __init__(self, cassette: Cassette, chunks: List[List[Any]]):
+        self._cassette = cassette
+        self._chunks = chunks
+
+    def __iter__(self) -> Iterator[bytes]:
+        last = 0.0
+        for offset, text in self._chunks:
+            if self._cassette.latency == "recorded" and offset > last:
+                time.sleep(offset - last)
+            last = offset
+            yield _decode(text)
+
+
+class CassetteTransport(httpx.BaseTransport):
+    def __init__(self, cassette: Cassette, inner: Optional[httpx.BaseTransport] = None):
+        self.cassette = cassette
+        self.inner = inner
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if self.cassette.mode == "replay":
+            entry = self.cassette.match(request)
+            pause = self.cassette.delay(entry["elapsed"])
+            if pause > 0:
+                time.sleep(pause)
+            return _replayed_response(entry, _ReplayStream(self.cassette, entry["chunks"]))
+        started = time.perf_counter()
+        response = self.inner.handle_request(request)
+        elapsed = time.perf_counter() - started
+        stream = _RecordingStream(self.cassette, request, response, started, elapsed)
+        return httpx.Response(response.status_code, headers=response.headers, stream=stream,
+                              extensions=response.extensions)
+
+    def close(self):
+        if self.inner is not None:
+            self.inner.close()
+
+
+# --- async ------------------------------------------------------------------
+
+class _AsyncRecordingStream(httpx.AsyncByteStream):
+    def __init__(self, cassette: Cassette, request: httpx.Request, response: httpx.Response,
+                 started: float, elapsed: float):
+        self._cassette = cassette
+        self._request = request
+        self._response = response
+        self._started = started
+        self._elapsed = elapsed
+        self._chunks: List[Tuple[float, bytes]] = []
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._response.stream:
+            self._chunks.append((time.perf_counter() - self._started - self._elapsed, chunk))
+            yield chunk
+
+    async def aclose(self):
+        await self._response.aclose()
+        self._cassette.save(self._request, self._response, self._elapsed, self._chunks)
+
+
+class _AsyncReplayStream(httpx.AsyncByteStream):
+    def __init__(self, cassette: Cassette, chunks: List[List[Any]]):
+        self._cassette = cassette
+        self._chunks = chunks
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        last = 0.0
+        for offset, text in self._chunks:
+            if self._cassette.latency == "recorded" and offset > last:
+                await asyncio.sleep(offset - last)
+            last = offset
+            yield _decode(text)
+
+
+class AsyncCassetteTransport(httpx.AsyncBaseTransport):
+    def __init__(self, cassette: Cassette, inner: Optional[httpx.AsyncBaseTransport] = None):
+        self.cassette = cassette
+        self.inner = inner
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if self.cassette.mode == "replay":
+            entry = self.cassette.match(request)
+            pause = self.cassette.delay(entry["elapsed"])
+            if pause > 0:
+                await asyncio.sleep(pause)
+            return _replayed_response(entry, _AsyncReplayStream(self.cassette, entry["chunks"]))
+        started = time.perf_counter()
+        response = await self.inner.handle_async_request(request)
+        elapsed = time.perf_counter() - started
+        stream = _AsyncRecordingStream(self.cassette, request, response, started, elapsed)
+        return httpx.Response(response.status_code, headers=response.headers, stream=stream,
+                              extensions=response.extensions)
+
+    async def aclose(self):
+        if self.inner is not None:
+            await self.inner.aclose()
+
+
+# --- process-wide cassette ---------------------------------------------------
+
+_CASSETTE: Optional[Cassette] = None
+
+
+def parse_latency(value: Optional[str]) -> Latency:
+    # "recorded" sleeps the recorded latencies, a number sleeps that many seconds before
+    # every response, unset replays instantly
+    if value is None or value == "":
+        return None
+    if value == "recorded":
+        return value
+    try:
+        seconds = float(value)
+    except ValueError:
+        seconds = -1.0
+    if not seconds >= 0:  # also rejects nan
+        raise ValueError(f"se esperaba 'recorded' o segundos >= 0, no {value!r}")
+    return seconds
+
+
+def install(path: str, mode: str, latency: Latency = None, loose: bool = False) -> Cassette:
+    # Clients built after this go through the cassette (rebuild the module-level ones)
+    global _CASSETTE
+    _CASSETTE = Cassette(path, mode, latency, loose)
+    return _CASSETTE
+
+
+def configure_from_env() -> Optional[Cassette]:
+    # GALACTIC_CASSETTE (+ _MODE, GALACTIC_REPLAY_LATENCY, GALACTIC_CASSETTE_MATCH=url),
+    # read when a command starts rather than at import so .env and a daemon caller's
+    # environment apply. Without it no cassette is active.
+    global _CASSETTE
+    path = os.getenv("GALACTIC_CASSETTE")
+    if not path:
+        _CASSETTE = None
+        return None
+    return install(path, os.getenv("GALACTIC_CASSETTE_MODE", "replay"),
+                   parse_latency(os.getenv("GALACTIC_REPLAY_LATENCY")),
+                   loose=os.getenv("GALACTIC_CASSETTE_MATCH", "").lower() == "url")
+
+
+def active() -> Optional[Cassette]:
+    return _CASSETTE
+
+
+def wrap(cassette: Cassette, asynchronous: bool, **transport_kwargs):
+    if asynchronous:
+        inner = httpx.AsyncHTTPTransport(**transport_kwargs) if cassette.mode == "record" else None
+        return AsyncCassetteTransport(cassette, inner)
+    inner = httpx.HTTPTransport(**transport_kwargs) if cassette.mode == "record" else None
+    return CassetteTransport(cassette, inner)
@@ -1,17 +1,45 @@
 from __future__ import annotations
 from decimal import Decimal
-from typing import Optional, Union
+from typing import TYPE_CHECKING, Optional, Union
+import asyncio
+import importlib.util
+import json
 import re
 import os
+import threading
+import unicodedata
 
-# Simple in-memory cache
-_CACHE: dict[str, object] = {}
+from .cache import MISSING, MemoryCache, SqliteCache, TieredCache, _ABSENT, namespace_of
+from .metrics import RECORDER
+from .scheduler import cap_request_timeout
+
+if TYPE_CHECKING:
+    import httpx
+
+# Two-tier cache: in-memory LRU + persistent SQLite (disable with GALACTIC_CACHE=off)
+_CACHE: Optional[TieredCache] = None
+
+def get_cache() -> TieredCache:
+    global _CACHE
+    if _CACHE is None:
+        persistent = None
+        if os.getenv("GALACTIC_CACHE", "on").lower() not in ("off", "0", "false", "no"):
+            try:
+                persistent = SqliteCache(os.getenv("GALACTIC_CACHE_PATH") or cache_path("cache.sqlite3"))
+            except Exception:
+                persistent = None  # read-only dir, locked file...: stay in memory
+        _CACHE = TieredCache(MemoryCache(), persistent)
+    return _CACHE
 
 def cache_get(key: str):
-    return _CACHE.get(key)
+    # Returns the cached value, MISSING for known-missing entries, or None when not cached
+    value = get_cache().get(key)
+    RECORDER.count(f"cache.{'miss' if value is _ABSENT else 'hit'}.{namespace_of(key)}")
+    return None if value is _ABSENT else value
 
-def cache_set(key: str, value: object):
-    _CACHE[key] = value
+def cache_set(key: str, value: object, persist: bool = True):
+    # Store MISSING for negative results; persist=False keeps the entry in memory only
+    get_cache().set(key, value, persist=persist)
 
 _NUM_RE = re.compile(r"[^0-9\.-]")
 
@@ -36,6 +64,111 @@ def parse_decimal(value: Union[str, int, float, Decimal, None]) -> Optional[Deci
     except Exception:
         return None
 
+_NAME_STRIP_RE = re.compile(r"[^a-z0-9]+")
+
+def normalize_name(name: str) -> str:
+    # Lowercase, drop accents and collapse punctuation/whitespace to single spaces
+    s = unicodedata.normalize("NFKD", name)
+    s = "".join(ch for ch in s if not unicodedata.combining(ch)).lower()
+    return _NAME_STRIP_RE.sub(" ", s).strip()
+
+def cache_path(filename: str) -> str:
+    # Location for local data files (indexes, persistent caches). Resolved on every call,
+    # not at import, so GALACTIC_CACHE_DIR from a .env loaded later still applies
+    return os.path.join(os.getenv("GALACTIC_CACHE_DIR", ".galactic_cache"), filename)
+
+def write_json_atomic(path: str, data: object):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+def json_default(value: object):
+    # json.dumps(default=...) for solver results: Decimal answers and schema records
+    if isinstance(value, Decimal):
+        return str(value)
+    if hasattr(value, "as_dict"):
+        return value.as_dict()
+    raise TypeError(f"not serializable: {type(value).__name__}")
+
+# Keep idle connections long enough to survive from warmup to the first problems
+KEEPALIVE_SECONDS = 120.0
+
+def http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+def make_client(timeout: float, headers: Optional[dict] = None, http2: bool = False, asynchronous: bool = False):
+    # HTTP/2 needs the optional 'h2' package (pip install httpx[http2]); otherwise HTTP/1.1.
+    # httpx (~100ms to import) is loaded here, by the first client built, so commands
+    # that never reach the network (help, query, serve --stop) don't pay for it
+    import httpx
+    from . import transport
+
+    event_hooks = RECORDER.event_hooks(asynchronous)  # per-request timing (see metrics.py)
+    if not asynchronous:
+        # A sync stage's deadline caps each request's timeout (see scheduler.py)
+        event_hooks["request"].insert(0, cap_request_timeout)
+    kwargs = dict(
+        timeout=timeout,
+        headers=headers,
+        http2=http2 and http2_available(),
+        limits=httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=KEEPALIVE_SECONDS),
+        event_hooks=event_hooks,
+    )
+    cassette = transport.active()
+    if cassette is not None:
+        # Record/replay (see transport.py); the real transport gets the same pool settings
+        kwargs["transport"] = transport.wrap(cassette, asynchronous, http2=kwargs["http2"], limits=kwargs["limits"])
+    return httpx.AsyncClient(**kwargs) if asynchronous else httpx.Client(**kwargs)
+
+class LazyClient:
+    # Stands in for a make_client() client and builds it on first use: building one loads
+    # the TLS trust store (tens of ms), which commands that never touch that host skip.
+    # Async clients are rebuilt per event loop, since their connections belong to the loop
+    # that opened them (a resident process runs many asyncio.run()).
+    def __init__(self, timeout: float, headers: Optional[dict] = None, http2: bool = False,
+                 asynchronous: bool = False):
+        self._args = (timeout, headers, http2, asynchronous)
+        self._asynchronous = asynchronous
+        self._client = None
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def _current(self):
+        loop = _running_loop() if self._asynchronous else None
+        client = self._client
+        if client is None or loop is not self._loop:
+            with self._lock:
+                if self._client is None or loop is not self._loop:
+                    self._client = make_client(*self._args)
+                    self._loop = loop
+                client = self._client
+        return client
+
+    def __getattr__(self, name: str):
+        return getattr(self._current(), name)
+
+    @property
+    def built(self) -> bool:
+        return self._client is not None
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+
+    async def aclose(self):
+        if self._client is not None and self._loop is _running_loop():
+            await self._client.aclose()
+
+
+def _running_loop():
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
 def get_env_token() -> Optional[str]:
     # Try to load from environment; .env handled in app startup
     token = os.getenv("CHALLENGE_TOKEN")
@@ -0,0 +1,74 @@
+import copy
+from collections import Counter
+
+import pytest
+
+import app
+from bench import corpus
+from galactic_solver.schema import Character, Planet, Pokemon
+from galactic_solver.utils import normalize_name
+
+PROBLEMS = corpus.generate(80, seed=19)
+EXTRA = {
+    # unknown entity, a division by zero, a parse that failed
+    "¿Cuál es la masa de Jar Jar Binks más 1?": {
+        "entities": [{"type": "sw_character", "name": "Jar Jar Binks"}],
+        "vars": {"x1": {"entity": 0, "attribute": "mass"}}, "expression": "x1 + 1"},
+    "¿Cuál es la altura de Yoda dividida por el agua superficial de Bespin?": {
+        "entities": [{"type": "sw_character", "name": "Yoda"}, {"type": "sw_planet", "name": "Bespin"}],
+        "vars": {"x1": {"entity": 0, "attribute": "height"}, "x2": {"entity": 1, "attribute": "surface_water"}},
+        "expression": "x1 / x2"},
+    "Un enunciado que nadie entiende": None,
+}
+
+
+def _record(etype, name):
+    # Like the real fetchers, match on the normalized name (prefetch asks for "mr. mime")
+    key = normalize_name(name)
+    if etype == "pokemon":
+        found = [n for n in corpus.POKEMON if normalize_name(n) == key]
+        return Pokemon.from_item({"name": found[0], **corpus.POKEMON[found[0]]}) if found else None
+    if etype == "sw_planet":
+        item = next((p for p in corpus.PLANETS if normalize_name(p["name"]) == key), None)
+        return Planet.from_item(item) if item else None
+    item = next((p for p in corpus.PEOPLE if normalize_name(p["name"]) == key), None)
+    if item is None:
+        return None
+    return Character.from_item({**item, "homeworld": corpus.PLANETS[item["homeworld"]]["name"]})
+
+
+@pytest.fixture
+def offline(monkeypatch, tmp_path):
+    monkeypatch.setenv("GALACTIC_CACHE_DIR", str(tmp_path))
+    parses = {p["statement"]: p["parse"] for p in PROBLEMS}
+    parses.update(EXTRA)
+    monkeypatch.setattr(app, "parse_statement", lambda statement, *a, **k: copy.deepcopy(parses.get(statement)))
+    fetches = Counter()
+    for etype in ("sw_character", "sw_planet", "pokemon"):
+        def fetch(name, etype=etype):
+            fetches[(etype, name)] += 1
+            return _record(etype, name)
+        monkeypatch.setitem(app.ENTITY_FETCHERS, etype, fetch)
+    return fetches
+
+
+def test_batch_matches_one_by_one(offline):
+    statements = [p["statement"] for p in PROBLEMS] + list(EXTRA)
+    batch = app.solve_statements(statements, client=None, workers=4)
+    assert len(batch["results"]) == len(statements)
+    assert all(n == 1 for n in offline.values())  # each distinct entity fetched once
+    assert batch["entities"]["distinct"] == len(offline)
+
+    one_by_one = [app.solve_statement(s, client=None) for s in statements]
+    assert [r["answer"] for r in batch["results"]] == one_by_one
+    assert [r["statement"] for r in batch["results"]] == statements
+
+
+def test_batch_answers_match_corpus_and_errors(offline):
+    statements = [p["statement"] for p in PROBLEMS] + list(EXTRA)
+    results = app.solve_statements(statements, client=None)["results"]
+    for problem, row in zip(PROBLEMS, results):
+        # Without an expected value the solver may still answer by reassigning a variable
+        if problem["expected"] is not None:
+            assert float(row["answer"]) == pytest.approx(problem["expected"]), problem["statement"]
+    assert [r["error"] for r in results[-3:]] == ["fetch", "evaluate", "parse"]
@@ -0,0 +1,83 @@
+import pytest
+
+from galactic_solver import cache
+from galactic_solver.cache import _ABSENT, DAY, MISSING, MemoryCache, SqliteCache, TieredCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def sqlite(tmp_path):
+    db = SqliteCache(str(tmp_path / "cache.sqlite3"), max_entries=3)
+    db._EVICT_EVERY = 1
+    yield db
+    db.close()
+
+
+def test_entries_expire_after_their_ttl(clock, sqlite):
+    tiered = TieredCache(MemoryCache(), sqlite)
+    tiered.set("swapi:people/:luke", {"name": "Luke Skywalker"})
+    tiered.set("other:x", 1)
+    clock.now += 8 * DAY  # past the default TTL, within the swapi one
+    assert tiered.get("other:x") is _ABSENT
+    assert sqlite.get("other:x") is _ABSENT
+    assert tiered.get("swapi:people/:luke") == {"name": "Luke Skywalker"}
+    clock.now += 30 * DAY
+    assert tiered.get("swapi:people/:luke") is _ABSENT
+
+
+def test_memory_tier_evicts_least_recently_used(clock):
+    memory = MemoryCache(max_entries=2)
+    memory.set("a", 1)
+    memory.set("b", 2)
+    assert memory.get("a") == 1  # now "b" is the oldest
+    memory.set("c", 3)
+    assert memory.get("b") is _ABSENT
+    assert (memory.get("a"), memory.get("c")) == (1, 3)
+
+
+def test_sqlite_tier_evicts_least_recently_used(clock, sqlite):
+    for i, key in enumerate("abc"):
+        clock.now += 1
+        sqlite.set(key, i)
+    clock.now += 1
+    assert sqlite.get("a") == 0  # refreshes its access time
+    clock.now += 1
+    sqlite.set("d", 3)
+    assert sqlite.get("b") is _ABSENT
+    assert [sqlite.get(k) for k in "acd"] == [0, 2, 3]
+
+
+def test_missing_is_persisted_with_its_own_ttl(clock, tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    first = SqliteCache(path)
+    TieredCache(MemoryCache(), first).set("pokemon:missingno", MISSING)
+    first.close()
+    reopened = SqliteCache(path)
+    tiered = TieredCache(MemoryCache(), reopened)
+    assert tiered.get("pokemon:missingno") is MISSING
+    assert tiered.preload() == 1
+    clock.now += 2 * DAY  # MISSING_TTL is shorter than the pokemon namespace TTL
+    assert reopened.get("pokemon:missingno") is _ABSENT
+    reopened.close()
+
+
+def test_persist_false_stays_in_memory(clock, sqlite):
+    tiered = TieredCache(MemoryCache(), sqlite)
+    tiered.set("swapi:people/:yoda", MISSING, persist=False)
+    assert tiered.get("swapi:people/:yoda") is MISSING
+    assert sqlite.get("swapi:people/:yoda") is _ABSENT
+    assert TieredCache(MemoryCache(), sqlite).get("swapi:people/:yoda") is _ABSENT
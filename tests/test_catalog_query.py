@@ -0,0 +1,64 @@
+import pytest
+
+from galactic_solver import catalog_query
+from galactic_solver.schema import Planet
+
+PLANETS = [Planet.from_item(p) for p in [
+    {"name": "Tatooine", "rotation_period": "23", "orbital_period": "304", "diameter": "10465",
+     "surface_water": "1", "population": "200000"},
+    {"name": "Hoth", "rotation_period": "23", "orbital_period": "549", "diameter": "7200",
+     "surface_water": "100", "population": "unknown"},
+    {"name": "Bespin", "rotation_period": "12", "orbital_period": "5110", "diameter": "118000",
+     "surface_water": "0", "population": "6000000"},
+    {"name": "Yavin IV", "rotation_period": "24", "orbital_period": "4818", "diameter": "10200",
+     "surface_water": "8", "population": "1000"},
+    {"name": "Dagobah", "rotation_period": "unknown", "orbital_period": "341", "diameter": "8900",
+     "surface_water": "8", "population": "unknown"},
+    {"name": "Kamino", "rotation_period": "27", "orbital_period": "463", "diameter": "19720",
+     "surface_water": "100", "population": "1000000000"},
+]]
+
+ENGINES = [
+    {"exact": True},
+    {"use_numpy": False},
+    pytest.param({"use_numpy": True}, marks=pytest.mark.skipif(not catalog_query.numpy_available(),
+                                                               reason="numpy not installed")),
+]
+
+
+@pytest.fixture(autouse=True)
+def catalog(monkeypatch):
+    monkeypatch.setattr(catalog_query, "load_catalog", lambda etype: PLANETS)
+
+
+def run(expression, engine, **kwargs):
+    out = catalog_query.query("planet", expression, top=None, **engine, **kwargs)
+    return out["rows"], out["masked"]
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("expression, masked", [
+    ("diameter / rotation_period", 1),                   # unknown rotation period
+    ("population / surface_water", 3),                   # unknown population, division by zero
+    ("diameter - orbital_period * 2 + len(name)", 0),
+    ("-(population - diameter) / (surface_water - 8)", 3),
+    ("orbital_period / 3", 0),
+])
+def test_engines_agree(expression, masked, engine):
+    rows, got_masked = run(expression, engine)
+    reference, _ = run(expression, {"use_numpy": False})
+    assert got_masked == masked
+    assert [name for name, _ in rows] == [name for name, _ in reference]
+    for (_, value), (_, expected) in zip(rows, reference):
+        assert float(value) == pytest.approx(expected, rel=1e-9)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_engines_agree_on_bounds_and_order(engine):
+    rows, _ = run("diameter / 100", engine, minimum=90, maximum=200, descending=False)
+    assert [(name, float(v)) for name, v in rows] == [("Yavin IV", 102.0), ("Tatooine", 104.65), ("Kamino", 197.2)]
+
+
+def test_exact_engine_rounds_like_the_solver():
+    rows, _ = run("orbital_period / 3", {"exact": True})
+    assert str(dict(rows)["Tatooine"]) == "101.3333333333"
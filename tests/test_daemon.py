@@ -0,0 +1,58 @@
+import os
+import tempfile
+import threading
+
+import pytest
+
+from galactic_solver import daemon
+
+
+@pytest.fixture
+def served(monkeypatch):
+    # Short path: Unix socket paths are limited to ~100 characters
+    path = os.path.join(tempfile.mkdtemp(prefix="gs"), "s.sock")
+    monkeypatch.setenv("GALACTIC_DAEMON", "on")
+    monkeypatch.setenv("CHALLENGE_TOKEN", "daemon-token")
+    monkeypatch.delenv("GALACTIC_PROTOCOL", raising=False)
+    commands, resets = [], []
+
+    def run(argv):
+        commands.append((argv, os.environ.get("CHALLENGE_TOKEN")))
+        os.environ["GALACTIC_PROTOCOL"] = "compact"  # like --protocol
+        print("hecho")
+        return 3
+
+    thread = threading.Thread(target=daemon.serve, args=(run, path, lambda: resets.append(len(commands))))
+    thread.start()
+    while not daemon.running(path):
+        thread.join(0.01)
+    yield path, commands, resets
+    daemon.stop(path)
+    thread.join(5)
+
+
+def test_same_env_runs_in_the_daemon_and_is_reset(served, capsys):
+    path, commands, resets = served
+    assert daemon.forward(["practice"], path) == 3
+    assert daemon.forward(["practice"], path) == 3
+    assert "hecho" in capsys.readouterr().out
+    assert commands == [(["practice"], "daemon-token")] * 2
+    assert resets == [1, 2]
+    assert "GALACTIC_PROTOCOL" not in os.environ
+
+
+def test_different_env_is_refused(served, monkeypatch):
+    path, commands, _ = served
+    monkeypatch.setenv("CHALLENGE_TOKEN", "caller-token")
+    assert daemon.forward(["practice"], path) is None
+    monkeypatch.setenv("CHALLENGE_TOKEN", "daemon-token")
+    monkeypatch.setenv("SWAPI_BASE_URLS", "http://127.0.0.1:1/api")
+    assert daemon.forward(["practice"], path) is None
+    assert commands == []
+
+
+def test_forwarding_switches_are_not_part_of_the_env(served, monkeypatch):
+    path, commands, _ = served
+    monkeypatch.setenv("GALACTIC_TIMING", "on")
+    assert daemon.forward(["practice"], path) == 3
+    assert len(commands) == 1
@@ -0,0 +1,101 @@
+import ast
+import random
+from decimal import Decimal
+
+import pytest
+
+from galactic_solver.evaluator import _to_decimal, eval_expression, eval_many, round10
+
+
+def baseline_eval(expression, variables):
+    # The tree-walking evaluator the compiled one replaced, kept as the reference
+    def node_value(node):
+        if isinstance(node, ast.Expression):
+            return node_value(node.body)
+        if isinstance(node, ast.Constant):
+            if isinstance(node.value, (int, float)):
+                return Decimal(str(node.value))
+            if isinstance(node.value, str):
+                return node.value
+            raise ValueError("Unsupported constant type")
+        if isinstance(node, ast.Name):
+            if node.id not in variables:
+                raise ValueError(f"Unknown variable {node.id}")
+            return variables[node.id]
+        if isinstance(node, ast.BinOp) and type(node.op) in (ast.Add, ast.Sub, ast.Mult, ast.Div):
+            left, right = _to_decimal(node_value(node.left)), _to_decimal(node_value(node.right))
+            if isinstance(node.op, ast.Add):
+                return left + right
+            if isinstance(node.op, ast.Sub):
+                return left - right
+            if isinstance(node.op, ast.Mult):
+                return left * right
+            if right == 0:
+                raise ZeroDivisionError("Division by zero in expression")
+            return left / right
+        if isinstance(node, ast.UnaryOp) and type(node.op) in (ast.UAdd, ast.USub):
+            operand = _to_decimal(node_value(node.operand))
+            return operand if isinstance(node.op, ast.UAdd) else -operand
+        if isinstance(node, ast.Call):
+            if isinstance(node.func, ast.Name) and node.func.id == "len" and len(node.args) == 1:
+                val = node_value(node.args[0])
+                return Decimal(len(val if isinstance(val, str) else str(val)))
+            raise ValueError("Only len(x) function is allowed")
+        raise ValueError("Unsupported expression element")
+
+    return round10(_to_decimal(node_value(ast.parse(expression, mode="eval"))))
+
+
+def outcome(fn, *args):
+    try:
+        return fn(*args)
+    except Exception as ex:
+        return type(ex)
+
+
+def random_expression(rng, depth=0):
+    if depth > 2 or rng.random() < 0.3:
+        return rng.choice(["x1", "x2", "x3", "x4", "len(x3)", "2", "0", "1.5", "'ab'"])
+    if rng.random() < 0.1:
+        return f"-{random_expression(rng, depth + 1)}"
+    if rng.random() < 0.05:
+        return rng.choice(["abs(x1)", "x1 ** 2", "x1 % 3"])
+    op = rng.choice("+-*/")
+    return f"({random_expression(rng, depth + 1)} {op} {random_expression(rng, depth + 1)})"
+
+
+BINDINGS = [
+    {"x1": Decimal("172"), "x2": Decimal("77"), "x3": "Tatooine"},
+    {"x1": Decimal("0"), "x2": Decimal("-3.25"), "x3": "Hoth"},
+    {"x1": 10, "x2": 0.1, "x3": ""},
+    {"x1": Decimal("1E+3"), "x2": Decimal("0"), "x3": "R2-D2"},
+]
+
+
+def test_compiled_evaluator_matches_baseline():
+    rng = random.Random(6)
+    for _ in range(500):
+        expression = random_expression(rng)
+        for variables in BINDINGS:
+            assert outcome(eval_expression, expression, variables) == outcome(baseline_eval, expression, variables), \
+                (expression, variables)
+
+
+def test_eval_many_matches_one_by_one():
+    rng = random.Random(7)
+    for _ in range(200):
+        expression = random_expression(rng)
+        expected = [outcome(baseline_eval, expression, v) for v in BINDINGS]
+        if any(isinstance(e, type) for e in expected):
+            assert eval_many(expression, BINDINGS, skip_errors=True) == [
+                None if isinstance(e, type) else e for e in expected]
+            first_error = next(e for e in expected if isinstance(e, type))
+            with pytest.raises(first_error):
+                eval_many(expression, BINDINGS)
+        else:
+            assert eval_many(expression, BINDINGS) == expected
+
+
+def test_round10_half_up():
+    assert eval_expression("x1 / x2", {"x1": Decimal(2), "x2": Decimal(3)}) == Decimal("0.6666666667")
+    assert eval_expression("x1 / 8", {"x1": Decimal("0.0000000004")}) == Decimal("0.0000000001")
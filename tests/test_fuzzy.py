@@ -0,0 +1,100 @@
+import pytest
+
+from galactic_solver import fuzzy
+from galactic_solver.data_sources import pokeapi, swapi
+from galactic_solver.fuzzy import FuzzyIndex, fuzzy_key
+
+PEOPLE = FuzzyIndex(["Luke Skywalker", "Obi-Wan Kenobi", "Darth Vader", "Darth Maul", "R2-D2", "C-3PO"],
+                    aliases={"Arturito": "R2-D2"})
+POKEMON = FuzzyIndex(["mr-mime", "nidoran-f", "nidoran-m", "charizard", "bulbasaur", "pikachu"])
+
+
+def test_key_normalization():
+    assert fuzzy_key("Nidoran ♀") == fuzzy_key("nidoran hembra") == "nidoran f"
+    assert fuzzy_key("Pikachú") == "pikachu"
+
+
+@pytest.mark.parametrize("index, query, expected", [
+    (POKEMON, "Mr Mime", "mr-mime"),
+    (POKEMON, "MR. MIME", "mr-mime"),
+    (POKEMON, "mrmime", "mr-mime"),           # key without spaces
+    (POKEMON, "Nidoran hembra", "nidoran-f"),
+    (POKEMON, "nidoran♂", "nidoran-m"),
+    (PEOPLE, "Arturito", "R2-D2"),            # alias
+    (PEOPLE, "r2d2", "R2-D2"),
+])
+def test_exact_matches_score_one(index, query, expected):
+    assert index.lookup(query) == (expected, 1.0)
+
+
+def test_unique_word_subset():
+    assert PEOPLE.lookup("Obi Wan") == ("Obi-Wan Kenobi", fuzzy.TOKEN_SUBSET_SCORE)
+    assert PEOPLE.lookup("Vader") == ("Darth Vader", fuzzy.TOKEN_SUBSET_SCORE)
+
+
+def test_ambiguous_word_subset_is_rejected():
+    assert PEOPLE.lookup("Darth") is None
+    assert POKEMON.lookup("Nidoran") is None
+
+
+@pytest.mark.parametrize("index, query, expected", [
+    (PEOPLE, "Luke Skywaker", "Luke Skywalker"),
+    (POKEMON, "Charizrd", "charizard"),
+    (POKEMON, "bulbasur", "bulbasaur"),
+])
+def test_typos_match_above_min_score(index, query, expected):
+    name, score = index.lookup(query)
+    assert name == expected
+    assert fuzzy.MIN_SCORE <= score < 1.0
+
+
+@pytest.mark.parametrize("index, query", [
+    (PEOPLE, "xyzzy"),
+    (PEOPLE, "Han Solo"),
+    (PEOPLE, "Leia"),
+    (POKEMON, "pika"),
+    (POKEMON, ""),
+])
+def test_weak_matches_are_rejected(index, query):
+    assert index.lookup(query) is None
+
+
+def test_close_runner_up_is_rejected():
+    index = FuzzyIndex(["kartana", "kartano"])
+    assert index.lookup("kartanu") is None
+    # Without a runner-up the same typo resolves
+    assert FuzzyIndex(["kartana"]).lookup("kartanu")[0] == "kartana"
+
+
+def test_aliases_to_the_same_name_are_not_ambiguous():
+    index = FuzzyIndex(["farfetchd"], aliases={"farfetch'd": "farfetchd", "farfechd": "farfetchd"})
+    assert index.lookup("farfetcd")[0] == "farfetchd"
+
+
+def test_swapi_alias_without_index_searches_the_canonical_name(monkeypatch):
+    monkeypatch.setattr(swapi, "_INDEX", {})
+    monkeypatch.setattr(swapi, "_INDEX_LOADED", True)
+    monkeypatch.setattr(swapi, "_FUZZY", {})
+    searched = []
+    monkeypatch.setattr(swapi, "_search", lambda endpoint, name: searched.append((endpoint, name)))
+    assert swapi.get_character("Arturito") is None
+    assert swapi.get_planet("Tatooine") is None  # no match: searched as written
+    assert searched == [("people/", "R2-D2"), ("planets/", "Tatooine")]
+
+
+def test_pokeapi_exact_table_hit_skips_fuzzy_matching(monkeypatch):
+    table = {"mr-mime": {"name": "mr-mime", "weight": 545}, "charizard": {"name": "charizard", "weight": 905}}
+    monkeypatch.setattr(pokeapi, "_table_lookup", lambda cname: table.get(cname))
+    monkeypatch.setattr(pokeapi, "cache_get", lambda key: None)
+    resolved = []
+
+    def resolve(name):
+        resolved.append(name)
+        return POKEMON.lookup(name)
+
+    monkeypatch.setattr(pokeapi, "resolve_name", resolve)
+    assert pokeapi._pokemon_item("Mr Mime")["weight"] == 545
+    assert pokeapi._pokemon_item("charizard")["weight"] == 905
+    assert resolved == []
+    assert pokeapi._pokemon_item("Charizrd")["weight"] == 905
+    assert resolved == ["charizrd"]
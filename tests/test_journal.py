@@ -0,0 +1,77 @@
+from collections import Counter
+from decimal import Decimal
+
+import pytest
+
+from galactic_solver import journal
+from galactic_solver.journal import AnswerJournal, lookup_answer, record_answer, statement_key
+
+STATEMENT = "¿Cuál es la altura de Luke Skywalker más el peso de Pikachu?"
+
+
+@pytest.fixture
+def answers(tmp_path):
+    journal = AnswerJournal(str(tmp_path / "answers.sqlite3"))
+    yield journal
+    journal.close()
+
+
+def test_miss_then_hit_once_verified(answers):
+    assert answers.lookup(STATEMENT) is None
+    answers.record(STATEMENT, Decimal("232.0000000000"), verified=True, expected=232.0, source="practice")
+    assert answers.lookup(STATEMENT) == Decimal("232.0000000000")
+    assert answers.lookup(STATEMENT.replace("Pikachu", "Bulbasaur")) is None
+    assert answers.preload() == 1
+
+
+def test_unverified_entries_do_not_count(answers):
+    answers.record(STATEMENT, Decimal("232"), source="official")
+    assert answers.lookup(STATEMENT) is None
+    # ... nor do they withdraw a verified answer
+    answers.record(STATEMENT, Decimal("232"), verified=True)
+    answers.record(STATEMENT, Decimal("999"), source="official")
+    assert answers.lookup(STATEMENT) == Decimal("232")
+
+
+def test_mismatch_invalidates_and_a_new_match_restores(answers):
+    answers.lookup(STATEMENT)  # loaded before the records: updated in memory
+    answers.record(STATEMENT, Decimal("232"), verified=True)
+    answers.record(STATEMENT, Decimal("232"), verified=False, expected=233)
+    assert answers.lookup(STATEMENT) is None
+    assert answers.preload() == 0
+    answers.record(STATEMENT, Decimal("233"), verified=True, expected=233)
+    assert answers.lookup(STATEMENT) == Decimal("233")
+
+
+def test_reopening_keeps_the_latest_graded_entry(tmp_path):
+    path = str(tmp_path / "answers.sqlite3")
+    first = AnswerJournal(path)
+    first.record(STATEMENT, Decimal("1"), verified=True)
+    first.record("otro enunciado", Decimal("2"), verified=True)
+    first.record("otro enunciado", None, verified=False)
+    first.close()
+    second = AnswerJournal(path)
+    assert second.lookup(STATEMENT) == Decimal("1")
+    assert second.lookup("otro enunciado") is None
+    second.close()
+
+
+def test_statement_key_ignores_case_and_spacing():
+    assert statement_key(f"  {STATEMENT.upper()} ") == statement_key(STATEMENT.replace(" ", "\n  "))
+    assert statement_key(STATEMENT) != statement_key(STATEMENT.replace("Luke", "Leia"))
+
+
+def test_module_helpers_count_hits_and_honour_off(monkeypatch, tmp_path):
+    monkeypatch.setenv("GALACTIC_JOURNAL_PATH", str(tmp_path / "answers.sqlite3"))
+    monkeypatch.setattr(journal, "_JOURNAL", None)
+    monkeypatch.setattr(journal, "JOURNAL_STATS", Counter())
+    assert lookup_answer(STATEMENT) is None
+    record_answer(STATEMENT, Decimal("232"), {"parse": {"expression": "x1 + x2"}}, verified=True)
+    assert lookup_answer(STATEMENT) == Decimal("232")
+    assert journal.JOURNAL_STATS == {"hit": 1, "recorded": 1}
+
+    monkeypatch.setenv("GALACTIC_JOURNAL", "off")
+    assert lookup_answer(STATEMENT) is None
+    record_answer(STATEMENT, Decimal("0"), verified=True)
+    assert journal.JOURNAL_STATS == {"hit": 1, "recorded": 1}
+    journal._JOURNAL.close()
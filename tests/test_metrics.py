@@ -0,0 +1,17 @@
+import pytest
+
+from galactic_solver.metrics import Recorder
+
+
+def test_problems_per_minute_counts_solved_problems_over_wall_clock(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr("galactic_solver.metrics.time.perf_counter", lambda: clock[0])
+    recorder = Recorder()
+    # Four workers: four 20 s problems overlap in 20 s of wall-clock time
+    for i in range(4):
+        recorder.add_problem(i, 20.0, fallback=i == 3)
+    clock[0] += 20.0
+    summary = recorder.summary()
+    assert (summary["solved"], summary["fallbacks"]) == (3, 1)
+    assert summary["problems_per_minute"] == pytest.approx(9.0)
+
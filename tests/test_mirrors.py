@@ -0,0 +1,89 @@
+import asyncio
+import time
+
+import pytest
+
+from bench.fake_servers import Faults, SwapiServer
+from galactic_solver.mirrors import MirrorPool
+from galactic_solver.utils import make_client
+
+SLOW = 0.4
+HEDGE = 0.05
+
+
+@pytest.fixture(scope="module")
+def servers():
+    started = {
+        "slow": SwapiServer(Faults(latency=SLOW)).start(),
+        "fast": SwapiServer().start(),
+        "down": SwapiServer(Faults(failure_rate=1.0)).start(),
+    }
+    yield {name: f"{server.url}/api" for name, server in started.items()}
+    for server in started.values():
+        server.stop()
+
+
+@pytest.fixture
+def client():
+    client = make_client(timeout=5.0)
+    yield client
+    client.close()
+
+
+def test_ranking_follows_measured_latency(servers, client):
+    pool = MirrorPool([servers["slow"], servers["fast"]])
+    assert pool.ranked() == [servers["slow"], servers["fast"]]  # untried: configured order
+    assert pool.get(client, "planets/1/").json()["name"]  # measures the slow one
+    assert pool.ranked() == [servers["fast"], servers["slow"]]  # untried ranks as instant
+    pool.get(client, "planets/1/")
+    assert pool.ranked() == [servers["fast"], servers["slow"]]
+    stats = pool.snapshot()
+    assert stats[servers["fast"]]["ewma"] < stats[servers["slow"]]["ewma"]
+
+
+def test_failing_mirror_cools_down(servers, client):
+    pool = MirrorPool([servers["down"], servers["fast"]])
+    assert pool.get(client, "people/1/").status_code == 200  # falls back to the next one
+    assert pool.snapshot()[servers["down"]]["consecutive_failures"] == 1
+    assert pool.ranked() == [servers["fast"], servers["down"]]
+    # Once the cooldown is over the mirror is tried again
+    pool.stats[servers["down"]].last_failure -= 3.0
+    assert pool.ranked()[0] == servers["down"]
+
+
+def test_hedged_request_returns_the_fast_answer(servers, client):
+    pool = MirrorPool([servers["slow"], servers["fast"]])
+    t0 = time.monotonic()
+    resp = pool.get(client, "planets/", params={"search": "hoth"}, hedge_delay=HEDGE)
+    elapsed = time.monotonic() - t0
+    assert str(resp.url).startswith(servers["fast"])
+    assert resp.json()["results"][0]["name"] == "Hoth"
+    assert HEDGE <= elapsed < SLOW / 2
+
+
+def test_async_hedged_request_returns_the_fast_answer(servers):
+    pool = MirrorPool([servers["slow"], servers["fast"]])
+
+    async def main():
+        async with make_client(timeout=5.0, asynchronous=True) as aclient:
+            t0 = time.monotonic()
+            resp = await pool.aget(aclient, "planets/", params={"search": "hoth"}, hedge_delay=HEDGE)
+            return resp, time.monotonic() - t0
+
+    resp, elapsed = asyncio.run(main())
+    assert str(resp.url).startswith(servers["fast"])
+    assert HEDGE <= elapsed < SLOW / 2
+    # The abandoned slow attempt was cancelled, so only the fast one was measured
+    assert pool.snapshot()[servers["slow"]]["successes"] == 0
+
+
+def test_probe_reaches_every_mirror_and_seeds_the_ranking(servers, client):
+    pool = MirrorPool([servers["slow"], servers["down"], servers["fast"]])
+    assert pool.probe(client) == 2
+    assert pool.ranked() == [servers["fast"], servers["slow"], servers["down"]]
+
+    async def main():
+        async with make_client(timeout=5.0, asynchronous=True) as aclient:
+            return await MirrorPool([servers["down"], servers["fast"]]).aprobe(aclient)
+
+    assert asyncio.run(main()) == 1
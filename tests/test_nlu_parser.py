@@ -0,0 +1,93 @@
+import json
+
+import pytest
+
+from galactic_solver.nlu_parser import ParseRejected, _decode_compact, _parse_response, encode_compact, validate_parse
+
+VALID = {
+    "entities": [{"type": "sw_character", "name": "Luke Skywalker"}, {"type": "pokemon", "name": "pikachu"}],
+    "vars": {"x1": {"entity": 0, "attribute": "height"}, "x2": {"entity": 1, "attribute": "name"}},
+    "expression": "x1 * len(x2)",
+    "notes": "extra keys are dropped",
+}
+
+
+def with_(**changes):
+    return {**VALID, **changes}
+
+
+def test_valid_parse_drops_extra_keys():
+    assert validate_parse(VALID) == {k: VALID[k] for k in ("entities", "vars", "expression")}
+
+
+@pytest.mark.parametrize("data, code", [
+    ([], "shape"),
+    ("x1 + x2", "shape"),
+    ({"entities": [], "vars": {}}, "shape"),
+    (with_(entities=[]), "entity"),
+    (with_(entities={"type": "pokemon", "name": "pikachu"}), "entity"),
+    (with_(entities=[{"type": "pokemon", "name": " "}, VALID["entities"][1]]), "entity"),
+    (with_(entities=[{"type": "pokemon"}, VALID["entities"][1]]), "entity"),
+    (with_(entities=[{"type": "starship", "name": "X-wing"}, VALID["entities"][1]]), "entity"),
+    (with_(vars=[["x1", 0, "height"]]), "var"),
+    (with_(vars={"x1": {"entity": 2, "attribute": "height"}}, expression="x1"), "var"),
+    (with_(vars={"x1": {"entity": -1, "attribute": "height"}}, expression="x1"), "var"),
+    (with_(vars={"x1": {"entity": True, "attribute": "height"}}, expression="x1"), "var"),
+    (with_(vars={"x1": {"entity": "0", "attribute": "height"}}, expression="x1"), "var"),
+    (with_(vars={"x1": {"entity": 0, "attribute": "speed"}}, expression="x1"), "var"),
+    (with_(vars={"x1": [0, "height"]}, expression="x1"), "var"),
+    (with_(expression=""), "expression"),
+    (with_(expression=None), "expression"),
+    (with_(expression="x1 * (x2"), "expression"),
+    (with_(expression="x1 + x3"), "expression"),
+])
+def test_rejections(data, code):
+    with pytest.raises(ParseRejected) as info:
+        validate_parse(data)
+    assert info.value.code == code
+    assert str(info.value)
+
+
+def test_compact_round_trip():
+    parsed = validate_parse(VALID)
+    assert validate_parse(_decode_compact(encode_compact(parsed))) == parsed
+
+
+@pytest.mark.parametrize("data, code", [
+    ({"e": [], "v": {}}, "shape"),
+    ({"e": {}, "v": {}, "x": "x1"}, "shape"),
+    ({"e": [["pokemon"]], "v": {}, "x": "x1"}, "entity"),
+    ({"e": [{"type": "pokemon", "name": "pikachu"}], "v": {}, "x": "x1"}, "entity"),
+    ({"e": [["pokemon", "pikachu"]], "v": {"x1": [0]}, "x": "x1"}, "var"),
+    ({"e": [["pokemon", "pikachu"]], "v": {"x1": {"entity": 0}}, "x": "x1"}, "var"),
+])
+def test_compact_rejections(data, code):
+    with pytest.raises(ParseRejected) as info:
+        _decode_compact(data)
+    assert info.value.code == code
+
+
+def completion(content):
+    return {"choices": [{"message": {"content": content}}]}
+
+
+def test_response_rejections_keep_the_content():
+    with pytest.raises(ParseRejected) as info:
+        _parse_response(completion(""))
+    assert info.value.code == "empty"
+    with pytest.raises(ParseRejected) as info:
+        _parse_response(completion("{not json"))
+    assert (info.value.code, info.value.content) == ("json", "{not json")
+    bad = json.dumps(with_(expression="x9"))
+    with pytest.raises(ParseRejected) as info:
+        _parse_response(completion(f"```json\n{bad}\n```"))
+    assert (info.value.code, info.value.content) == ("expression", bad)
+
+
+def test_compact_response():
+    content = json.dumps({"e": [["sw_planet", "Hoth"]], "v": {"x1": [0, "diameter"]}, "x": "x1 / 2"})
+    assert _parse_response(completion(content), protocol="compact") == {
+        "entities": [{"type": "sw_planet", "name": "Hoth"}],
+        "vars": {"x1": {"entity": 0, "attribute": "diameter"}},
+        "expression": "x1 / 2",
+    }
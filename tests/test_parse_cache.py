@@ -0,0 +1,43 @@
+import pytest
+
+from galactic_solver import parse_cache
+from galactic_solver.names import NameDictionary
+from galactic_solver.parse_cache import TemplateCache, make_template
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    dictionary = NameDictionary([("sw_character", "Yoda"), ("sw_character", "Chewbacca")])
+    monkeypatch.setattr(parse_cache, "get_dictionary", lambda: dictionary)
+    return TemplateCache(str(tmp_path / "templates.json"))
+
+
+def _parse(name, expression, attribute="mass"):
+    return {"entities": [{"type": "sw_character", "name": name}],
+            "vars": {"x1": {"entity": 0, "attribute": attribute}},
+            "expression": expression}
+
+
+def test_statement_number_is_rebound(cache):
+    assert cache.store("Toma la masa de Yoda y súmale 2, ¿cuánto da?", _parse("Yoda", "x1 + 2"))
+    parsed = cache.lookup("Toma la masa de Chewbacca y súmale 7, ¿cuánto da?")
+    assert parsed["entities"] == [{"type": "sw_character", "name": "Chewbacca"}]
+    assert parsed["expression"] == "x1 + 7"
+
+
+def test_constant_of_the_parse_is_kept(cache):
+    assert cache.store("Calcula el doble de la masa de Yoda, por favor", _parse("Yoda", "x1 * 2"))
+    parsed = cache.lookup("Calcula el doble de la masa de Chewbacca, por favor")
+    assert parsed["expression"] == "x1 * 2"
+
+
+def test_constant_equal_to_a_statement_number_is_not_stored(cache):
+    statement = "Toma la mitad de la masa de Yoda y súmale 2, ¿cuánto da?"
+    assert make_template(statement, _parse("Yoda", "x1 / 2 + 2")) is None
+    assert not cache.store(statement, _parse("Yoda", "x1 / 2 + 2"))
+    assert cache.lookup("Toma la mitad de la masa de Chewbacca y súmale 7, ¿cuánto da?") is None
+
+
+def test_repeated_statement_number_is_not_stored():
+    statement = "Toma la masa de Yoda, súmale 2 y luego réstale 2 otra vez"
+    assert make_template(statement, _parse("Yoda", "x1 + 2 - 2")) is None
@@ -0,0 +1,86 @@
+import pytest
+
+from bench.fake_servers import PokeApiServer
+from galactic_solver.data_sources import pokeapi, poketable
+from galactic_solver.data_sources.poketable import PokeTable, write_table
+from galactic_solver.utils import make_client
+
+ROWS = [
+    ("pikachu", {"base_experience": 112, "height": 4, "weight": 60}),
+    ("Mr-Mime", {"base_experience": 161, "height": 13, "weight": 545}),
+    ("abra", {"base_experience": 62, "height": None, "weight": 195}),
+    ("zubat", {"base_experience": 49, "height": 8, "weight": 75.0}),
+    ("nidoran-f", {"base_experience": 55, "height": 4, "weight": 70}),
+]
+
+
+def test_round_trip_and_binary_search(tmp_path):
+    path = str(tmp_path / "pokemon.table")
+    assert write_table(path, ROWS) == 5
+    table = PokeTable(path)
+    try:
+        assert len(table) == 5
+        assert table.names() == ["abra", "mr-mime", "nidoran-f", "pikachu", "zubat"]
+        # First, last and middle rows; names are matched case-insensitively
+        assert table.lookup("abra") == {"name": "abra", "base_experience": 62, "height": None, "weight": 195}
+        assert table.lookup("ZUBAT")["weight"] == 75
+        assert table.lookup(" Mr-Mime ")["base_experience"] == 161
+        for missing in ("aaa", "bulbasaur", "zzz", "pikachu-but-longer-than-any-name", ""):
+            assert table.lookup(missing) is None
+        assert [row["name"] for row in table.rows()] == table.names()
+    finally:
+        table.close()
+
+
+def test_rejects_foreign_or_truncated_files(tmp_path):
+    path = tmp_path / "pokemon.table"
+    path.write_bytes(b"not a table at all")
+    with pytest.raises(ValueError):
+        PokeTable(str(path))
+    write_table(str(path), ROWS)
+    path.write_bytes(path.read_bytes()[:-4])
+    with pytest.raises(ValueError):
+        PokeTable(str(path))
+
+
+class _PokedexServer(PokeApiServer):
+    # heatran with the API's value (overridden on import), gengar failing with a 503
+    def route(self, method, path, query, body):
+        if path.rstrip("/").endswith("/pokemon/gengar"):
+            return {"detail": "Service Unavailable"}, 503
+        result = super().route(method, path, query, body)
+        if path.rstrip("/").endswith("/pokemon/heatran"):
+            result = {**result, "base_experience": 270}
+        return result
+
+
+@pytest.fixture
+def pokedex(monkeypatch, tmp_path):
+    server = _PokedexServer().start()
+    client = make_client(timeout=5.0)
+    monkeypatch.setattr(pokeapi, "BASE_URL", f"{server.url}/api/v2")
+    monkeypatch.setattr(pokeapi, "client", client)
+    monkeypatch.setattr(pokeapi, "_NAMES", None)
+    monkeypatch.setattr(pokeapi, "_FUZZY", None)
+    monkeypatch.setenv("POKEAPI_TABLE_PATH", str(tmp_path / "pokemon.table"))
+    monkeypatch.setenv("POKEAPI_NAMES_PATH", str(tmp_path / "pokemon_names.json"))
+    yield server
+    poketable.reset_table()
+    client.close()
+    server.stop()
+
+
+def test_import_applies_overrides_and_skips_failures(pokedex):
+    out = pokeapi.import_pokedex(workers=4)
+    assert out["failed"] == ["gengar"]
+    # The corpus' 10 Pokémon minus gengar; the extra alias targets 404 and are just absent
+    assert out["imported"] == 9
+    table = poketable.get_table()
+    assert table.lookup("heatran")["base_experience"] == 300
+    assert table.lookup("mr-mime")["weight"] == 545
+    assert table.lookup("gengar") is None
+    assert "gengar" in pokeapi.known_names()
+    # Alias spellings reach the table row without any request
+    requests = pokedex.requests
+    assert pokeapi._pokemon_item("Mr. Mime")["name"] == "mr-mime"
+    assert pokedex.requests == requests
@@ -0,0 +1,35 @@
+import json
+import os
+import pstats
+from concurrent.futures import ThreadPoolExecutor
+
+from galactic_solver.profiling import ProblemProfiler, in_worker
+
+
+def worker_only_function(n):
+    return sum(range(n))
+
+
+def nested_worker_function(pool):
+    return pool.submit(in_worker(worker_only_function), 10).result()
+
+
+def profiled_functions(path):
+    return {func for _, _, func in pstats.Stats(path).stats}
+
+
+def test_worker_threads_are_merged_into_the_problem_profile(tmp_path):
+    profiler = ProblemProfiler(str(tmp_path), keep=2, interval=0.001)
+    with ThreadPoolExecutor(2) as pool, ThreadPoolExecutor(2) as inner:
+        with profiler.profile("p1"):
+            assert pool.submit(in_worker(worker_only_function), 1000).result() == 499500
+            assert pool.submit(in_worker(nested_worker_function), inner).result() == 45
+    entry = json.loads((tmp_path / "index.json").read_text())[0]
+    assert entry["profiled_threads"] == 4
+    functions = profiled_functions(entry["pstats"])
+    assert {"worker_only_function", "nested_worker_function"} <= functions
+    assert os.path.exists(entry["collapsed"])
+
+
+def test_in_worker_is_a_no_op_outside_a_profile():
+    assert in_worker(worker_only_function) is worker_only_function
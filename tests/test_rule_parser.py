@@ -0,0 +1,50 @@
+import pytest
+
+from galactic_solver.names import NameDictionary
+from galactic_solver.rule_parser import parse_local
+
+DICTIONARY = NameDictionary([
+    ("sw_character", "Yoda"),
+    ("sw_character", "Luke Skywalker"),
+    ("sw_planet", "Tatooine"),
+    ("sw_planet", "Hoth"),
+    ("pokemon", "pikachu"),
+])
+
+
+def parse(statement):
+    return parse_local(statement, DICTIONARY)
+
+
+@pytest.mark.parametrize("statement, expression", [
+    ("¿Cuál es la masa de Yoda más la altura de Luke Skywalker?", "x1 + x2"),
+    ("Calcula la población de Tatooine dividida por el diámetro de Hoth", "x1 / x2"),
+    ("la suma de la población de Tatooine y el diámetro de Hoth", "x1 + x2"),
+    ("la masa de Yoda multiplicada por la altura de Luke Skywalker y luego divide el resultado por 2", "(x1 * x2) / 2"),
+    ("¿Cuál es el peso de Pikachu menos la masa de Yoda? ¿Cuál es el resultado?", "x1 - x2"),
+])
+def test_supported_phrasings(statement, expression):
+    parsed, confidence = parse(statement)
+    assert parsed is not None
+    assert parsed["expression"] == expression
+    assert confidence == 1.0
+
+
+@pytest.mark.parametrize("statement", [
+    "La masa de Yoda elevada al cuadrado",
+    "la masa de Yoda al cuadrado",
+    "Calcula el doble de la masa de Yoda",
+    "Calcula la mitad de la masa de Yoda",
+    "la mitad de la masa de Yoda y súmale 2",
+    "En una galaxia muy, muy lejana, alguien quiere saber cuánto da la masa de Yoda más el peso de Pikachu.",
+    "la masa de Yoda más la altura de Luke Skywalker por favor",
+])
+def test_unconsumed_words_outside_operands_are_rejected(statement):
+    parsed, confidence = parse(statement)
+    assert parsed is None or confidence < 0.85
+
+
+def test_operator_before_first_operand_is_consumed_once():
+    parsed, _ = parse("Suma la masa de Yoda y la altura de Luke Skywalker")
+    assert parsed["expression"] == "x1 + x2"
+    assert parse("Suma el doble de la masa de Yoda y la altura de Luke Skywalker")[0] is None
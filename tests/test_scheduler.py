@@ -0,0 +1,104 @@
+import asyncio
+import socket
+import threading
+import time
+from concurrent.futures import wait
+
+import pytest
+
+from galactic_solver.prefetch import MAX_PREFETCH, Prefetch
+from galactic_solver.scheduler import SUBMIT_RESERVE, ProblemBudget, Scheduler, StageTimeout, time_left
+from galactic_solver.utils import make_client
+
+
+def budget(total):
+    return ProblemBudget(Scheduler(limit_seconds=60.0), total)
+
+
+def test_deadline_only_inside_a_stage():
+    assert time_left() is None
+    left = budget(2.0).run("evaluate", time_left)
+    assert 0 < left <= 2.0
+    assert time_left() is None
+
+
+def test_sync_stage_caps_http_timeout():
+    # Accepts connections and never answers
+    server = socket.create_server(("127.0.0.1", 0))
+    url = f"http://127.0.0.1:{server.getsockname()[1]}/"
+    client = make_client(timeout=10.0)
+    threads = threading.active_count()
+    try:
+        t0 = time.monotonic()
+        with pytest.raises(StageTimeout):
+            budget(0.3).run("evaluate", client.get, url)
+        assert time.monotonic() - t0 < 2.0
+        assert threading.active_count() == threads
+    finally:
+        client.close()
+        server.close()
+
+
+def test_sync_stage_errors_within_budget_propagate():
+    def fail():
+        raise ValueError("bad parse")
+
+    with pytest.raises(ValueError):
+        budget(2.0).run("parse", fail)
+
+
+def test_async_stage_cancels_tasks_it_started():
+    children = []
+
+    async def stage():
+        child = asyncio.ensure_future(asyncio.sleep(10))
+        children.append(child)
+        await asyncio.shield(child)  # like a singleflight leader
+
+    async def main():
+        with pytest.raises(StageTimeout):
+            await budget(0.2).arun("evaluate", stage())
+        await asyncio.sleep(0)
+
+    asyncio.run(main())
+    assert children[0].cancelled()
+
+
+def test_async_cpu_bound_stage_over_budget_times_out():
+    async def evaluate():
+        time.sleep(0.15)  # never yields
+        return 1
+
+    async def main():
+        with pytest.raises(StageTimeout):
+            await budget(0.1).arun("evaluate", evaluate())
+
+    asyncio.run(main())
+
+
+def test_submit_keeps_its_reserve_after_the_problem_budget():
+    spent = budget(0.0)
+    assert spent.stage_seconds("evaluate") == 0.0
+    assert spent.stage_seconds("submit") == pytest.approx(SUBMIT_RESERVE, abs=0.01)
+    ending = ProblemBudget(Scheduler(limit_seconds=0.5), 0.0)
+    assert ending.stage_seconds("submit") <= 0.5
+
+
+def test_prefetch_workers_get_the_problem_deadline_and_close_drops_the_rest():
+    release = threading.Event()
+    seen = []
+
+    def fetch(name):
+        seen.append(time_left())
+        release.wait(5)
+        return name
+
+    prefetch = Prefetch({"pokemon": fetch}, budget=budget(2.0))
+    for i in range(2 * MAX_PREFETCH + 2):  # more than the pool runs at once
+        prefetch.add({"type": "pokemon", "name": f"p{i}"})
+    futures = list(prefetch._futures.values())
+    prefetch.close()
+    release.set()
+    wait(futures, timeout=5)
+    assert sum(f.cancelled() for f in futures) >= 2
+    assert seen and all(0 < left <= 2.0 for left in seen)
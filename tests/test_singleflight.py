@@ -0,0 +1,140 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from galactic_solver.data_sources import swapi
+from galactic_solver.scheduler import ProblemBudget, Scheduler, StageTimeout
+from galactic_solver.singleflight import SINGLEFLIGHT_STATS, AsyncSingleFlight, SingleFlight
+
+
+@pytest.fixture(autouse=True)
+def clean_stats():
+    SINGLEFLIGHT_STATS.clear()
+
+
+def test_concurrent_callers_share_one_fetch():
+    flight = SingleFlight("test")
+    calls, results = [], []
+    release = threading.Event()
+
+    def fetch(key):
+        calls.append(key)
+        release.wait(5)
+        return {"name": key}
+
+    def caller():
+        results.append(flight.do("luke", fetch, "luke"))
+
+    threads = [threading.Thread(target=caller) for _ in range(8)]
+    for t in threads:
+        t.start()
+    while SINGLEFLIGHT_STATS["fetched"] + SINGLEFLIGHT_STATS["shared"] < 8:
+        time.sleep(0.001)
+    release.set()
+    for t in threads:
+        t.join(5)
+    assert calls == ["luke"]
+    assert results == [{"name": "luke"}] * 8
+    assert SINGLEFLIGHT_STATS == {"fetched": 1, "shared": 7}
+
+
+def test_error_reaches_every_waiter_and_is_not_kept():
+    flight = SingleFlight("test")
+    release = threading.Event()
+    errors = []
+
+    def fetch():
+        release.wait(5)
+        raise ConnectionError("swapi down")
+
+    def caller():
+        try:
+            flight.do("luke", fetch)
+        except ConnectionError as ex:
+            errors.append(ex)
+
+    threads = [threading.Thread(target=caller) for _ in range(4)]
+    for t in threads:
+        t.start()
+    while SINGLEFLIGHT_STATS["fetched"] + SINGLEFLIGHT_STATS["shared"] < 4:
+        time.sleep(0.001)
+    release.set()
+    for t in threads:
+        t.join(5)
+    assert len(errors) == 4
+    # The next call fetches again instead of getting the old error
+    assert flight.do("luke", lambda: "ok") == "ok"
+
+
+def test_sequential_calls_fetch_each_time():
+    flight = SingleFlight("test")
+    assert [flight.do("k", lambda i=i: i) for i in range(3)] == [0, 1, 2]
+    assert SINGLEFLIGHT_STATS == {"fetched": 3}
+
+
+def test_async_callers_share_one_fetch():
+    flight = AsyncSingleFlight("test")
+    calls = []
+
+    async def fetch(key):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return key.upper()
+
+    async def main():
+        return await asyncio.gather(*(flight.do(k, fetch, k) for k in ["hoth", "hoth", "naboo", "hoth"]))
+
+    assert asyncio.run(main()) == ["HOTH", "HOTH", "NABOO", "HOTH"]
+    assert sorted(calls) == ["hoth", "naboo"]
+    assert SINGLEFLIGHT_STATS == {"fetched": 2, "shared": 2}
+
+
+def test_async_error_propagates_and_follower_cancel_spares_leader():
+    flight = AsyncSingleFlight("test")
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise ConnectionError("pokeapi down")
+
+    async def slow():
+        await asyncio.sleep(0.02)
+        return "pikachu"
+
+    async def main():
+        results = await asyncio.gather(flight.do("a", failing), flight.do("a", failing), return_exceptions=True)
+        assert all(isinstance(r, ConnectionError) for r in results)
+
+        leader = asyncio.ensure_future(flight.do("b", slow))
+        follower = asyncio.ensure_future(flight.do("b", slow))
+        await asyncio.sleep(0)
+        follower.cancel()
+        assert await leader == "pikachu"
+        assert follower.cancelled()
+
+    asyncio.run(main())
+
+
+def test_search_follower_past_the_stage_deadline_finds_nothing(monkeypatch):
+    release = threading.Event()
+
+    def slow_search(key, endpoint, name):
+        release.wait(5)
+        return {"name": name}
+
+    monkeypatch.setattr(swapi, "_search_remote", slow_search)
+    monkeypatch.setattr(swapi, "cache_get", lambda key: None)
+    leader = threading.Thread(target=swapi._search, args=("people/", "Yoda"))
+    leader.start()
+    while not SINGLEFLIGHT_STATS["fetched"]:
+        time.sleep(0.001)
+    found = []
+    try:
+        # The follower gives up at the deadline without raising; the stage reports the timeout
+        with pytest.raises(StageTimeout):
+            ProblemBudget(Scheduler(60.0), 0.1).run("resolve", lambda: found.append(swapi._search("people/", "Yoda")))
+        assert found == [None]
+    finally:
+        release.set()
+        leader.join(5)
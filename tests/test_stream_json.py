@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+from galactic_solver.nlu_parser import _compact_entity
+from galactic_solver.stream_json import EntityStreamParser
+
+ANSWER = json.dumps({
+    "notes": "tricky: {\"entities\": [1]} and ] } inside a string",
+    "entities": [
+        {"type": "sw_character", "name": "Obi-Wan \"Ben\" Kenobi"},
+        {"type": "pokemon", "name": "farfetch'd \\ {x}"},
+        {"type": "sw_planet", "name": "Tatooine"},
+    ],
+    "vars": {"x1": {"entity": 0, "attribute": "height"}},
+    "expression": "x1 / 2",
+}, ensure_ascii=False)
+
+
+def feed_in_chunks(parser, text, size):
+    completed = []
+    for i in range(0, len(text), size):
+        completed.extend(parser.feed(text[i:i + size]))
+    return completed
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 7, 64, len(ANSWER)])
+def test_entities_match_full_parse_for_any_chunking(size):
+    parser = EntityStreamParser()
+    completed = feed_in_chunks(parser, ANSWER, size)
+    assert completed == json.loads(ANSWER)["entities"]
+    assert parser.entities == completed
+    assert parser.text == ANSWER
+
+
+def test_each_entity_is_emitted_when_its_brace_arrives():
+    parser = EntityStreamParser()
+    first_end = ANSWER.index("}", ANSWER.index("Kenobi")) + 1
+    assert parser.feed(ANSWER[:first_end - 1]) == []
+    assert parser.feed(ANSWER[first_end - 1:first_end]) == [json.loads(ANSWER)["entities"][0]]
+
+
+def test_splits_inside_escapes():
+    text = '{"entities": [{"type": "pokemon", "name": "a\\"}b"}]}'
+    split = text.index("\\") + 1  # between the backslash and the escaped quote
+    parser = EntityStreamParser()
+    assert parser.feed(text[:split]) == []
+    assert parser.feed(text[split:]) == [{"type": "pokemon", "name": 'a"}b'}]
+
+
+def test_nested_arrays_and_later_keys_are_ignored():
+    text = '{"vars": {"entities": [{"type": "x"}]}, "entities": [], "other": {"entities": [{"a": 1}]}}'
+    assert feed_in_chunks(EntityStreamParser(), text, 4) == []
+
+
+def test_compact_pairs_are_converted():
+    text = '{"e":[["sw_planet","Hoth"],["pokemon","mr. \\"mime\\""]],"v":{"x1":[0,"diameter"]},"x":"x1"}'
+    parser = EntityStreamParser(key="e", convert=_compact_entity)
+    assert feed_in_chunks(parser, text, 3) == [
+        {"type": "sw_planet", "name": "Hoth"},
+        {"type": "pokemon", "name": 'mr. "mime"'},
+    ]
+
+
+def test_malformed_item_is_skipped():
+    parser = EntityStreamParser()
+    assert parser.feed('{"entities": [{"type": "pokemon", "name": }, {"type": "pokemon", "name": "ditto"}]}') == [
+        {"type": "pokemon", "name": "ditto"}]
@@ -0,0 +1,76 @@
+import httpx
+import pytest
+
+from galactic_solver import transport
+from galactic_solver.transport import Cassette, CassetteMiss, CassetteTransport
+
+
+def echo(request):
+    return httpx.Response(200, json={"body": request.content.decode()})
+
+
+@pytest.fixture
+def recording(tmp_path):
+    path = str(tmp_path / "run.cassette")
+    with httpx.Client(transport=CassetteTransport(Cassette(path, "record"), httpx.MockTransport(echo))) as client:
+        client.post("http://chat/completions", content=b"statement A")
+        client.post("http://chat/completions", content=b"statement B")
+        client.get("http://swapi/people/?search=luke")
+    return path
+
+
+def replay(path, **kwargs):
+    cassette = Cassette(path, **kwargs)
+    return cassette, httpx.Client(transport=CassetteTransport(cassette))
+
+
+def test_replays_exact_body(recording):
+    cassette, client = replay(recording)
+    assert client.post("http://chat/completions", content=b"statement B").json() == {"body": "statement B"}
+    assert client.post("http://chat/completions", content=b"statement A").json() == {"body": "statement A"}
+    assert (cassette.replayed, cassette.missed) == (2, 0)
+
+
+def test_post_with_other_body_is_a_miss(recording):
+    cassette, client = replay(recording)
+    with pytest.raises(CassetteMiss):
+        client.post("http://chat/completions", content=b"statement C")
+    assert (cassette.replayed, cassette.missed) == (0, 1)
+
+
+def test_loose_falls_back_to_url(recording):
+    cassette, client = replay(recording, loose=True)
+    assert client.post("http://chat/completions", content=b"statement C").json() == {"body": "statement A"}
+    assert cassette.missed == 0
+
+
+def test_get_falls_back_to_url(recording):
+    cassette, client = replay(recording)
+    assert client.request("GET", "http://swapi/people/?search=luke", content=b"x").status_code == 200
+    with pytest.raises(CassetteMiss):
+        client.get("http://swapi/people/?search=luke")
+    assert (cassette.replayed, cassette.missed) == (1, 1)
+
+
+def test_configure_from_env(recording, monkeypatch):
+    monkeypatch.setattr(transport, "_CASSETTE", None)
+    monkeypatch.delenv("GALACTIC_CASSETTE", raising=False)
+    assert transport.configure_from_env() is None
+    monkeypatch.setenv("GALACTIC_CASSETTE", recording)
+    monkeypatch.setenv("GALACTIC_CASSETTE_MATCH", "url")
+    cassette = transport.configure_from_env()
+    assert transport.active() is cassette
+    assert (cassette.mode, cassette.loose, len(cassette)) == ("replay", True, 3)
+    monkeypatch.delenv("GALACTIC_CASSETTE")
+    assert transport.configure_from_env() is None and transport.active() is None
+
+
+@pytest.mark.parametrize("value, expected", [(None, None), ("", None), ("recorded", "recorded"), ("0.25", 0.25)])
+def test_parse_latency(value, expected):
+    assert transport.parse_latency(value) == expected
+
+
+@pytest.mark.parametrize("value", ["abc", "-1", "nan"])
+def test_parse_latency_rejects_bad_values(value):
+    with pytest.raises(ValueError, match="recorded"):
+        transport.parse_latency(value)